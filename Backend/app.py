@@ -1,43 +1,140 @@
 import os
 import re
-from io import BytesIO
-from typing import Optional
+import json
+import time
+import hashlib
+import tempfile
+import threading
+import mimetypes
+from typing import Optional, Tuple
 from functools import wraps
+from concurrent.futures import ThreadPoolExecutor
 from flask import Flask, render_template, request, redirect, url_for, jsonify, session, flash
 from werkzeug.security import generate_password_hash, check_password_hash
+from werkzeug.utils import safe_join
 import sqlite3
 import pandas as pd
 from dotenv import load_dotenv
+from data_query import AggregateTooWide, build_data_query, run_aggregate, split_page, split_rows
+from reports import REPORT_VIEWS, SOURCE_TABLE, compute_report, frame_rows, has_summary_table, summary_sql
+from rollup import rollup_aggregate_query
+from schema_catalog import CATALOG
+from result_cache import ResultCache, db_generation
+from db_pool import ConnectionPool, enable_wal
+from json_rows import encode_rows
+from streaming import DEFAULT_BATCH_SIZE, STREAM_FORMATS, iter_format
+from columnar import COLUMNAR_FORMATS, encode_frame
+from compression import MIN_SIZE, available_encodings, compress, compress_stream, compressible, negotiate
+from excel_stream import stage_sheet
+from sources import HttpSource, LocalFileSource, SharePointSource, SourceSnapshot
+from scheduler import DatabaseWatcher, RefreshScheduler, rebuild_derived_tables
+from metrics import (
+    PHASE_SECONDS, REGISTRY, REQUESTS, REQUEST_SECONDS, RESPONSE_BYTES, begin_request, bind, count_bytes,
+    current as current_timings, end_request, instrument_connection, phase, server_timing,
+)
 
 # Load environment variables from .env for configuration
 load_dotenv()
 
+# Toggle reading data from SharePoint instead of local/SQLite
+USE_SP = os.getenv('USE_SHAREPOINT', 'false').lower() in ('1', 'true', 'yes')
+
+# Base paths for locating data files
+BASE_DIR = os.path.dirname(__file__)
+DATA_PATH = os.path.join(BASE_DIR, 'dummy_data.xlsx')
+# SQLITE_DB / USERS_DB point the app at other databases (e.g. a benchmark build)
+SQLITE_DB = os.getenv('SQLITE_DB') or os.path.join(BASE_DIR, 'dummy_data.db')
+USERS_DB = os.getenv('USERS_DB') or os.path.join(BASE_DIR, 'users.db')
+
+# Per-thread reusable connections (see db_pool.py); analytics is read-only
+ANALYTICS_POOL = ConnectionPool(SQLITE_DB, read_only=True, on_open=instrument_connection)
+USERS_POOL = ConnectionPool(USERS_DB)
+
 def init_db():
     # Create users table if it does not already exist
-    conn = sqlite3.connect('users.db')
+    conn = sqlite3.connect(USERS_DB)
     c = conn.cursor()
     c.execute('CREATE TABLE IF NOT EXISTS users (\n            id INTEGER PRIMARY KEY AUTOINCREMENT,\n            email TEXT UNIQUE NOT NULL,\n            password TEXT NOT NULL,\n            role TEXT NOT NULL\n        )')
     conn.commit()
     conn.close()
+    # WAL lets logins proceed while users register; the analytics DB is
+    # replaced whole by the ETL (db_swap.py) and stays in rollback mode
+    enable_wal(USERS_DB)
 
 # Initialize database on module import
 init_db()
 
-# Toggle reading data from SharePoint instead of local/SQLite
-USE_SP = os.getenv('USE_SHAREPOINT', 'false').lower() in ('1', 'true', 'yes')
-print('DEBUG: USE_SHAREPOINT =', USE_SP)
-
-# Base paths for locating data files
-BASE_DIR = os.path.dirname(__file__)
-DATA_PATH = os.path.join(BASE_DIR, 'dummy_data.xlsx')
-SQLITE_DB = os.path.join(BASE_DIR, 'dummy_data.db')
-
 # Optional defaults and SharePoint credentials
 DEFAULT_SQLITE_TABLE = os.getenv('DEFAULT_SQLITE_TABLE')
 SP_CLIENT_ID = os.getenv('SP_CLIENT_ID')
 SP_CLIENT_SECRET = os.getenv('SP_CLIENT_SECRET')
 SP_SITE_URL = os.getenv('SP_SITE_URL')
 SP_FILE_PATH = os.getenv('SP_FILE_PATH')
+# Serve the workbook from this URL instead of SharePoint (e.g. a local stand-in file server)
+SOURCE_URL = os.getenv('SOURCE_URL')
+
+# Rebuild dummy_data.db whenever dummy_data.xlsx changes (local mode; off by default
+# because the DB may have been loaded from another workbook)
+AUTO_REFRESH_EXCEL = os.getenv('AUTO_REFRESH_EXCEL', 'false').lower() in ('1', 'true', 'yes')
+SOURCE_CHECK_INTERVAL = float(os.getenv('SOURCE_CHECK_INTERVAL', os.getenv('SP_CHECK_INTERVAL', '60')))
+
+# In SharePoint mode every endpoint reads a local SQLite snapshot of the workbook,
+# rebuilt when the remote file changes (checked at most every SOURCE_CHECK_INTERVAL seconds)
+if USE_SP:
+    SNAPSHOT = SourceSnapshot(
+        HttpSource(SOURCE_URL) if SOURCE_URL else SharePointSource(SP_SITE_URL, SP_CLIENT_ID, SP_CLIENT_SECRET, SP_FILE_PATH),
+        SQLITE_DB, check_interval=SOURCE_CHECK_INTERVAL)
+elif AUTO_REFRESH_EXCEL:
+    SNAPSHOT = SourceSnapshot(LocalFileSource(DATA_PATH), SQLITE_DB, check_interval=SOURCE_CHECK_INTERVAL)
+else:
+    SNAPSHOT = None
+
+# Background refresh (see scheduler.py, started by create_app / gunicorn.conf.py):
+# polls the source and dummy_data.db, rebuilds derived tables, re-warms the caches
+SCHEDULER = RefreshScheduler()
+DB_WATCHER = DatabaseWatcher(SQLITE_DB)
+DB_CHECK_INTERVAL = float(os.getenv('DB_CHECK_INTERVAL', '2'))
+REFRESH_SCHEDULER = os.getenv('REFRESH_SCHEDULER', 'true').lower() in ('1', 'true', 'yes')
+
+# Serialized report results, invalidated when dummy_data.db is rewritten
+REPORT_CACHE = ResultCache(
+    maxsize=int(os.getenv('REPORT_CACHE_SIZE', '64')),
+    ttl=float(os.getenv('REPORT_CACHE_TTL', '300')),
+)
+
+# Compressed copies of static files: (path, encoding) -> (mtime_ns, size, body)
+STATIC_VARIANTS = {}
+
+# Reports behind each landing dashboard, keyed by their name in /api/dashboard/<role>
+DASHBOARD_REPORTS = {
+    'leader': {
+        'application_status': 'v_application_status_totals',
+        'deferred_offers': 'v_deferred_offers_overview',
+        'agent_performance': 'v_agent_performance',
+        'student_classification': 'v_student_classification',
+    },
+    'manager': {
+        'current_vs_enrolled': 'v_current_vs_enrolled',
+        'enrolled_vs_offer': 'v_enrolled_vs_offer',
+        'visa_breakdown': 'v_visa_breakdown',
+        'offer_expiry_surge': 'v_offer_expiry_surge_daily',
+    },
+}
+
+# Server-Timing header on /api/* responses; /metrics requires "Authorization: Bearer <METRICS_TOKEN>" if set
+SERVER_TIMING = os.getenv('SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes')
+METRICS_TOKEN = os.getenv('METRICS_TOKEN')
+REPORT_CACHE_LOOKUPS = REGISTRY.counter('report_cache_lookups_total', 'REPORT_CACHE lookups by report and result.',
+                                        ('view', 'result'))
+
+# Cache-Control max-age for /api/* data; 0 makes clients revalidate (cheap 304s) on every load
+API_CACHE_MAX_AGE = int(os.getenv('API_CACHE_MAX_AGE', '0'))
+
+# Long-lived worker threads, so each keeps its pooled analytics connection between requests
+DASHBOARD_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv('DASHBOARD_WORKERS', '4')),
+    thread_name_prefix='dashboard',
+)
 
 # Create Flask app instance
 app = Flask(__name__, static_folder='static', static_url_path='/static', template_folder='templates')
@@ -59,48 +156,115 @@ def _first_user_table(conn: sqlite3.Connection) -> Optional[str]:
     row = cur.fetchone()
     return row[0] if row else None
 
+def _resolve_table_name(conn: sqlite3.Connection, table_or_view: Optional[str]) -> str:
+    # Pick the requested table/view, the configured default, or the first user table
+    if table_or_view:
+        safe_name = _safe_sql_identifier(table_or_view)
+        if not safe_name:
+            raise ValueError('Invalid table/view name (use lowercase letters, digits, underscores only).')
+        return safe_name
+    if DEFAULT_SQLITE_TABLE:
+        safe_name = _safe_sql_identifier(DEFAULT_SQLITE_TABLE)
+        if not safe_name:
+            raise ValueError('DEFAULT_SQLITE_TABLE is not a safe identifier.')
+        return safe_name
+    first_table = _first_user_table(conn)
+    if not first_table:
+        raise RuntimeError('No user tables found in SQLite DB.')
+    return first_table
+
+def _analytics_conn() -> sqlite3.Connection:
+    # This thread's pooled analytics connection (the 'connect' phase in Server-Timing)
+    with phase('connect'):
+        return ANALYTICS_POOL.get()
+
 def _read_sqlite(table_or_view: Optional[str]) -> pd.DataFrame:
     # Load data from the SQLite database
     if not os.path.exists(SQLITE_DB):
         raise FileNotFoundError(f'SQLite DB not found at {SQLITE_DB}')
-    with sqlite3.connect(SQLITE_DB) as conn:
-        if table_or_view:
-            safe_name = _safe_sql_identifier(table_or_view)
-            if not safe_name:
-                raise ValueError('Invalid table/view name (use lowercase letters, digits, underscores only).')
-            query = f'SELECT * FROM "{safe_name}"'
-        elif DEFAULT_SQLITE_TABLE:
-            safe_name = _safe_sql_identifier(DEFAULT_SQLITE_TABLE)
-            if not safe_name:
-                raise ValueError('DEFAULT_SQLITE_TABLE is not a safe identifier.')
-            query = f'SELECT * FROM "{safe_name}"'
-        else:
-            first_table = _first_user_table(conn)
-            if not first_table:
-                raise RuntimeError('No user tables found in SQLite DB.')
-            query = f'SELECT * FROM "{first_table}"'
-        df = pd.read_sql_query(query, conn)
-    return df
-
-def _read_sharepoint_excel() -> pd.DataFrame:
-    # Download and read Excel data from SharePoint
-    if not (SP_CLIENT_ID and SP_CLIENT_SECRET and SP_SITE_URL and SP_FILE_PATH):
-        raise RuntimeError('SharePoint env vars missing: SP_CLIENT_ID, SP_CLIENT_SECRET, SP_SITE_URL, SP_FILE_PATH')
+    conn = _analytics_conn()
+    name = _resolve_table_name(conn, table_or_view)
+    with phase('frame'):
+        return pd.read_sql_query(f'SELECT * FROM "{name}"', conn)
+
+def _query_data(conn: sqlite3.Connection, table: str, args):
+    # Run a filtered/projected/paginated /api/data query; returns (df, next_cursor)
+    sql, params, limit = build_data_query(conn, table, args)
+    with phase('frame'):
+        df = pd.read_sql_query(sql, conn, params=params)
+    return split_page(df, limit)
+
+def _fetch_rows(conn: sqlite3.Connection, sql: str, params=()):
+    # (column names, row tuples) of a query, without a DataFrame
+    with phase('fetch'):
+        cur = conn.execute(sql, params)
+        return [d[0] for d in cur.description], cur.fetchall()
+
+def _records_response(columns, rows):
+    # JSON array of row objects encoded straight from cursor rows (see json_rows.py)
+    with phase('serialize'):
+        return app.response_class(encode_rows(columns, rows), mimetype='application/json')
+
+def _query_records(conn: sqlite3.Connection, table: str, args):
+    # The record format of /api/data; NULLs become 0 in SQL (fill_nulls). Returns (response, next_cursor)
+    sql, params, limit = build_data_query(conn, table, args, fill_nulls=True)
+    columns, rows, next_cursor = split_rows(*_fetch_rows(conn, sql, params), limit)
+    return _records_response(columns, rows), next_cursor
+
+def _stream_data(conn: sqlite3.Connection, table: str, args, fmt: str):
+    # Stream query results batch by batch instead of building a DataFrame
+    if args.get('limit') or args.get('after'):
+        raise ValueError('Pagination is not supported with streaming formats; use format=json.')
+    sql, params, _ = build_data_query(conn, table, args, fill_nulls=True)
+    cur = conn.execute(sql, params)
     try:
-        from office365.runtime.auth.client_credential import ClientCredential
-        from office365.sharepoint.client_context import ClientContext
-    except Exception as e:
-        raise RuntimeError('office365-rest-python-client not installed. pip install office365-rest-python-client') from e
-    creds = ClientCredential(SP_CLIENT_ID, SP_CLIENT_SECRET)
-    ctx = ClientContext(SP_SITE_URL).with_credentials(creds)
-    response = ctx.web.get_file_by_server_relative_url(SP_FILE_PATH).download().execute_query()
-    return pd.read_excel(BytesIO(response.content), sheet_name=0)
-
-def _read_local_excel() -> pd.DataFrame:
-    # Read Excel data from local path
+        batch_size = max(1, int(args.get('batch', DEFAULT_BATCH_SIZE)))
+    except ValueError:
+        raise ValueError('batch must be an integer.')
+    return app.response_class(iter_format(fmt, cur, batch_size), mimetype=STREAM_FORMATS[fmt])
+
+def _columnar_response(df: pd.DataFrame, fmt: str):
+    # Column-oriented body (see columnar.py); nulls stay null
+    with phase('serialize'):
+        body = encode_frame(df, fmt)
+    return app.response_class(body, mimetype=COLUMNAR_FORMATS[fmt])
+
+# Without dummy_data.db, /api/data and /api/aggregate query the workbook's first sheet,
+# staged once per workbook version into a temp SQLite file (one pool per staged file)
+_EXCEL_STAGE = {'key': None, 'path': None, 'pool': None}
+_EXCEL_STAGE_LOCK = threading.Lock()
+
+def _stage_excel() -> Tuple[sqlite3.Connection, str]:
+    # This thread's connection to the staged workbook and its table name. The sheet is streamed
+    # into the file in batches (see excel_stream.py) only when the workbook changed on disk.
     if not os.path.exists(DATA_PATH):
         raise FileNotFoundError(f'Excel file not found at {DATA_PATH}')
-    return pd.read_excel(DATA_PATH, sheet_name=0)
+    st = os.stat(DATA_PATH)
+    key = hashlib.sha1(f'{os.path.abspath(DATA_PATH)}|{st.st_ino}|{st.st_size}|{st.st_mtime_ns}'.encode()).hexdigest()[:16]
+    with _EXCEL_STAGE_LOCK:
+        if _EXCEL_STAGE['key'] != key:
+            path = os.path.join(tempfile.gettempdir(), f'dashboard-excel-{key}.db')
+            if not os.path.exists(path):
+                with phase('stage'):
+                    tmp = f'{path}.{os.getpid()}.tmp'
+                    conn = sqlite3.connect(tmp)
+                    try:
+                        stage_sheet(conn, DATA_PATH, 'sheet')
+                        conn.commit()
+                    finally:
+                        conn.close()
+                    os.replace(tmp, path)
+            old_path, old_pool = _EXCEL_STAGE['path'], _EXCEL_STAGE['pool']
+            _EXCEL_STAGE.update(key=key, path=path,
+                                pool=ConnectionPool(path, read_only=True, on_open=instrument_connection))
+            if old_pool is not None:
+                old_pool.close_all()
+                try:
+                    os.remove(old_path)
+                except OSError:
+                    pass
+        pool = _EXCEL_STAGE['pool']
+    return pool.get(), 'sheet'
 
 def role_required(role: str):
     # Decorator enforcing that the session user has the given role
@@ -113,6 +277,148 @@ def role_required(role: str):
         return wrapped
     return decorator
 
+def _data_etag() -> Optional[Tuple[str, int]]:
+    # (strong ETag, mtime) for this request against the current analytics DB file; None if unversioned.
+    # Uses only os.stat (db_generation), never SQLite.
+    if not os.path.exists(SQLITE_DB):
+        return None
+    generation = db_generation(SQLITE_DB)
+    if generation[0] is None:
+        return None
+    # The negotiated content-coding is part of the key: each encoding is its own representation
+    encoding = negotiate(request.accept_encodings)
+    key = repr((generation, request.path, sorted(request.args.items(multi=True)), encoding))
+    return hashlib.sha1(key.encode('utf-8')).hexdigest(), generation[0][2] // 10**9
+
+def conditional_get(func):
+    # Decorator adding ETag / Last-Modified / Cache-Control to a data endpoint and
+    # answering a matching If-None-Match (or If-Modified-Since) with 304 up front
+    @wraps(func)
+    def wrapped(*args, **kwargs):
+        tag = _data_etag()
+        if tag is None:
+            return func(*args, **kwargs)
+        etag, mtime = tag
+        if request.if_none_match:
+            fresh = request.if_none_match.contains(etag)
+        else:
+            since = request.if_modified_since
+            fresh = since is not None and since.timestamp() >= mtime
+        resp = app.response_class(status=304) if fresh else app.make_response(func(*args, **kwargs))
+        if resp.status_code in (200, 304):
+            resp.set_etag(etag)
+            resp.last_modified = mtime
+            resp.headers['Cache-Control'] = f'private, max-age={API_CACHE_MAX_AGE}, must-revalidate'
+        return resp
+    return wrapped
+
+@app.before_request
+def start_request_metrics():
+    # Per-request phase timings (see metrics.py); registered first so it covers the other hooks
+    begin_request()
+
+@app.before_request
+def scope_schema_checks():
+    # Schema catalog lookups check the database file once per connection and table per request
+    CATALOG.begin_request()
+
+@app.teardown_request
+def end_schema_checks(exc):
+    CATALOG.end_request()
+
+@app.before_request
+def refresh_snapshot():
+    # Snapshot mode: a request never checks the source or rebuilds the snapshot itself, it reads
+    # the last published one. Without the scheduler (REFRESH_SCHEDULER=false) a due check is
+    # handed to a background thread. Until the first snapshot is published /api/* answers 503.
+    if SNAPSHOT is None or not request.path.startswith('/api/'):
+        return
+    if not SCHEDULER.running and SNAPSHOT.due():
+        _start_snapshot_refresh()
+    if not os.path.exists(SQLITE_DB):
+        resp = jsonify({'error': 'The data snapshot is still being built. Try again shortly.'})
+        resp.headers['Retry-After'] = '5'
+        return resp, 503
+
+@app.after_request
+def record_request_metrics(resp):
+    # Registered before the other after_request hooks, so it runs last: per-route counters,
+    # phase histograms, bytes sent (after compression) and a Server-Timing header on /api/*
+    timings = end_request()
+    if timings is None:
+        return resp
+    total = time.perf_counter() - timings.start
+    endpoint = request.endpoint or 'unmatched'
+    REQUESTS.inc(endpoint=endpoint, method=request.method, status=resp.status_code)
+    REQUEST_SECONDS.observe(total, endpoint=endpoint)
+    for name, seconds in timings.phases.items():
+        PHASE_SECONDS.observe(seconds, endpoint=endpoint, phase=name)
+    if resp.is_streamed and not resp.direct_passthrough:
+        resp.response = count_bytes(resp.response, endpoint)
+    elif resp.content_length is not None:
+        RESPONSE_BYTES.inc(resp.content_length, endpoint=endpoint)
+    if SERVER_TIMING and request.path.startswith('/api/'):
+        resp.headers['Server-Timing'] = server_timing(timings, total)
+    return resp
+
+@app.after_request
+def compress_response(resp):
+    # Negotiated compression for /api/* bodies; report routes arrive already encoded
+    # from their cache entry (see _report_response), streams are compressed chunk by chunk
+    if not request.path.startswith('/api/'):
+        return resp
+    resp.vary.add('Accept-Encoding')
+    if resp.status_code != 200 or resp.direct_passthrough or 'Content-Encoding' in resp.headers:
+        return resp
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None or not compressible(resp.mimetype):
+        return resp
+    if resp.is_streamed:
+        resp.response = compress_stream(resp.response, encoding)
+        resp.headers.pop('Content-Length', None)
+    else:
+        body = resp.get_data()
+        if len(body) < MIN_SIZE:
+            return resp
+        with phase('compress'):
+            resp.set_data(compress(body, encoding))
+    resp.headers['Content-Encoding'] = encoding
+    return resp
+
+def static_file(filename):
+    # Flask's static view, except that compressible files (custom_dashboard.js, chartLoader.js, ...)
+    # are served from a copy compressed once per file version (STATIC_VARIANTS)
+    path = safe_join(app.static_folder, filename)
+    mimetype = mimetypes.guess_type(filename)[0]
+    if path is None or not os.path.isfile(path) or not compressible(mimetype):
+        return app.send_static_file(filename)
+    st = os.stat(path)
+    encoding = negotiate(request.accept_encodings)
+    if encoding is None or st.st_size < MIN_SIZE:
+        resp = app.send_static_file(filename)
+        resp.vary.add('Accept-Encoding')
+        return resp
+    cached = STATIC_VARIANTS.get((path, encoding))
+    if cached is None or cached[:2] != (st.st_mtime_ns, st.st_size):
+        with open(path, 'rb') as f, phase('compress'):
+            cached = (st.st_mtime_ns, st.st_size, compress(f.read(), encoding, stored=True))
+        STATIC_VARIANTS[(path, encoding)] = cached
+    resp = app.response_class(cached[2], mimetype=mimetype)
+    resp.headers['Content-Encoding'] = encoding
+    resp.vary.add('Accept-Encoding')
+    resp.set_etag(f'{st.st_mtime_ns:x}-{st.st_size:x}-{encoding}')
+    resp.last_modified = int(st.st_mtime)
+    # Same caching headers send_file would set
+    max_age = app.get_send_file_max_age(filename)
+    if max_age:
+        resp.cache_control.public = True
+        resp.cache_control.max_age = max_age
+    else:
+        resp.cache_control.no_cache = True
+    return resp.make_conditional(request)
+
+app.view_functions['static'] = static_file
+
 @app.route('/managerial')
 @role_required('Manager')
 def dashboard():
@@ -266,7 +572,7 @@ def register():
             return redirect(url_for('register'))
         # Store new user
         hashed_pw = generate_password_hash(password)
-        conn = sqlite3.connect('users.db')
+        conn = USERS_POOL.get()
         try:
             c = conn.cursor()
             c.execute('INSERT INTO users (email, password, role) VALUES (?, ?, ?)', (email, hashed_pw, role))
@@ -275,6 +581,7 @@ def register():
             session['role'] = role
             return redirect(url_for('welcome'))
         except sqlite3.IntegrityError:
+            conn.rollback()
             c = conn.cursor()
             c.execute('SELECT role FROM users WHERE email = ?', (email,))
             result = c.fetchone()
@@ -283,8 +590,6 @@ def register():
             else:
                 flash('This email is already registered', 'error')
             return redirect(url_for('register'))
-        finally:
-            conn.close()
     return render_template('registration-page.html')
 
 @app.route('/login', methods=['GET', 'POST'])
@@ -296,11 +601,9 @@ def login():
         if not email or not password:
             flash('Email and password are required.', 'error')
             return redirect(url_for('login'))
-        conn = sqlite3.connect('users.db')
-        c = conn.cursor()
+        c = USERS_POOL.get().cursor()
         c.execute('SELECT password, role FROM users WHERE email = ?', (email,))
         result = c.fetchone()
-        conn.close()
         if result:
             stored_password, role = result
             if check_password_hash(stored_password, password):
@@ -320,354 +623,367 @@ def logout():
     return redirect(url_for('landing'))
 
 @app.route('/api/data')
+@conditional_get
 def api_data():
-    # Provide tabular data as JSON from available source
+    # Provide tabular data as JSON from available source.
+    # Projection, filters, sort and keyset pagination are compiled to SQL (see data_query.py).
+    # format=ndjson / format=json-stream stream rows from the cursor (see streaming.py).
+    # format=columnar / format=arrow return a column-oriented body (see columnar.py).
     try:
-        if USE_SP:
-            df = _read_sharepoint_excel()
-        elif os.path.exists(SQLITE_DB):
-            table_param = request.args.get('table')
-            df = _read_sqlite(table_param)
+        fmt = request.args.get('format', 'json')
+        if fmt != 'json' and fmt not in STREAM_FORMATS and fmt not in COLUMNAR_FORMATS:
+            raise ValueError(f'Unsupported format: {fmt}')
+        if not os.path.exists(SQLITE_DB):
+            # Query the staged workbook so the same SQL path applies
+            conn, table = _stage_excel()
+        else:
+            conn = _analytics_conn()
+            table = _resolve_table_name(conn, request.args.get('table'))
+        if fmt in STREAM_FORMATS:
+            return _stream_data(conn, table, request.args, fmt)
+        if fmt in COLUMNAR_FORMATS:
+            df, next_cursor = _query_data(conn, table, request.args)
+            resp = _columnar_response(df, fmt)
         else:
-            df = _read_local_excel()
-        df = df.fillna(0)
-        return (jsonify(df.to_dict(orient='records')), 200)
+            resp, next_cursor = _query_records(conn, table, request.args)
+        if next_cursor:
+            resp.headers['X-Next-Cursor'] = next_cursor
+        return (resp, 200)
+    except ValueError as e:
+        return (jsonify({'error': str(e)}), 400)
     except Exception as e:
         return (jsonify({'error': str(e)}), 500)
 
-def _json_from_view(view_name: str):
-    """
-    Return JSON from a database view with SQL fallbacks.
+def _aggregate(conn: sqlite3.Connection, table: str, args):
+    # Answer from the table's rollup when it covers the request (see rollup.py), else scan the table
+    with phase('frame'):
+        query = rollup_aggregate_query(conn, table, args)
+        return run_aggregate(conn, table, args, query), 'rollup' if query else 'table'
 
-    This version is robust to schema differences. In particular, it
-    dynamically resolves the visa status column for v_visa_breakdown
-    to avoid 500s when the column is named e.g. 'Visa Status' or 'Visa'.
-    """
-    # --- small helpers (scoped to this function) ---
-    def _table_columns(conn, table="reportdata"):
-        cur = conn.execute(f"PRAGMA table_info({table})")
-        cols = [row[1] for row in cur.fetchall()]
-        return cols, {c.lower(): c for c in cols}  # map lower->actual
-
-    def _resolve_col(conn, candidates, table="reportdata"):
-        """Return the actual column name (case/spacing tolerant) that exists."""
-        cols, lower_map = _table_columns(conn, table)
-        for cand in candidates:
-            # try exact, then case-insensitive
-            if cand in cols:
-                return cand
-            lc = cand.lower()
-            if lc in lower_map:
-                return lower_map[lc]
-        return None
-
-    def _q(colname):
-        """Quote identifier for SQLite (handles spaces/special chars)."""
-        # Using [] quoting works in SQLite for odd names
-        return f"[{colname}]"
-
-    # Fallback queries that don't depend on fragile column names
-def _json_from_view(view_name: str):
-    """
-    Return JSON from a database view with SQL fallbacks.
-    - Handles both 'no such table' and 'no such view'
-    - Dynamically resolves visa column for v_visa_breakdown
-    """
-    def _table_columns(conn, table="reportdata"):
-        cur = conn.execute(f"PRAGMA table_info({table})")
-        cols = [row[1] for row in cur.fetchall()]
-        lower_map = {c.lower(): c for c in cols}
-        return cols, lower_map
-
-    def _find_column(conn, candidates, table="reportdata"):
-        cols, lower_map = _table_columns(conn, table)
-        # exact / case-insensitive candidates first
-        for cand in candidates:
-            if cand in cols:
-                return cand
-            if cand.lower() in lower_map:
-                return lower_map[cand.lower()]
-        # then anything that contains the substring (e.g., 'Visa Status', 'visa_type')
-        for c in cols:
-            if "visa" in c.lower():
-                return c
-        return None
-
-    def _q(name):
-        # bracket quoting works fine for SQLite identifiers with spaces
-        return f"[{name}]"
-def _json_from_view(view_name: str):
-    """
-    Return JSON from a database view with SQL fallbacks.
-    - Handles 'no such table' and 'no such view'
-    - Dynamically resolves visa column for v_visa_breakdown
-    - Dynamically resolves offer expiry date column for v_offer_expiry_surge*
-      and aggregates using pandas (robust to Excel-style dates)
-    """
-    # ---- helpers -------------------------------------------------------------
-    def _table_columns(conn, table="reportdata"):
-        cur = conn.execute(f"PRAGMA table_info({table})")
-        cols = [row[1] for row in cur.fetchall()]
-        lower_map = {c.lower(): c for c in cols}
-        return cols, lower_map
-
-    def _find_column(conn, candidates, table="reportdata"):
-        cols, lower_map = _table_columns(conn, table)
-        # exact / case-insensitive first
-        for cand in candidates:
-            if cand in cols:
-                return cand
-            if cand.lower() in lower_map:
-                return lower_map[cand.lower()]
-        # then any column containing the token
-        tokens = [c.lower() for c in candidates if c]
-        for c in cols:
-            lc = c.lower()
-            if any(tok.replace(" ", "") in lc.replace(" ", "") for tok in tokens):
-                return c
-        return None
-
-    def _q(name):
-        # Quote identifiers with spaces/special chars for SQLite
-        return f"[{name}]"
-
-    FALLBACK_QUERIES = {
-        'v_application_status_totals': """
-            SELECT COALESCE(status,'Unknown') AS status,
-                   COUNT(*) AS total
-            FROM reportdata
-            GROUP BY COALESCE(status,'Unknown')
-            ORDER BY total DESC
-        """,
-        'v_deferred_offers_overview': """
-            SELECT COALESCE(previous_offer_intake || ' ' || previous_offer_year, 'Unknown') AS term,
-                   SUM(CASE
-                         WHEN LOWER(COALESCE(is_the_offer_deferred,'')) IN ('1','y','yes','true') THEN 1
-                         WHEN status = 'Deferred' THEN 1
-                         ELSE 0 END) AS deferred_count,
-                   COUNT(*) AS total_offers
-            FROM reportdata
-            GROUP BY term
-            ORDER BY term
-        """,
-        'v_agent_performance': """
-            SELECT COALESCE(agentname,'Unknown') AS agent,
-                   SUM(CASE WHEN status='New Application Request' THEN 1 ELSE 0 END) AS applications,
-                   SUM(CASE WHEN status='Offered' THEN 1 ELSE 0 END) AS offers,
-                   SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
-            FROM reportdata
-            GROUP BY agent
-            ORDER BY enrolled DESC, offers DESC, applications DESC
-        """,
-        'v_student_classification': """
-            SELECT COALESCE(coursetype,'Unknown') AS classification,
-                   COUNT(*) AS total
-            FROM reportdata
-            GROUP BY COALESCE(coursetype,'Unknown')
-            ORDER BY total DESC
-        """,
-        'v_current_vs_enrolled': """
-            SELECT strftime('%Y', date(startdate)) AS term,
-                   SUM(CASE WHEN status='Current Student' THEN 1 ELSE 0 END) AS current_students,
-                   SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
-            FROM reportdata
-            WHERE startdate IS NOT NULL AND trim(startdate) <> ''
-            GROUP BY term
-            ORDER BY term
-        """,
-        'v_enrolled_vs_offer': """
-            SELECT strftime('%Y', date(startdate)) AS term,
-                   SUM(CASE WHEN status='Offered' THEN 1 ELSE 0 END) AS offers,
-                   SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
-            FROM reportdata
-            WHERE startdate IS NOT NULL AND trim(startdate) <> ''
-            GROUP BY term
-            ORDER BY term
-        """,
-        # We will handle v_visa_breakdown and v_offer_expiry_* dynamically below
-    }
-
-    # ---- main logic ----------------------------------------------------------
+@app.route('/api/aggregate')
+@conditional_get
+def api_aggregate():
+    # Grouped series for the custom dashboard (x dimension, y measure, filters) computed in SQLite
     try:
-        df = _read_sqlite(view_name)  # try a database view first
+        if not os.path.exists(SQLITE_DB):
+            result, source = _aggregate(*_stage_excel(), request.args)
+        else:
+            conn = _analytics_conn()
+            table = _resolve_table_name(conn, request.args.get('table'))
+            result, source = _aggregate(conn, table, request.args)
+        with phase('serialize'):
+            resp = jsonify(result)
+        resp.headers['X-Aggregate-Source'] = source
+        return (resp, 200)
+    except AggregateTooWide as e:
+        return (jsonify({'error': str(e)}), 422)
+    except ValueError as e:
+        return (jsonify({'error': str(e)}), 400)
     except Exception as e:
-        msg = str(e).lower()
-        if ('no such table' not in msg) and ('no such view' not in msg):
-            # real error -> bubble up
-            raise
-
-        with sqlite3.connect(SQLITE_DB) as conn:
-            # ---- dynamic VISA BREAKDOWN --------------------------------------
-            if view_name == 'v_visa_breakdown':
-                visa_col = _find_column(conn,
-                    ['visa_type', 'visa_status', 'Visa Type', 'Visa Status', 'visa', 'Visa']
-                )
-                if not visa_col:
-                    df = pd.DataFrame(columns=['visa_type', 'total'])
-                else:
-                    qc = _q(visa_col)
-                    query = f"""
-                        SELECT COALESCE({qc}, 'Unknown') AS visa_type,
-                               COUNT(*) AS total
-                        FROM reportdata
-                        GROUP BY COALESCE({qc}, 'Unknown')
-                        ORDER BY total DESC
-                    """
-                    df = pd.read_sql_query(query, conn)
-
-             # ---- dynamic OFFER EXPIRY (DAILY/MONTHLY) ------------------------
-            elif view_name in ('v_offer_expiry_surge_daily',
-                               'v_offer_expiry_surge_monthly',
-                               'v_offer_expiry_surge'):
-                exp_col = _find_column(conn,
-                    ['offer_expiry_date', 'Offer Expiry Date', 'expiry_date', 'Expiry Date', 'offer expiry']
-                )
-                if not exp_col:
-                    if view_name == 'v_offer_expiry_surge_monthly':
-                        df = pd.DataFrame(columns=['expiry_month', 'expiring_offers'])
-                    else:
-                        df = pd.DataFrame(columns=['expiry_day', 'expiring_offers'])
-                else:
-                    qc = _q(exp_col)
-                    raw = pd.read_sql_query(
-                        f"SELECT {qc} AS raw_date FROM reportdata "
-                        f"WHERE {qc} IS NOT NULL AND trim({qc}) <> ''",
-                        conn
-                    )
-                    raw['raw_date'] = pd.to_datetime(raw['raw_date'], errors='coerce', dayfirst=True)
-                    raw = raw.dropna(subset=['raw_date'])
-
-                    if view_name == 'v_offer_expiry_surge_monthly':
-                        raw['expiry_month'] = raw['raw_date'].dt.strftime('%Y-%m')
-                        df = (raw.groupby('expiry_month')
-                                .size().reset_index(name='expiring_offers')
-                                .sort_values('expiry_month'))
-                    else:
-                        raw['expiry_day'] = raw['raw_date'].dt.strftime('%Y-%m-%d')
-                        df = (raw.groupby('expiry_day')
-                                .size().reset_index(name='expiring_offers')
-                                .sort_values('expiry_day'))
-                        # ---- dynamic DEFERRED OFFERS OVERVIEW ----------------------------
-            elif view_name == 'v_deferred_offers_overview':
-                # Resolve likely column names in your DB
-                intake_col = _find_column(conn, [
-                    'Previous Offer Intake', 'Offer Intake', 'Intake', 'Trimester', 'Semester'
-                ])
-                year_col = _find_column(conn, [
-                    'Previous Offer Year', 'Offer Year', 'Year'
-                ])
-                status_col = _find_column(conn, [
-                    'Status', 'Offer Status', 'application_status'
-                ])
-                flag_col = _find_column(conn, [
-                    'Is the Offer Deferred', 'is_the_offer_deferred', 'Offer Deferred', 'Deferred'
-                ])
-                term_col = _find_column(conn, ['term', 'Term'])
-
-                # Pull minimum necessary raw data
-                if intake_col and year_col:
-                    sel = [f"{_q(intake_col)} AS intake", f"{_q(year_col)} AS year"]
-                elif term_col:
-                    sel = [f"{_q(term_col)} AS term"]
-                else:
-                    # Nothing we can form a term from
-                    df = pd.DataFrame(columns=['term', 'deferred_count', 'total_offers'])
-                    # fall through to the post-processing at the end of the function
-                    return jsonify(df.to_dict(orient='records')), 200
-
-                if status_col:
-                    sel.append(f"{_q(status_col)} AS status")
-                if flag_col:
-                    sel.append(f"{_q(flag_col)} AS flag")
-
-                raw = pd.read_sql_query(f"SELECT {', '.join(sel)} FROM reportdata", conn)
-
-                # Build term
-                if 'term' not in raw.columns:
-                    raw['term'] = raw['intake'].astype(str).str.strip() + ' ' + raw['year'].astype(str).str.strip()
-                raw['term'] = raw['term'].astype(str).str.strip()
-
-                # Determine 'deferred'
-                if 'flag' in raw.columns:
-                    s = raw['flag'].astype(str).str.strip().str.lower()
-                    is_deferred = s.isin(['1','true','t','y','yes'])
-                elif 'status' in raw.columns:
-                    s = raw['status'].astype(str).str.strip().str.lower()
-                    is_deferred = s.str.startswith('deferred')
-                else:
-                    is_deferred = pd.Series(False, index=raw.index)
-
-                # Aggregate
-                grp = (
-                    pd.DataFrame({'term': raw['term'], 'is_def': is_deferred})
-                      .groupby('term', dropna=False)['is_def']
-                      .agg(deferred_count='sum', total_offers='size')
-                      .reset_index()
-                )
-
-                # Add common aliases some front-ends expect
-                grp['deferred'] = grp['deferred_count'].astype(int)
-                grp['total'] = grp['total_offers'].astype(int)
-
-                # Drop 'Unknown' buckets
-                mask = grp['term'].astype(str).str.strip().str.lower().ne('unknown')
-                df = grp[mask]
-
-
-            # ---- generic fallbacks -------------------------------------------
-            else:
-                query = FALLBACK_QUERIES.get(view_name)
-                if not query:
-                    raise
-                df = pd.read_sql_query(query, conn)
-
-    # Fill numeric 
-    for col in df.select_dtypes(include=['float', 'int']).columns:
-        df[col] = df[col].fillna(0)
+        return (jsonify({'error': str(e)}), 500)
 
-    return jsonify(df.to_dict(orient='records')), 200
+def _json_from_view(view_name: str, fmt: str = 'json'):
+    # Serve a report from its summary table (built by the ETL, see reports.py), encoded
+    # straight from the cursor. Databases loaded before summary tables existed derive
+    # the report from reportdata with pandas. Both give columns in report order and
+    # numeric NULLs as 0 (summary_sql / compute_report).
+    if not os.path.exists(SQLITE_DB):
+        raise FileNotFoundError(f'SQLite DB not found at {SQLITE_DB}')
+    conn = _analytics_conn()
+    summary = has_summary_table(conn, view_name)
+    if summary and fmt not in COLUMNAR_FORMATS:
+        return _records_response(*_fetch_rows(conn, summary_sql(conn, view_name))), 200
+    with phase('frame'):
+        if summary:
+            df = pd.read_sql_query(summary_sql(conn, view_name), conn)
+        else:
+            df = compute_report(conn, view_name)
+    if fmt in COLUMNAR_FORMATS:
+        return _columnar_response(df, fmt), 200
+    return _records_response(list(df.columns), frame_rows(df)), 200
+
+
+def _cached_report(view_name: str, fmt: str, key) -> Tuple[bytes, str, dict, bool]:
+    # (body, mimetype, compressed variants, cache hit) for a report from REPORT_CACHE,
+    # computed with _json_from_view on a miss. The variants dict ({encoding: bytes}) belongs
+    # to the cache entry and is filled in by _report_response as encodings are requested.
+    generation = db_generation(SQLITE_DB)
+    cached = REPORT_CACHE.get(key, generation)
+    REPORT_CACHE_LOOKUPS.inc(view=view_name, result='hit' if cached is not None else 'miss')
+    if cached is not None:
+        return cached + (True,)
+    resp, _ = _json_from_view(view_name, fmt)
+    entry = (resp.get_data(), resp.mimetype, {})
+    REPORT_CACHE.put(key, generation, entry)
+    return entry + (False,)
+
+
+def _report_variant(body: bytes, mimetype: str, variants: dict, encoding: str) -> Optional[bytes]:
+    # A cached report body in the given encoding, compressed once per cache entry
+    # (i.e. once per data generation); None when the body is sent as-is
+    if len(body) < MIN_SIZE or not compressible(mimetype):
+        return None
+    if encoding not in variants:
+        with phase('compress'):
+            variants[encoding] = compress(body, encoding, stored=True)
+    return variants[encoding]
+
+
+def _report_response(view_name: str):
+    # Serve a report view (cached, see _cached_report)
+    fmt = request.args.get('format', 'json')
+    if fmt != 'json' and fmt not in COLUMNAR_FORMATS:
+        return (jsonify({'error': f'Unsupported format: {fmt}'}), 400)
+    key = (view_name, tuple(sorted(request.args.items(multi=True))))
+    body, mimetype, variants, hit = _cached_report(view_name, fmt, key)
+    resp = app.response_class(body, status=200, mimetype=mimetype)
+    encoding = negotiate(request.accept_encodings)
+    encoded = _report_variant(body, mimetype, variants, encoding) if encoding else None
+    if encoded is not None:
+        resp.set_data(encoded)
+        resp.headers['Content-Encoding'] = encoding
+    resp.headers['X-Cache'] = 'HIT' if hit else 'MISS'
+    return resp
+
+
+def _dashboard_report(view_name: str, timings=None) -> Tuple[bytes, str, dict, bool]:
+    # Runs on DASHBOARD_EXECUTOR; shares cache entries with the plain /api/<report> requests.
+    # Its phases are booked to the submitting request's timings (metrics.bind).
+    with app.app_context(), bind(timings):
+        return _cached_report(view_name, 'json', (view_name, ()))
+
+
+@app.route('/api/dashboard/<role>')
+@conditional_get
+def api_dashboard(role):
+    # Every report of a landing dashboard in one response: {name: rows, ...}.
+    # Reports run concurrently, so the request takes as long as the slowest one;
+    # a report that fails is null and listed under "errors".
+    reports = DASHBOARD_REPORTS.get(role.lower())
+    if reports is None:
+        return (jsonify({'error': f'Unknown dashboard: {role}'}), 404)
+    timings = current_timings()
+    futures = {name: DASHBOARD_EXECUTOR.submit(_dashboard_report, view, timings) for name, view in reports.items()}
+    parts, errors, all_hit = [], {}, True
+    for name, future in futures.items():
+        try:
+            body, _, _, hit = future.result()
+        except Exception as e:
+            body, hit = b'null', False
+            errors[name] = str(e)
+        all_hit = all_hit and hit
+        parts.append(json.dumps(name).encode('utf-8') + b':' + body.strip())
+    if errors:
+        parts.append(b'"errors":' + json.dumps(errors, separators=(',', ':')).encode('utf-8'))
+    resp = app.response_class(b'{' + b','.join(parts) + b'}', status=200, mimetype='application/json')
+    resp.headers['X-Cache'] = 'HIT' if all_hit else 'MISS'
+    return resp
+
+
+@app.route('/api/debug/schema')
+def api_debug_schema():
+    # Inspect how logical report fields resolve to physical columns (signed-in users only)
+    if 'email' not in session:
+        return (jsonify({'error': 'Login required'}), 401)
+    if not os.path.exists(SQLITE_DB):
+        return (jsonify({'error': f'SQLite DB not found at {SQLITE_DB}'}), 404)
+    table = _safe_sql_identifier(request.args.get('table')) or SOURCE_TABLE
+    return (jsonify(CATALOG.describe(_analytics_conn(), table)), 200)
 
+@app.route('/api/debug/refresh')
+def api_debug_refresh():
+    # Background refresh status: per-job runs, last refresh and durations, snapshot source, cache counters
+    if 'email' not in session:
+        return (jsonify({'error': 'Login required'}), 401)
+    return (jsonify({
+        'scheduler': SCHEDULER.stats(),
+        'snapshot': SNAPSHOT.meta() if SNAPSHOT is not None else None,
+        'report_cache': {'entries': len(REPORT_CACHE), 'hits': REPORT_CACHE.hits, 'misses': REPORT_CACHE.misses},
+    }), 200)
+
+def _collect_metrics():
+    # /metrics values read at scrape time: report cache size, refresh scheduler, snapshot
+    out = [('report_cache_entries', 'gauge', 'Entries in REPORT_CACHE.', [({}, len(REPORT_CACHE))])]
+    jobs = SCHEDULER.stats()['jobs']
+    for key, name, kind, help in (
+        ('runs', 'refresh_runs_total', 'counter', 'Background refresh job runs.'),
+        ('changes', 'refresh_changes_total', 'counter', 'Background refresh job runs that changed the data.'),
+        ('errors', 'refresh_errors_total', 'counter', 'Background refresh job runs that failed.'),
+        ('last_run', 'refresh_last_run_timestamp_seconds', 'gauge', 'Start of the last run.'),
+        ('last_change', 'refresh_last_change_timestamp_seconds', 'gauge', 'Start of the last run that changed the data.'),
+        ('last_duration', 'refresh_last_duration_seconds', 'gauge', 'Duration of the last run.'),
+    ):
+        out.append((name, kind, help, [({'job': job}, stats[key]) for job, stats in jobs.items()]))
+    meta = SNAPSHOT.meta() if SNAPSHOT is not None else {}
+    if meta:
+        labels = {'source': meta.get('source', '')}
+        out.append(('snapshot_fetched_timestamp_seconds', 'gauge', 'When the current snapshot was downloaded.',
+                    [(labels, meta.get('fetched_at'))]))
+        out.append(('snapshot_build_seconds', 'gauge', 'Download and conversion time of the current snapshot.',
+                    [(labels, meta.get('build_seconds'))]))
+    return out
+
+REGISTRY.add_collector(_collect_metrics)
+
+@app.route('/metrics')
+def metrics_endpoint():
+    # Prometheus scrape endpoint (text exposition format, see metrics.py)
+    if METRICS_TOKEN and request.headers.get('Authorization') != f'Bearer {METRICS_TOKEN}':
+        return ('Unauthorized', 401)
+    return app.response_class(REGISTRY.render(), content_type='text/plain; version=0.0.4; charset=utf-8')
 
 @app.route('/api/application-status')
+@conditional_get
 def api_application_status():
     # API endpoint for application status totals
-    return _json_from_view('v_application_status_totals')
+    return _report_response('v_application_status_totals')
 
 @app.route('/api/deferred-offers')
+@conditional_get
 def api_deferred_offers():
     # API endpoint for deferred offers overview
-    return _json_from_view('v_deferred_offers_overview')
+    return _report_response('v_deferred_offers_overview')
 
 @app.route('/api/agent-performance')
+@conditional_get
 def api_agent_performance():
     # API endpoint for agent performance metrics
-    return _json_from_view('v_agent_performance')
+    return _report_response('v_agent_performance')
 
 @app.route('/api/student-classification')
+@conditional_get
 def api_student_classification():
     # API endpoint for student classification counts
-    return _json_from_view('v_student_classification')
+    return _report_response('v_student_classification')
 
 @app.route('/api/current-vs-enrolled')
+@conditional_get
 def api_current_vs_enrolled():
     # API endpoint comparing current vs enrolled students
-    return _json_from_view('v_current_vs_enrolled')
+    return _report_response('v_current_vs_enrolled')
 
 @app.route('/api/enrolled-vs-offer')
+@conditional_get
 def api_enrolled_vs_offer():
     # API endpoint for enrolled vs offer data
-    return _json_from_view('v_enrolled_vs_offer')
+    return _report_response('v_enrolled_vs_offer')
 
 @app.route('/api/offer-expiry-surge')
+@conditional_get
 def api_offer_expiry_surge():
     # API endpoint for daily offer expiry counts
-    return _json_from_view('v_offer_expiry_surge_daily')
+    return _report_response('v_offer_expiry_surge_daily')
 
 @app.route('/api/visa-breakdown')
+@conditional_get
 def api_visa_breakdown():
     # API endpoint for visa type breakdown
-    return _json_from_view('v_visa_breakdown')
+    return _report_response('v_visa_breakdown')
+
+def warmup() -> int:
+    # Per-worker warmup (gunicorn.conf.py post_worker_init): load the schema catalog and
+    # fill REPORT_CACHE, compressed variants included, for every dashboard report.
+    # Runs on DASHBOARD_EXECUTOR so its threads open their pooled connections now.
+    # Returns the number of reports cached.
+    if SNAPSHOT is not None:
+        SNAPSHOT.refresh(wait=True)
+    if not os.path.exists(SQLITE_DB):
+        return 0
+    CATALOG.fields(ANALYTICS_POOL.get(), SOURCE_TABLE)
+    views = [view for reports in DASHBOARD_REPORTS.values() for view in reports.values()]
+    warmed = 0
+    for view, future in [(v, DASHBOARD_EXECUTOR.submit(_dashboard_report, v)) for v in views]:
+        try:
+            body, mimetype, variants, _ = future.result()
+        except Exception as e:
+            app.logger.warning('warmup: %s failed: %s', view, e)
+            continue
+        for encoding in available_encodings():
+            _report_variant(body, mimetype, variants, encoding)
+        warmed += 1
+    return warmed
+
+def ensure_summary_tables() -> bool:
+    # A database loaded without the v_* summary tables (like the shipped dummy_data.db) gets them,
+    # and the rollup, built once through a shadow copy (see rebuild_derived_tables), so the
+    # pandas derivation runs at load time and report requests stay plain reads.
+    # Returns True if it published a rebuilt database.
+    if not os.path.exists(SQLITE_DB):
+        return False
+    conn = ANALYTICS_POOL.get()
+    if all(has_summary_table(conn, view) for view in REPORT_VIEWS):
+        return False
+    app.logger.info('Building report summary tables in %s', SQLITE_DB)
+    if not rebuild_derived_tables(SQLITE_DB):
+        return False
+    DB_WATCHER.sync()
+    return True
+
+def _refresh_source() -> bool:
+    # Scheduler job: download and convert a changed workbook (SharePoint / SOURCE_URL / AUTO_REFRESH_EXCEL)
+    return SNAPSHOT.refresh(force=True)
+
+def _refresh_snapshot_quietly() -> None:
+    # Background snapshot check started by a request (see refresh_snapshot)
+    try:
+        SNAPSHOT.refresh()
+    except Exception as e:
+        app.logger.warning('Snapshot refresh failed: %s', e)
+
+_SNAPSHOT_THREAD: Optional[threading.Thread] = None
+_SNAPSHOT_THREAD_LOCK = threading.Lock()
+
+def _start_snapshot_refresh() -> None:
+    # Run at most one request-triggered snapshot check at a time
+    global _SNAPSHOT_THREAD
+    with _SNAPSHOT_THREAD_LOCK:
+        if _SNAPSHOT_THREAD is None or not _SNAPSHOT_THREAD.is_alive():
+            _SNAPSHOT_THREAD = threading.Thread(target=_refresh_snapshot_quietly, name='snapshot-refresh', daemon=True)
+            _SNAPSHOT_THREAD.start()
+
+def _refresh_database() -> bool:
+    # Scheduler job: once dummy_data.db changed (a loader published it, or it was edited
+    # in place and needs its derived tables rebuilt), re-warm the caches for the new data
+    change = DB_WATCHER.poll()
+    if change is None:
+        return False
+    if change == 'modified' and rebuild_derived_tables(SQLITE_DB):
+        DB_WATCHER.sync()
+    elif change == 'replaced':
+        ensure_summary_tables()  # e.g. an older database copied over the live one
+    warmup()
+    return True
+
+def start_scheduler() -> RefreshScheduler:
+    # Start this process's background refresh jobs (no-op when REFRESH_SCHEDULER is off)
+    if not REFRESH_SCHEDULER:
+        return SCHEDULER
+    if not SCHEDULER.jobs:
+        if SNAPSHOT is not None:
+            SCHEDULER.add('source', _refresh_source, SOURCE_CHECK_INTERVAL)
+        SCHEDULER.add('database', _refresh_database, DB_CHECK_INTERVAL)
+    SCHEDULER.start()
+    return SCHEDULER
+
+def create_app(config: Optional[dict] = None, warm: bool = True) -> Flask:
+    # Production entry point (wsgi.py): apply config overrides, make sure users.db is set up and
+    # the analytics DB has its summary tables, warm this process's caches and start the refresh
+    # scheduler. With gunicorn, both warmup and the scheduler run in each worker instead
+    # (post_worker_init), after the fork, so no connection or thread crosses it.
+    if config:
+        app.config.update(config)
+    init_db()
+    app.logger.info('Data source: %s', f'{SNAPSHOT.source.name} snapshot in {SQLITE_DB}' if SNAPSHOT else SQLITE_DB)
+    ensure_summary_tables()
+    if warm:
+        app.logger.info('Warmed %d reports', warmup())
+        start_scheduler()
+    return app
 
 if __name__ == '__main__':
-    # Launch development server
+    # Launch development server. The reloader runs this module in a watcher process too;
+    # only the serving child (WERKZEUG_RUN_MAIN) starts the refresh jobs.
+    create_app(warm=False)
+    if os.environ.get('WERKZEUG_RUN_MAIN') == 'true':
+        start_scheduler()
     app.run(debug=True, port=5001)
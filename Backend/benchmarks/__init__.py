@@ -0,0 +1,14 @@
+"""
+Benchmarks for the ETL and the /api/* endpoints over synthetic data.
+
+    python -m benchmarks --sizes 10k,100k --out bench.json
+    python -m benchmarks --sizes 10k,100k --out bench.json --compare baseline.json
+
+Run from Backend/. For each size a synthetic ReportData workbook is generated
+(see synthetic.py; cached under --data-dir) and loaded like the ETL's full
+load, phase by phase (see etl.py). Then every API endpoint is requested
+through the Flask test client against the resulting database (see api.py).
+The ETL and the API each run in a child process, so the peak RSS reported
+for them is their own. Results are JSON and carry the git commit, so runs
+on two commits can be compared with --compare.
+"""
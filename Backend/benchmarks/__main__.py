@@ -0,0 +1,133 @@
+"""
+python -m benchmarks: ETL and API benchmarks per size; see benchmarks/__init__.py.
+"""
+
+import argparse
+import json
+import os
+import platform
+import sqlite3
+import subprocess
+import sys
+import time
+from typing import List, Optional
+
+import numpy as np
+import pandas as pd
+
+from benchmarks.compare import print_comparison
+from benchmarks.synthetic import EXCEL_MAX_ROWS, parse_size, write_workbook
+
+BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+DEFAULT_DATA_DIR = os.path.join(BACKEND_DIR, 'benchmarks', 'data')
+DEFAULT_SIZES = '10k,100k,1m,5m'
+
+
+def _git(*args: str) -> Optional[str]:
+    try:
+        out = subprocess.run(['git', *args], cwd=BACKEND_DIR, capture_output=True, text=True, timeout=30)
+    except OSError:
+        return None
+    return out.stdout.strip() if out.returncode == 0 else None
+
+
+def environment() -> dict:
+    """Where the numbers were measured: commit, interpreter, libraries, machine."""
+    dirty = _git('status', '--porcelain', '--untracked-files=no')
+    return {
+        'commit': _git('rev-parse', '--short', 'HEAD'),
+        'dirty': bool(dirty) if dirty is not None else None,
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S%z'),
+        'python': platform.python_version(),
+        'sqlite': sqlite3.sqlite_version,
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'platform': platform.platform(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def _child(module: str, args: List[str], verbose: bool) -> dict:
+    # Run a benchmark step in its own interpreter; it prints its result as JSON
+    proc = subprocess.run([sys.executable, '-m', module, *args], cwd=BACKEND_DIR, stdout=subprocess.PIPE,
+                          stderr=None if verbose else subprocess.PIPE, text=True)
+    if proc.returncode != 0:
+        raise RuntimeError(f'{module} failed ({proc.returncode}):\n{proc.stderr or ""}')
+    return json.loads(proc.stdout.strip().splitlines()[-1])
+
+
+def run_size(rows: int, args) -> dict:
+    """Build (or reuse) the workbook and database for `rows` rows, then time the ETL and the API."""
+    base = os.path.join(args.data_dir, f'reportdata_{rows}_s{args.seed}')
+    db_path = base + '.db'
+    result = {'rows': rows}
+
+    if not args.skip_etl:
+        if rows <= EXCEL_MAX_ROWS and not args.no_workbook:
+            workbook = base + '.xlsx'
+            if not os.path.exists(workbook):
+                print(f'[INFO] {rows} rows: writing {workbook}')
+                start = time.perf_counter()
+                write_workbook(workbook, rows, args.seed)
+                print(f'[TIME] workbook: {time.perf_counter() - start:.1f}s')
+            source = ['--workbook', workbook]
+        else:
+            source = ['--rows', str(rows), '--seed', str(args.seed)]
+        print(f'[INFO] {rows} rows: ETL')
+        result['etl'] = _child('benchmarks.etl', ['--db', db_path, *source], args.verbose)
+        print(f"[TIME] ETL: {result['etl']['seconds']:.1f}s "
+              + ', '.join(f'{k} {v:.2f}s' for k, v in result['etl']['phases'].items()))
+    elif not os.path.exists(db_path):
+        raise RuntimeError(f'--skip-etl needs an existing {db_path}')
+
+    if not args.skip_api:
+        print(f'[INFO] {rows} rows: API')
+        api_args = ['--db', db_path, '--repeat', str(args.repeat), '--max-seconds', str(args.max_seconds)]
+        if args.encoding:
+            api_args += ['--encoding', args.encoding]
+        result['api'] = _child('benchmarks.api', api_args, args.verbose)
+        for path, e in result['api']['endpoints'].items():
+            print(f"[TIME] {path}: {e['uncached']['median_ms']:.2f} ms, cached {e['cached']['median_ms']:.2f} ms")
+    return result
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(prog='python -m benchmarks',
+                                     description='Benchmark the ETL and the API over synthetic ReportData tables.')
+    parser.add_argument('--sizes', default=DEFAULT_SIZES, help=f'Comma-separated row counts (default {DEFAULT_SIZES})')
+    parser.add_argument('--out', help='Write the results to this JSON file (default: benchmarks/results/<commit>.json)')
+    parser.add_argument('--data-dir', default=DEFAULT_DATA_DIR, help='Where workbooks and databases are kept')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint and mode')
+    parser.add_argument('--max-seconds', type=float, default=30, help='Stop repeating an endpoint after this long')
+    parser.add_argument('--encoding', help='Accept-Encoding for the API requests (default: identity)')
+    parser.add_argument('--no-workbook', action='store_true',
+                        help='Feed the ETL generated rows instead of parsing a workbook (no parse phase)')
+    parser.add_argument('--skip-etl', action='store_true', help='Reuse the databases of an earlier run')
+    parser.add_argument('--skip-api', action='store_true')
+    parser.add_argument('--compare', help='Compare with an earlier result file when done')
+    parser.add_argument('--threshold', type=float, default=1.10, help='Ratio --compare reports as slower')
+    parser.add_argument('--verbose', action='store_true', help="Show the ETL's and the app's own output")
+    args = parser.parse_args()
+
+    os.makedirs(args.data_dir, exist_ok=True)
+    result = dict(environment(), seed=args.seed, repeat=args.repeat, sizes={})
+    for size in args.sizes.split(','):
+        rows = parse_size(size)
+        result['sizes'][str(rows)] = run_size(rows, args)
+
+    out = args.out or os.path.join(BACKEND_DIR, 'benchmarks', 'results', f"{result['commit'] or 'unknown'}.json")
+    os.makedirs(os.path.dirname(os.path.abspath(out)), exist_ok=True)
+    with open(out, 'w') as f:
+        json.dump(result, f, indent=2)
+    print(f'[OK] results written to {out}')
+
+    if args.compare:
+        with open(args.compare) as f:
+            base = json.load(f)
+        if not print_comparison(base, result, args.threshold):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,150 @@
+"""
+Every /api/* endpoint timed through the Flask test client.
+
+For each endpoint, with the report cache cleared before every request
+('uncached', the cost of building the response) and then left warm
+('cached', what repeat visitors get):
+- latency min / median / p95 in ms
+- the mean Server-Timing phases of the uncached requests (see metrics.py)
+- status and body size, and the peak Python allocation of one extra,
+  untimed request (tracemalloc; SQLite's own memory is not included)
+
+Whole-table /api/data requests are skipped above FULL_TABLE_MAX_ROWS rows:
+at 1M rows the records list alone takes several GB. The streamed ndjson
+request still reads the whole table at every size.
+
+    python -m benchmarks.api --db out.db [--repeat 5] [--encoding gzip]
+
+prints one JSON object on stdout. The app reads --db through SQLITE_DB
+(and a users.db next to it), with the background scheduler off.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import defaultdict
+from typing import Dict, List, Optional
+
+from benchmarks.memory import peak_rss_mb
+
+REPORT_ENDPOINTS = [
+    '/api/application-status',
+    '/api/deferred-offers',
+    '/api/agent-performance',
+    '/api/student-classification',
+    '/api/current-vs-enrolled',
+    '/api/enrolled-vs-offer',
+    '/api/visa-breakdown',
+    '/api/offer-expiry-surge',
+    '/api/dashboard/leader',
+    '/api/dashboard/manager',
+]
+QUERY_ENDPOINTS = [
+    '/api/aggregate?x=status',
+    '/api/aggregate?x=campus_name&y=__avg_age__',
+    '/api/aggregate?x=agentname&eq.status=Offered',
+    '/api/aggregate?x=nationality&y=__count__&eq.visa_status=Student Visa&gte.startdate=2024-01-01',
+    '/api/aggregate?x=intake_year&type=line',
+    '/api/data?limit=1000',
+    '/api/data?limit=1000&sort=-startdate&eq.status=Offered',
+    '/api/data?columns=studentid,status,agentname&limit=10000',
+    '/api/data?format=ndjson',
+]
+FULL_TABLE_ENDPOINTS = [
+    '/api/data',
+    '/api/data?format=columnar',
+]
+FULL_TABLE_MAX_ROWS = 100000
+
+
+def _stats(samples: List[float]) -> Dict[str, float]:
+    ordered = sorted(samples)
+    return {
+        'runs': len(ordered),
+        'min_ms': round(ordered[0] * 1000, 3),
+        'median_ms': round(statistics.median(ordered) * 1000, 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(0.95 * len(ordered)))] * 1000, 3),
+    }
+
+
+def _server_timing(header: Optional[str]) -> Dict[str, float]:
+    phases = {}
+    for part in (header or '').split(','):
+        name, _, params = part.strip().partition(';')
+        if params.startswith('dur='):
+            phases[name] = float(params[4:])
+    return phases
+
+
+def endpoints_for(rows: int) -> List[str]:
+    return REPORT_ENDPOINTS + QUERY_ENDPOINTS + (FULL_TABLE_ENDPOINTS if rows <= FULL_TABLE_MAX_ROWS else [])
+
+
+def run_api(db_path: str, repeat: int = 5, encoding: Optional[str] = None, max_seconds: float = 30) -> dict:
+    """Time every endpoint against db_path; each is run `repeat` times per mode, or fewer past max_seconds."""
+    os.environ['SQLITE_DB'] = os.path.abspath(db_path)
+    os.environ['USERS_DB'] = os.path.abspath(db_path) + '.users.db'
+    os.environ['REFRESH_SCHEDULER'] = 'false'
+    os.environ['AUTO_REFRESH_EXCEL'] = 'false'
+    os.environ.pop('SOURCE_URL', None)
+    import app as backend
+
+    with sqlite3.connect(db_path) as conn:
+        rows = conn.execute('SELECT COUNT(*) FROM reportdata').fetchone()[0]
+    client = backend.app.test_client()
+    headers = {'Accept-Encoding': encoding} if encoding else {}
+
+    def request(path):
+        start = time.perf_counter()
+        resp = client.get(path, headers=headers)
+        body = resp.get_data()
+        elapsed = time.perf_counter() - start
+        resp.close()
+        return resp, body, elapsed
+
+    results = {}
+    for path in endpoints_for(rows):
+        resp, body, _ = request(path)  # connections, schema catalog, statement cache
+        result = {'status': resp.status_code, 'bytes': len(body)}
+        for mode in ('uncached', 'cached'):
+            samples, phases = [], defaultdict(float)
+            deadline = time.perf_counter() + max_seconds
+            while len(samples) < repeat and (not samples or time.perf_counter() < deadline):
+                if mode == 'uncached':
+                    backend.REPORT_CACHE.clear()
+                resp, _, elapsed = request(path)
+                samples.append(elapsed)
+                for name, ms in _server_timing(resp.headers.get('Server-Timing')).items():
+                    phases[name] += ms
+            result[mode] = _stats(samples)
+            if mode == 'uncached':
+                result['phases_ms'] = {name: round(ms / len(samples), 3) for name, ms in phases.items()}
+        backend.REPORT_CACHE.clear()
+        tracemalloc.start()
+        request(path)
+        result['peak_alloc_mb'] = round(tracemalloc.get_traced_memory()[1] / 2**20, 2)
+        tracemalloc.stop()
+        results[path] = result
+    return {'rows': rows, 'encoding': encoding or 'identity', 'endpoints': results, 'peak_rss_mb': peak_rss_mb()}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Time every /api/* endpoint against one database.')
+    parser.add_argument('--db', required=True, help='Analytics database to serve')
+    parser.add_argument('--repeat', type=int, default=5, help='Timed requests per endpoint and mode')
+    parser.add_argument('--max-seconds', type=float, default=30, help='Stop repeating an endpoint after this long')
+    parser.add_argument('--encoding', help='Accept-Encoding to send (default: none, i.e. identity)')
+    args = parser.parse_args()
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run_api(args.db, args.repeat, args.encoding, args.max_seconds)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,71 @@
+"""
+Compare two benchmark result files (python -m benchmarks --out ...).
+
+    python -m benchmarks.compare base.json new.json [--threshold 1.10]
+
+Lists every timing or memory figure present in both files with its ratio
+new / base, slowest first, and exits with status 1 when any ratio exceeds
+the threshold, so it can gate a CI job.
+"""
+
+import argparse
+import json
+import sys
+from typing import Dict, List, Tuple
+
+
+def metrics(result: dict) -> Dict[str, float]:
+    """Flatten a result file to {'100000 etl parse': seconds, '100000 /api/... uncached': ms, ...}."""
+    out = {}
+    for size, run in result.get('sizes', {}).items():
+        etl = run.get('etl')
+        if etl:
+            out[f'{size} etl total s'] = etl['seconds']
+            for phase, seconds in etl['phases'].items():
+                out[f'{size} etl {phase} s'] = seconds
+            out[f'{size} etl peak_rss MiB'] = etl['peak_rss_mb']
+        api = run.get('api')
+        if api:
+            for path, e in api['endpoints'].items():
+                for mode in ('uncached', 'cached'):
+                    out[f'{size} {path} {mode} median ms'] = e[mode]['median_ms']
+                out[f'{size} {path} peak_alloc MiB'] = e['peak_alloc_mb']
+            out[f'{size} api peak_rss MiB'] = api['peak_rss_mb']
+    return {k: v for k, v in out.items() if v is not None}
+
+
+def compare(base: dict, new: dict) -> List[Tuple[str, float, float, float]]:
+    """(metric, base, new, new / base) for the metrics both results have, largest ratio first."""
+    a, b = metrics(base), metrics(new)
+    rows = [(k, a[k], b[k], b[k] / a[k] if a[k] else float('inf')) for k in a.keys() & b.keys()]
+    return sorted(rows, key=lambda r: -r[3])
+
+
+def print_comparison(base: dict, new: dict, threshold: float) -> bool:
+    """Print the comparison; True when nothing regressed past threshold."""
+    print(f"[INFO] base {base.get('commit')}  new {new.get('commit')}")
+    rows = compare(base, new)
+    worse = [r for r in rows if r[3] > threshold]
+    width = max((len(r[0]) for r in rows), default=10)
+    for name, old, cur, ratio in rows:
+        flag = '  <-- slower' if ratio > threshold else ''
+        print(f'{name:<{width}} {old:12.3f} {cur:12.3f}  x{ratio:5.2f}{flag}')
+    print(f'[INFO] {len(rows)} metrics compared, {len(worse)} above x{threshold:.2f}')
+    return not worse
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Compare two benchmark result files.')
+    parser.add_argument('base')
+    parser.add_argument('new')
+    parser.add_argument('--threshold', type=float, default=1.10, help='Ratio above which a metric counts as slower')
+    args = parser.parse_args()
+    with open(args.base) as f:
+        base = json.load(f)
+    with open(args.new) as f:
+        new = json.load(f)
+    sys.exit(0 if print_comparison(base, new, args.threshold) else 1)
+
+
+if __name__ == '__main__':
+    main()
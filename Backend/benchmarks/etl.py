@@ -0,0 +1,144 @@
+"""
+The ETL's full load, timed phase by phase.
+
+Runs the same steps as etl_load_from_excel_to_sqlite.load_full (single
+process) for the ReportData sheet, then finalize_shadow. Phase times are
+exclusive, i.e. 'type' does not include the parsing it pulls batches from:
+
+- parse     read the workbook (excel_stream) or, for sizes that do not fit
+            in a worksheet, generate the rows in memory ('generate')
+- type      type inference and conversion (typed_batches)
+- insert    CREATE TABLE and executemany
+- index     date keys plus the report and lookup indexes
+- reports   v_* summary tables and the /api/aggregate rollup
+- finalize  ANALYZE and journal mode (finalize_shadow)
+
+    python -m benchmarks.etl --db out.db (--workbook in.xlsx | --rows N [--seed S])
+
+prints one JSON object on stdout; the ETL's own log goes to stderr.
+"""
+
+import argparse
+import contextlib
+import json
+import os
+import sqlite3
+import sys
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Iterable, Iterator, Optional
+
+import etl_load_from_excel_to_sqlite as etl
+from db_swap import discard_shadow, finalize_shadow
+from excel_stream import DEFAULT_BATCH_ROWS
+from reports import SOURCE_TABLE, materialize_reports
+
+from benchmarks.memory import peak_rss_mb
+from benchmarks.synthetic import SHEET, reportdata_batches
+
+
+class PhaseClock:
+    """Exclusive wall time per phase; a phase entered inside another is not counted twice."""
+
+    def __init__(self):
+        self.seconds = defaultdict(float)
+        self._nested = []
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        start = time.perf_counter()
+        self._nested.append(0.0)
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - start
+            self.seconds[name] += elapsed - self._nested.pop()
+            if self._nested:
+                self._nested[-1] += elapsed
+
+    def iterate(self, items: Iterable, name: str) -> Iterator:
+        """Yield from items, booking the time spent producing each one to name."""
+        it = iter(items)
+        while True:
+            with self.phase(name):
+                try:
+                    item = next(it)
+                except StopIteration:
+                    return
+            yield item
+
+    @contextmanager
+    def wrap(self, module, attr: str, name: str, generator: bool = False) -> Iterator[None]:
+        """Book calls to module.attr to name while the block runs."""
+        original = getattr(module, attr)
+        if generator:
+            timed = lambda *a, **kw: self.iterate(original(*a, **kw), name)
+        else:
+            def timed(*a, **kw):
+                with self.phase(name):
+                    return original(*a, **kw)
+        setattr(module, attr, timed)
+        try:
+            yield
+        finally:
+            setattr(module, attr, original)
+
+
+def run_etl(db_path: str, workbook: Optional[str] = None, rows: Optional[int] = None, seed: int = 0,
+            batch_size: int = DEFAULT_BATCH_ROWS) -> dict:
+    """Build db_path from the workbook (or `rows` generated rows); returns rows, phase seconds and sizes."""
+    clock = PhaseClock()
+    discard_shadow(db_path)
+    if workbook:
+        batches = clock.iterate(etl.sheet_batches(workbook, SHEET, batch_size), 'parse')
+    else:
+        batches = clock.iterate(_sanitized(reportdata_batches(rows, seed, batch_size)), 'generate')
+    start = time.perf_counter()
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute('PRAGMA synchronous = OFF;')
+        with clock.wrap(etl, 'typed_batches', 'type', generator=True), \
+                clock.wrap(etl, 'add_keys_and_indexes', 'index'), clock.phase('insert'):
+            total = etl.write_table(conn, SOURCE_TABLE, batches)
+        with clock.phase('reports'):
+            materialize_reports(conn, SOURCE_TABLE)
+    finally:
+        conn.close()
+    with clock.phase('finalize'):
+        finalize_shadow(db_path)
+    return {
+        'source': 'workbook' if workbook else 'generated',
+        'rows': total,
+        'seconds': round(time.perf_counter() - start, 4),
+        'phases': {name: round(s, 4) for name, s in clock.seconds.items()},
+        'db_mb': round(os.path.getsize(db_path) / 2**20, 2),
+        'workbook_mb': round(os.path.getsize(workbook) / 2**20, 2) if workbook else None,
+        'peak_rss_mb': peak_rss_mb(),
+    }
+
+
+def _sanitized(batches: Iterable) -> Iterator:
+    # Generated frames get the column names sheet_batches would give them
+    for df in batches:
+        df.columns = etl.ensure_unique([etl.sanitize_name(c) for c in df.columns])
+        yield df
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Time the ETL full load of one synthetic ReportData table.')
+    parser.add_argument('--db', required=True, help='SQLite file to build (replaced)')
+    parser.add_argument('--workbook', help='Workbook to load')
+    parser.add_argument('--rows', type=int, help='Generate this many rows instead of reading a workbook')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--batch-size', type=int, default=DEFAULT_BATCH_ROWS)
+    args = parser.parse_args()
+    if not args.workbook and not args.rows:
+        parser.error('one of --workbook or --rows is required')
+    with contextlib.redirect_stdout(sys.stderr):
+        result = run_etl(args.db, args.workbook, args.rows, args.seed, args.batch_size)
+    print(json.dumps(result))
+
+
+if __name__ == '__main__':
+    main()
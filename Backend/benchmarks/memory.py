@@ -0,0 +1,37 @@
+"""Peak resident set size of the current process."""
+
+import sys
+from typing import Optional
+
+
+def peak_rss_mb() -> Optional[float]:
+    """Peak RSS in MiB so far, or None where it cannot be read."""
+    try:
+        import resource
+    except ImportError:
+        return _peak_working_set_mb()
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return round(peak / (2**20 if sys.platform == 'darwin' else 2**10), 1)
+
+
+def _peak_working_set_mb() -> Optional[float]:
+    # Windows: PROCESS_MEMORY_COUNTERS.PeakWorkingSetSize via psapi
+    try:
+        import ctypes
+        from ctypes import wintypes
+
+        class Counters(ctypes.Structure):
+            _fields_ = [('cb', wintypes.DWORD), ('PageFaultCount', wintypes.DWORD)] + [
+                (name, ctypes.c_size_t) for name in (
+                    'PeakWorkingSetSize', 'WorkingSetSize', 'QuotaPeakPagedPoolUsage', 'QuotaPagedPoolUsage',
+                    'QuotaPeakNonPagedPoolUsage', 'QuotaNonPagedPoolUsage', 'PagefileUsage', 'PeakPagefileUsage')]
+
+        counters = Counters()
+        counters.cb = ctypes.sizeof(Counters)
+        process = ctypes.windll.kernel32.GetCurrentProcess()
+        if not ctypes.windll.psapi.GetProcessMemoryInfo(process, ctypes.byref(counters), counters.cb):
+            return None
+        return round(counters.PeakWorkingSetSize / 2**20, 1)
+    except Exception:
+        return None
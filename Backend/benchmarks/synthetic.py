@@ -0,0 +1,214 @@
+"""
+Synthetic ReportData rows shaped like dummy_data.xlsx, at any size.
+
+Every column of the workbook's ReportData sheet is generated, with category
+frequencies taken from the sample workbook (statuses, campuses, visa types,
+nationalities, ...). Agents and intakes are widened so that large tables
+keep realistic report cardinalities: a long tail of agents with Zipf-like
+weights, and three intakes a year over several years. Stage follows Status,
+Age Group follows Age, FinishDate follows StartDate, and a student can hold
+more than one offer.
+
+Rows are produced in batches from a seeded generator per batch, so the same
+(rows, seed) always yields the same data, whichever batch size reads it.
+"""
+
+import os
+import re
+from typing import Iterator, List, Sequence
+
+import numpy as np
+import pandas as pd
+
+from excel_stream import DEFAULT_BATCH_ROWS
+
+# Data rows that fit below the header row of one worksheet
+EXCEL_MAX_ROWS = 1048575
+
+SHEET = 'ReportData'
+
+HEADER = [
+    'StudentId', 'FirstName', 'LastName', 'Age', 'Age Group', 'DOB', 'Campus_Name', 'Nickname',
+    'Nationality', 'Visa Status', 'CourseType', 'CourseId', 'CourseName', 'CourseAttempt', 'OfferId',
+    'Stage', 'AgentName', 'Status', 'CourseManager', 'CoENo', 'StartDate', 'FinishDate', 'Study Reason',
+    'Mode of Study', 'Do you want to pay more than 50% upfront fee?',
+    'Are you currently or planning to study English whilst in Australia?',
+    'Offer Expiry Date', 'Previous Offer Intake', 'Previous Offer Year',
+]
+
+# (status, stage, weight)
+STATUSES = [
+    ('New Application Request', 'Offer', 30),
+    ('Offered', 'Offer', 27),
+    ('Cancelled', 'Student', 15),
+    ('Current Student', 'Student', 13),
+    ('Withdrawn', 'Student', 11),
+    ('Enrolled - Pending Visa', 'Student', 2),
+    ('Enrolled', 'Student', 1),
+    ('Offer Sent', 'Application', 1),
+]
+CAMPUSES = {'Sydney Campus': 39, 'Melbourne City Campus': 36, 'Brisbane Campus': 25}
+NATIONALITIES = {'Indian': 22, 'Pakistani': 14, 'Brazilian': 14, 'Vietnamese': 14, 'Chinese': 12,
+                 'Nigerian': 12, 'Nepalese': 12}
+VISAS = {'Student Visa': 73, 'Temporary Visa': 7, 'Permanent Resident': 7, 'Bridging Visa': 6, 'PR': 5,
+         'Tourist Visa': 2}
+COURSE_IDS = {'BBT': 51, 'BAn': 48}
+COURSE_NAMES = {'Bachelor of Business': 28, 'Bachelor of IT': 25, 'Bachelor of Engineering': 24,
+                'Bachelor of Nursing': 23}
+COURSE_ATTEMPTS = {1: 86, 2: 9, 3: 4, 4: 1}
+NAMED_AGENTS = ['Bright Future Consultants', 'Global Pathways', 'NextGen Education', 'Aussie Learn Hub',
+                'Skyline Overseas']
+AGENT_COUNT = 60
+COURSE_MANAGERS = {
+    'Sachin Kalidas Mallar': 33, 'Sarthak Goel': 26, 'Dr. Emily Chen': 6, 'Anusha Priyalini': 6,
+    'Pankaj Goel': 5, 'HR Intern': 5, 'Dr. Sarah Lee': 5, 'Prof. Mark Johnson': 5, 'Mr. John Smith': 4,
+    'Muskaan Verma': 2, 'Sweta Jain Sud': 2, 'Nuttanicha Tepmanee': 1,
+}
+STUDY_REASONS = {
+    'For personal interest / self-development': 66, 'To get a better job / promotion': 20, 'To get a job': 4,
+    'To start my own business': 2, 'I wanted extra skills for my job': 2, 'Career Development': 2,
+    'To develop my existing business': 1, 'To try a different career': 1, 'Pathway to PR': 1,
+    'Skill Upgrade': 1,
+}
+STUDY_MODES = {'On-Campus (International)': 47, 'Hybrid': 30, 'Online': 23}
+UPFRONT_FEE = {'No': 93, 'Yes': 7}
+STUDY_ENGLISH = {'No': 87, 'Yes': 13}
+PREVIOUS_INTAKES = {'T2': 38, 'T1': 34, 'T3': 27, 'Jul': 1}
+PREVIOUS_YEARS = {2024: 36, 2023: 34, 2022: 29, 2025: 1}
+FIRST_NAMES = ['Abigail', 'Adelaide', 'Adrian', 'Alexander', 'Amber', 'Arthur', 'Ashton', 'Belinda', 'Byron',
+               'Camila', 'Carlos', 'Charlotte', 'Darcy', 'David', 'Derek', 'Edith', 'Edward', 'Evelyn',
+               'Frederick', 'Gianna', 'Henry', 'Isabella', 'James', 'Jessica', 'John', 'Kirsten', 'Lucas',
+               'Maria', 'Naomi', 'Oliver', 'Priya', 'Ravi', 'Sawyer', 'Sophia', 'Thanh', 'Wei', 'Wilson']
+LAST_NAMES = ['Adams', 'Anderson', 'Bailey', 'Bennett', 'Brooks', 'Brown', 'Campbell', 'Clark', 'Davis',
+              'Edwards', 'Grant', 'Hamilton', 'Harris', 'Hawkins', 'Hill', 'Johnson', 'Jones', 'Martin',
+              'Mason', 'Mitchell', 'Nguyen', 'Patel', 'Singh', 'Stevens', 'Walker', 'West', 'Zhang']
+
+# Intakes: (month, day) of each term start, over INTAKE_YEARS, later years busier
+INTAKE_TERMS = [(3, 10), (7, 8), (11, 4)]
+INTAKE_YEARS = range(2021, 2026)
+# Share of rows with a blank CourseType/CourseId or OfferId, as in the sample
+BLANK_SHARE = 0.01
+# Rows per distinct student (some students hold several offers)
+ROWS_PER_STUDENT = 1.15
+
+
+def parse_size(text: str) -> int:
+    """'10k' -> 10000, '1m' -> 1000000, '2500' -> 2500."""
+    m = re.fullmatch(r'\s*(\d+(?:\.\d+)?)\s*([kKmM]?)\s*', text)
+    if not m:
+        raise ValueError(f'Not a row count: {text!r}')
+    scale = {'': 1, 'k': 1000, 'm': 1000000}[m.group(2).lower()]
+    return int(float(m.group(1)) * scale)
+
+
+def _pick(rng: np.random.Generator, values: Sequence, weights: Sequence[float], n: int) -> np.ndarray:
+    p = np.asarray(weights, dtype=float)
+    return np.asarray(values, dtype=object)[rng.choice(len(values), size=n, p=p / p.sum())]
+
+
+def _pick_map(rng: np.random.Generator, freq: dict, n: int) -> np.ndarray:
+    return _pick(rng, list(freq), list(freq.values()), n)
+
+
+def _blank(rng: np.random.Generator, values: np.ndarray) -> np.ndarray:
+    out = values.astype(object)
+    out[rng.random(len(out)) < BLANK_SHARE] = None
+    return out
+
+
+def _agents() -> List[str]:
+    return NAMED_AGENTS + [f'Agent {i:03d} Education' for i in range(len(NAMED_AGENTS) + 1, AGENT_COUNT + 1)]
+
+
+def _intakes() -> List[np.datetime64]:
+    return [np.datetime64(f'{year}-{month:02d}-{day:02d}') for year in INTAKE_YEARS for month, day in INTAKE_TERMS]
+
+
+def reportdata_batch(rows: int, start: int, n: int, seed: int = 0) -> pd.DataFrame:
+    """Rows start .. start + n - 1 of a `rows`-row table, with the workbook's headers."""
+    rng = np.random.default_rng([seed, start])
+    idx = np.arange(start, start + n)
+
+    student = rng.integers(0, max(1, int(rows / ROWS_PER_STUDENT)), size=n)
+    first = np.asarray(FIRST_NAMES, dtype=object)[student % len(FIRST_NAMES)]
+    last = np.asarray(LAST_NAMES, dtype=object)[(student // len(FIRST_NAMES)) % len(LAST_NAMES)]
+
+    age = np.clip(np.round(rng.gamma(2.0, 3.2, size=n) + 17), 17, 35).astype(np.int64)
+    age_group = np.select([age <= 21, age <= 25, age <= 30], ['18-21', '22-25', '26-30'], '31-35').astype(object)
+
+    status_idx = rng.choice(len(STATUSES), size=n, p=np.array([w for *_, w in STATUSES]) / sum(w for *_, w in STATUSES))
+    status = np.asarray([s for s, _, _ in STATUSES], dtype=object)[status_idx]
+    stage = np.asarray([st for _, st, _ in STATUSES], dtype=object)[status_idx]
+
+    agents = _agents()
+    agent = _pick(rng, agents, 1.0 / np.arange(1, len(agents) + 1) ** 1.1, n)
+
+    intakes = _intakes()
+    start_date = np.asarray(intakes, dtype='datetime64[D]')[
+        rng.choice(len(intakes), size=n, p=np.linspace(1, 3, len(intakes)) / np.linspace(1, 3, len(intakes)).sum())]
+    start_date = start_date + rng.choice([0, 0, 0, 0, 7, 14, 42], size=n).astype('timedelta64[D]')
+    finish_date = start_date + np.timedelta64(3 * 364 - 4, 'D')
+    offer_expiry = start_date - rng.normal(290, 190, size=n).round().astype('timedelta64[D]')
+    dob = start_date - (age * 365.25 + rng.integers(0, 365, size=n)).astype('timedelta64[D]')
+
+    offer_id = (idx + 1).astype(float)
+    offer_id[rng.random(n) < BLANK_SHARE] = np.nan
+
+    df = pd.DataFrame({
+        'StudentId': np.char.add('S', (student + 100000).astype(str)).astype(object),
+        'FirstName': first,
+        'LastName': last,
+        'Age': age,
+        'Age Group': age_group,
+        'DOB': dob.astype('datetime64[ns]'),
+        'Campus_Name': _pick_map(rng, CAMPUSES, n),
+        'Nickname': first,
+        'Nationality': _pick_map(rng, NATIONALITIES, n),
+        'Visa Status': _pick_map(rng, VISAS, n),
+        'CourseType': _blank(rng, np.full(n, 'HigherEd', dtype=object)),
+        'CourseId': _blank(rng, _pick_map(rng, COURSE_IDS, n)),
+        'CourseName': _pick_map(rng, COURSE_NAMES, n),
+        'CourseAttempt': _pick_map(rng, COURSE_ATTEMPTS, n).astype(np.int64),
+        'OfferId': offer_id,
+        'Stage': stage,
+        'AgentName': agent,
+        'Status': status,
+        'CourseManager': _pick_map(rng, COURSE_MANAGERS, n),
+        'CoENo': np.char.add('COE', (idx + 20000).astype(str)).astype(object),
+        'StartDate': start_date.astype('datetime64[ns]'),
+        'FinishDate': finish_date.astype('datetime64[ns]'),
+        'Study Reason': _pick_map(rng, STUDY_REASONS, n),
+        'Mode of Study': _pick_map(rng, STUDY_MODES, n),
+        HEADER[24]: _pick_map(rng, UPFRONT_FEE, n),
+        HEADER[25]: _pick_map(rng, STUDY_ENGLISH, n),
+        'Offer Expiry Date': offer_expiry.astype('datetime64[ns]'),
+        'Previous Offer Intake': _pick_map(rng, PREVIOUS_INTAKES, n),
+        'Previous Offer Year': _pick_map(rng, PREVIOUS_YEARS, n).astype(np.int64),
+    }, index=pd.RangeIndex(start, start + n))
+    return df[HEADER]
+
+
+def reportdata_batches(rows: int, seed: int = 0, batch_size: int = DEFAULT_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """The whole table in batch_size-row DataFrames."""
+    for start in range(0, rows, batch_size):
+        yield reportdata_batch(rows, start, min(batch_size, rows - start), seed)
+
+
+def write_workbook(path: str, rows: int, seed: int = 0) -> None:
+    """Write a one-sheet (ReportData) workbook with `rows` synthetic rows."""
+    if rows > EXCEL_MAX_ROWS:
+        raise ValueError(f'{rows} rows do not fit in one worksheet (max {EXCEL_MAX_ROWS})')
+    try:
+        import openpyxl
+    except Exception as e:
+        raise RuntimeError('openpyxl not installed. pip install openpyxl') from e
+    wb = openpyxl.Workbook(write_only=True)
+    ws = wb.create_sheet(SHEET)
+    ws.append(HEADER)
+    for df in reportdata_batches(rows, seed):
+        cells = df.astype(object).where(df.notna(), None)
+        for row in cells.itertuples(index=False, name=None):
+            ws.append(row)
+    tmp = path + '.tmp.xlsx'
+    wb.save(tmp)
+    os.replace(tmp, path)
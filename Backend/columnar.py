@@ -0,0 +1,68 @@
+"""
+Column-oriented encodings for API responses.
+
+- format=columnar: compact JSON, one array per column; low-cardinality text
+  columns (status, campus_name, agentname, ...) are dictionary-encoded as
+  {"dictionary": [...], "codes": [...]} so each distinct string is sent once.
+- format=arrow: Apache Arrow IPC stream with dictionary-encoded text columns
+  (optional; needs pyarrow).
+
+Unlike the record format (which sends nulls as 0), nulls are sent as null.
+"""
+
+import json
+from io import BytesIO
+
+import pandas as pd
+
+COLUMNAR_FORMATS = {
+    'columnar': 'application/json',
+    'arrow': 'application/vnd.apache.arrow.stream',
+}
+
+# Dictionary-encode a text column when distinct values are at most this share of rows
+DICTIONARY_MAX_RATIO = 0.5
+
+
+def _should_dictionary_encode(s: pd.Series) -> bool:
+    if s.dtype != object or len(s) == 0:
+        return False
+    return s.nunique(dropna=False) <= max(1, int(len(s) * DICTIONARY_MAX_RATIO))
+
+
+def to_columnar_json(df: pd.DataFrame) -> bytes:
+    """Encode a DataFrame as {"columns", "length", "data": {col: values | dictionary}}."""
+    data = {}
+    for col in df.columns:
+        s = df[col]
+        if _should_dictionary_encode(s):
+            codes, uniques = pd.factorize(s, use_na_sentinel=False)
+            dictionary = [None if pd.isna(u) else u for u in uniques.tolist()]
+            data[col] = {'dictionary': dictionary, 'codes': codes.tolist()}
+        else:
+            # tolist() converts numpy scalars to plain Python values
+            data[col] = s.astype(object).where(s.notna(), None).tolist()
+    payload = {'columns': [str(c) for c in df.columns], 'length': len(df), 'data': data}
+    return json.dumps(payload, separators=(',', ':'), default=str, allow_nan=False).encode('utf-8')
+
+
+def to_arrow_ipc(df: pd.DataFrame) -> bytes:
+    """Encode a DataFrame as an Arrow IPC stream."""
+    try:
+        import pyarrow as pa
+    except Exception as e:
+        raise RuntimeError('pyarrow not installed. pip install pyarrow') from e
+    table = pa.Table.from_pandas(df, preserve_index=False)
+    for i, field in enumerate(table.schema):
+        if pa.types.is_string(field.type) or pa.types.is_large_string(field.type):
+            table = table.set_column(i, field.name, table.column(i).dictionary_encode())
+    sink = BytesIO()
+    with pa.ipc.new_stream(sink, table.schema) as writer:
+        writer.write_table(table)
+    return sink.getvalue()
+
+
+def encode_frame(df: pd.DataFrame, fmt: str) -> bytes:
+    if fmt == 'arrow':
+        return to_arrow_ipc(df)
+    return to_columnar_json(df)
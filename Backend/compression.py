@@ -0,0 +1,109 @@
+"""
+Negotiated content-coding for API responses and static files.
+
+- gzip is always available (zlib); br and zstd are offered when the optional
+  brotli / zstandard packages are installed.
+- negotiate() picks the coding for a request's Accept-Encoding; among equally
+  acceptable codings the server prefers zstd, then br, then gzip.
+- compress() encodes a whole body. Bodies compressed once and kept (report
+  cache entries, static files) use the slower 'stored' levels; per-request
+  bodies use the 'fast' ones.
+- compress_stream() encodes a streamed body chunk by chunk, flushing after
+  each chunk so clients still receive rows as they are produced.
+"""
+
+import gzip
+import zlib
+from functools import lru_cache
+from typing import Iterable, Iterator, List, Optional
+
+# Server preference, best first
+ENCODINGS = ('zstd', 'br', 'gzip')
+
+# (per-request, stored) compression levels
+LEVELS = {
+    'zstd': (3, 19),
+    'br': (4, 11),
+    'gzip': (6, 9),
+}
+
+# Smaller bodies are sent as-is; the framing overhead outweighs the saving
+MIN_SIZE = 1024
+
+COMPRESSIBLE_TYPES = (
+    'text/',
+    'application/json',
+    'application/x-ndjson',
+    'application/javascript',
+    'application/vnd.apache.arrow.stream',
+    'image/svg+xml',
+)
+
+
+@lru_cache(maxsize=None)
+def _codec(encoding: str):
+    # Module implementing an optional coding, or None when it is not installed
+    try:
+        if encoding == 'br':
+            import brotli
+            return brotli
+        if encoding == 'zstd':
+            import zstandard
+            return zstandard
+    except ImportError:
+        return None
+    return zlib if encoding == 'gzip' else None
+
+
+def available_encodings() -> List[str]:
+    return [e for e in ENCODINGS if _codec(e) is not None]
+
+
+def compressible(mimetype: Optional[str]) -> bool:
+    return bool(mimetype) and mimetype.startswith(COMPRESSIBLE_TYPES)
+
+
+def negotiate(accept_encodings) -> Optional[str]:
+    """Best available coding for a werkzeug Accept (request.accept_encodings); None means identity."""
+    best, best_q = None, 0
+    for encoding in available_encodings():
+        q = accept_encodings.quality(encoding)
+        if q > best_q:
+            best, best_q = encoding, q
+    return best
+
+
+def compress(data: bytes, encoding: str, stored: bool = False) -> bytes:
+    """Encode a whole body; output is deterministic, so it can back a strong ETag."""
+    level = LEVELS[encoding][1 if stored else 0]
+    if encoding == 'gzip':
+        return gzip.compress(data, compresslevel=level, mtime=0)
+    if encoding == 'br':
+        return _codec('br').compress(data, quality=level)
+    if encoding == 'zstd':
+        return _codec('zstd').ZstdCompressor(level=level).compress(data)
+    raise ValueError(f'Unsupported encoding: {encoding}')
+
+
+def compress_stream(chunks: Iterable[bytes], encoding: str) -> Iterator[bytes]:
+    """Encode a streamed body, emitting a decodable block after every input chunk."""
+    level = LEVELS[encoding][0]
+    if encoding == 'gzip':
+        c = zlib.compressobj(level, zlib.DEFLATED, 31)
+        process, flush, finish = c.compress, lambda: c.flush(zlib.Z_SYNC_FLUSH), c.flush
+    elif encoding == 'br':
+        c = _codec('br').Compressor(quality=level)
+        process, flush, finish = c.process, c.flush, c.finish
+    elif encoding == 'zstd':
+        zstandard = _codec('zstd')
+        c = zstandard.ZstdCompressor(level=level).compressobj()
+        process, flush, finish = c.compress, lambda: c.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK), c.flush
+    else:
+        raise ValueError(f'Unsupported encoding: {encoding}')
+    for chunk in chunks:
+        if isinstance(chunk, str):
+            chunk = chunk.encode('utf-8')
+        out = process(chunk) + flush()
+        if out:
+            yield out
+    yield finish()
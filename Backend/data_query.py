@@ -0,0 +1,377 @@
+"""
+Query-string -> parameterized SQLite for /api/data and /api/aggregate.
+
+Supported request arguments (all optional; no arguments = whole table):
+- columns=StudentId,Status           projection (physical or snake_case names)
+- eq.<col>=v  (repeat for IN)        equality filter, e.g. eq.visa_status=Student Visa
+- ne.<col>=v                         inequality filter
+- gt./gte./lt./lte.<col>=v           range filter, e.g. gte.startdate=2024-01-01
+- sort=<col> | sort=-<col>           order (descending with leading '-')
+- limit=N                            page size (keyset pagination)
+- after=<cursor>                     opaque cursor returned in X-Next-Cursor
+
+/api/aggregate takes the same filters plus:
+- group_by=<col> (or x=)             dimension (also intake_year / intake_term)
+- metric=<measure> (or y=)           __count__, __pct_of_total__, __avg_age__,
+                                     __avg__<col>__, __count_yes__<col>__ or a
+                                     numeric column (summed)
+- type=<chart type>, cap=N           category cap (not applied to line charts)
+
+Identifiers are never interpolated from the request: every column is resolved
+against PRAGMA table_info and every value is bound as a parameter.
+"""
+
+import base64
+import json
+import re
+import sqlite3
+from typing import Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from schema_catalog import CATALOG
+
+RESERVED_ARGS = {'table', 'columns', 'sort', 'limit', 'after', 'x', 'y', 'group_by', 'metric', 'type', 'cap',
+                 'format', 'batch'}
+FILTER_OPS = {'eq': '=', 'ne': '<>', 'gt': '>', 'gte': '>=', 'lt': '<', 'lte': '<='}
+MAX_PAGE_SIZE = 10000
+# Same default as maxAxisCardinality in custom_dashboard.js
+MAX_AXIS_CARDINALITY = 200
+YES_VALUES = ('yes', 'true', 'y', '1')
+
+# Helper columns added to the SELECT list for keyset pagination
+ROWID_ALIAS = '__k_rowid__'
+SORT_ALIAS = '__k_sort__'
+
+
+def snake(name: str) -> str:
+    """Same normalization as snake() in custom_dashboard.js."""
+    s = re.sub(r'\s+', '_', str(name).strip())
+    s = re.sub(r'[^\w]', '_', s)
+    return re.sub(r'_+', '_', s).lower()
+
+
+def quote_ident(name: str) -> str:
+    """Double-quote an identifier that has already been resolved against the schema."""
+    return '"' + name.replace('"', '""') + '"'
+
+
+def table_columns(conn: sqlite3.Connection, table: str) -> List[str]:
+    return CATALOG.columns(conn, table)
+
+
+def is_table(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    return bool(row) and row[0] == 'table'
+
+
+# Field keys derived in custom_dashboard.js (deriveDomainFields) -> source column
+DERIVED_ALIASES = {
+    'upfront_fee_preference': 'do_you_want_to_pay_more_than_50_upfront_fee',
+    'StudyEnglish': 'are_you_currently_or_planning_to_study_english_whilst_in_australia',
+}
+
+# Dimensions computed from startdate, as in deriveDomainFields()
+DERIVED_DIMENSIONS = {
+    'intake_year': "CAST(strftime('%Y', {start}) AS INTEGER)",
+    'intake_term': "'Q' || ((CAST(strftime('%m', {start}) AS INTEGER) + 2) / 3)",
+}
+
+# Derived dimensions the ETL already stores as indexed columns (reports.add_date_keys)
+PRECOMPUTED_DIMENSIONS = {
+    'intake_year': 'startdate_year',
+}
+
+
+class ColumnResolver:
+    """Map request-side column names (physical, case-insensitive or snake_case) to physical names."""
+
+    def __init__(self, columns: List[str]):
+        self.columns = list(columns)
+        self._lookup: Dict[str, str] = {}
+        for c in self.columns:
+            self._lookup.setdefault(snake(c), c)
+            self._lookup.setdefault(snake(c).strip('_'), c)
+            self._lookup.setdefault(c.lower(), c)
+            self._lookup.setdefault(c, c)
+
+    def resolve(self, name: str) -> str:
+        name = (name or '').strip()
+        name = DERIVED_ALIASES.get(name, name)
+        col = self._lookup.get(name) or self._lookup.get(name.lower()) or self._lookup.get(snake(name))
+        if not col:
+            raise ValueError(f'Unknown column: {name!r}')
+        return col
+
+
+def encode_cursor(sort_value, rowid: int) -> str:
+    raw = json.dumps([sort_value, rowid], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(raw).decode('ascii').rstrip('=')
+
+
+def decode_cursor(token: str) -> Tuple[object, int]:
+    try:
+        padded = token + '=' * (-len(token) % 4)
+        sort_value, rowid = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+        return sort_value, int(rowid)
+    except Exception:
+        raise ValueError('Invalid pagination cursor.')
+
+
+def parse_filters(args, resolver: ColumnResolver) -> List[Tuple[str, str, List[str]]]:
+    """Collect (column, op, values) triples from <op>.<col>=value arguments."""
+    filters = []
+    for key in args.keys():
+        if key in RESERVED_ARGS or '.' not in key:
+            continue
+        op, _, col = key.partition('.')
+        if op not in FILTER_OPS:
+            raise ValueError(f'Unknown filter operator: {op!r}')
+        values = args.getlist(key)
+        if not values:
+            continue
+        filters.append((resolver.resolve(col), op, values))
+    return filters
+
+
+def where_clause(filters: List[Tuple[str, str, List[str]]]) -> Tuple[List[str], List[object]]:
+    """Compile filters into AND-ed SQL predicates plus bound parameters."""
+    preds, params = [], []
+    for col, op, values in filters:
+        qc = quote_ident(col)
+        if op in ('eq', 'ne') and len(values) > 1:
+            marks = ', '.join('?' * len(values))
+            preds.append(f'{qc} {"IN" if op == "eq" else "NOT IN"} ({marks})')
+            params.extend(values)
+        else:
+            for v in values:
+                preds.append(f'{qc} {FILTER_OPS[op]} ?')
+                params.append(v)
+    return preds, params
+
+
+def build_data_query(conn: sqlite3.Connection, table: str, args,
+                     fill_nulls: bool = False) -> Tuple[str, List[object], Optional[int]]:
+    """
+    Return (sql, params, limit) for a /api/data request against table.
+
+    When limit is set the query fetches limit + 1 rows and selects the
+    keyset helper columns after the projected ones; use split_page() or
+    split_rows() on the result. fill_nulls returns NULLs in the projected
+    columns as 0 (the record format's null handling); the helper columns
+    keep them, so cursors stay exact.
+    """
+    resolver = ColumnResolver(table_columns(conn, table))
+    if not resolver.columns:
+        raise ValueError(f'No such table or view: {table}')
+
+    cols_arg = (args.get('columns') or '').strip()
+    if cols_arg:
+        projection = [resolver.resolve(c) for c in cols_arg.split(',') if c.strip()]
+    else:
+        projection = list(resolver.columns)
+    if fill_nulls:
+        select = [f'COALESCE({quote_ident(c)}, 0) AS {quote_ident(c)}' for c in projection]
+    else:
+        select = [quote_ident(c) for c in projection]
+
+    preds, params = where_clause(parse_filters(args, resolver))
+
+    sort_arg = (args.get('sort') or '').strip()
+    descending = sort_arg.startswith('-')
+    sort_col = resolver.resolve(sort_arg.lstrip('-+')) if sort_arg else None
+    direction = 'DESC' if descending else 'ASC'
+
+    limit = None
+    if args.get('limit'):
+        try:
+            limit = int(args.get('limit'))
+        except ValueError:
+            raise ValueError('limit must be an integer.')
+        if limit <= 0:
+            raise ValueError('limit must be positive.')
+        limit = min(limit, MAX_PAGE_SIZE)
+
+    after = args.get('after')
+    order = []
+    if limit is not None or after:
+        # Keyset pagination needs a stable tiebreaker; rowid is only defined on tables
+        if not is_table(conn, table):
+            raise ValueError('Pagination is only supported on tables, not views.')
+        select.append(f'rowid AS {ROWID_ALIAS}')
+        if sort_col:
+            qs = quote_ident(sort_col)
+            select.append(f'{qs} AS {SORT_ALIAS}')
+            order = [f'{qs} {direction}', f'rowid {direction}']
+        else:
+            order = ['rowid ASC']
+        if after:
+            last_sort, last_rowid = decode_cursor(after)
+            if not sort_col:
+                preds.append('rowid > ?')
+                params.append(last_rowid)
+            else:
+                qs = quote_ident(sort_col)
+                # SQLite orders NULLs first ascending and last descending
+                if descending and last_sort is None:
+                    preds.append(f'({qs} IS NULL AND rowid < ?)')
+                    params.append(last_rowid)
+                elif descending:
+                    preds.append(f'({qs} < ? OR ({qs} = ? AND rowid < ?) OR {qs} IS NULL)')
+                    params.extend([last_sort, last_sort, last_rowid])
+                elif last_sort is None:
+                    preds.append(f'({qs} IS NOT NULL OR rowid > ?)')
+                    params.append(last_rowid)
+                else:
+                    preds.append(f'({qs} > ? OR ({qs} = ? AND rowid > ?))')
+                    params.extend([last_sort, last_sort, last_rowid])
+    elif sort_col:
+        order = [f'{quote_ident(sort_col)} {direction}']
+
+    sql = f'SELECT {", ".join(select)} FROM {quote_ident(table)}'
+    if preds:
+        sql += ' WHERE ' + ' AND '.join(preds)
+    if order:
+        sql += ' ORDER BY ' + ', '.join(order)
+    if limit is not None:
+        sql += ' LIMIT ?'
+        params.append(limit + 1)
+    return sql, params, limit
+
+
+def split_page(df: pd.DataFrame, limit: Optional[int]) -> Tuple[pd.DataFrame, Optional[str]]:
+    """Trim the look-ahead row, drop helper columns and return (df, next_cursor)."""
+    if limit is None:
+        return df, None
+    next_cursor = None
+    if len(df) > limit:
+        df = df.iloc[:limit]
+        last = df.iloc[-1]
+        sort_value = last.get(SORT_ALIAS)
+        if sort_value is not None and pd.isna(sort_value):
+            sort_value = None
+        elif hasattr(sort_value, 'item'):
+            sort_value = sort_value.item()  # numpy scalar -> Python for JSON
+        next_cursor = encode_cursor(sort_value, int(last[ROWID_ALIAS]))
+    return df.drop(columns=[c for c in (ROWID_ALIAS, SORT_ALIAS) if c in df.columns]), next_cursor
+
+
+def split_rows(columns: List[str], rows: List[tuple], limit: Optional[int]) -> Tuple[List[str], List[tuple], Optional[str]]:
+    """split_page() for cursor rows: (columns without the helper columns, rows, next_cursor).
+
+    The rows keep their helper values at the end; encoders that zip them with
+    the returned columns drop them.
+    """
+    if limit is None:
+        return columns, rows, None
+    next_cursor = None
+    if len(rows) > limit:
+        rows = rows[:limit]
+        last = rows[-1]
+        sort_value = last[columns.index(SORT_ALIAS)] if SORT_ALIAS in columns else None
+        next_cursor = encode_cursor(sort_value, last[columns.index(ROWID_ALIAS)])
+    return [c for c in columns if c not in (ROWID_ALIAS, SORT_ALIAS)], rows, next_cursor
+
+
+class AggregateTooWide(ValueError):
+    """Raised when the X dimension exceeds the category cap."""
+
+
+def _measure_sql(y: str, resolver: ColumnResolver) -> str:
+    if y == '__count__':
+        return 'COUNT(*)'
+    if y == '__pct_of_total__':
+        return 'COUNT(*) * 100.0 / SUM(COUNT(*)) OVER ()'
+    if y == '__avg_age__':
+        return f'AVG({quote_ident(resolver.resolve("age"))})'
+    m = re.fullmatch(r'__avg__(.+)__', y)
+    if m:
+        return f'AVG({quote_ident(resolver.resolve(m.group(1)))})'
+    m = re.fullmatch(r'__count_yes__(.+)__', y)
+    if m:
+        qc = quote_ident(resolver.resolve(m.group(1)))
+        yes = ', '.join(f"'{v}'" for v in YES_VALUES)
+        return f'SUM(CASE WHEN LOWER(TRIM(CAST({qc} AS TEXT))) IN ({yes}) THEN 1 ELSE 0 END)'
+    # Any other measure is a physical numeric column, summed
+    return f'TOTAL({quote_ident(resolver.resolve(y))})'
+
+
+def aggregate_axes(args) -> Tuple[str, str]:
+    """(dimension, measure) of an aggregate request: group_by / metric, or x / y."""
+    x = (args.get('group_by') or args.get('x') or '').strip()
+    y = (args.get('metric') or args.get('y') or '__count__').strip()
+    return x, y
+
+
+def aggregate_cap(args) -> Optional[int]:
+    """Category cap for an aggregate request (None for line charts)."""
+    cap = MAX_AXIS_CARDINALITY
+    if args.get('cap'):
+        try:
+            cap = int(args.get('cap'))
+        except ValueError:
+            raise ValueError('cap must be an integer.')
+        if cap < 1:
+            raise ValueError('cap must be positive.')
+    if (args.get('type') or 'bar') == 'line':
+        return None
+    return min(cap, MAX_AXIS_CARDINALITY)
+
+
+def build_aggregate_query(conn: sqlite3.Connection, table: str, args) -> Tuple[str, List[object], Optional[int]]:
+    """
+    Return (sql, params, cap) for a /api/aggregate request.
+
+    The query yields (label, value, n) rows ordered by label. When cap is
+    set it fetches cap + 1 groups so the caller can detect overflow.
+    """
+    resolver = ColumnResolver(table_columns(conn, table))
+    if not resolver.columns:
+        raise ValueError(f'No such table or view: {table}')
+
+    x, y = aggregate_axes(args)
+    if not x:
+        raise ValueError('group_by is required.')
+    if PRECOMPUTED_DIMENSIONS.get(x) in resolver.columns:
+        x_sql = quote_ident(PRECOMPUTED_DIMENSIONS[x])
+    elif x in DERIVED_DIMENSIONS:
+        x_sql = DERIVED_DIMENSIONS[x].format(start=quote_ident(resolver.resolve('startdate')))
+    else:
+        x_sql = quote_ident(resolver.resolve(x))
+
+    preds, params = where_clause(parse_filters(args, resolver))
+
+    cap = aggregate_cap(args)
+    sql = (f"SELECT COALESCE({x_sql}, 'Unknown') AS label, "
+           f"{_measure_sql(y, resolver)} AS value, COUNT(*) AS n "
+           f"FROM {quote_ident(table)}")
+    if preds:
+        sql += ' WHERE ' + ' AND '.join(preds)
+    sql += ' GROUP BY label ORDER BY label'
+    if cap is not None:
+        sql += ' LIMIT ?'
+        params.append(cap + 1)
+    return sql, params, cap
+
+
+def run_aggregate(conn: sqlite3.Connection, table: str, args, query=None) -> dict:
+    """
+    Execute an aggregate request and shape it as {x, y, labels, values, counts, total}.
+
+    query is an already built (sql, params, cap), e.g. from rollup.py;
+    by default the request is compiled against table.
+    """
+    sql, params, cap = query or build_aggregate_query(conn, table, args)
+    rows = conn.execute(sql, params).fetchall()
+    if cap is not None and len(rows) > cap:
+        raise AggregateTooWide(f'Too many categories on X (more than {cap}). Add a filter or switch chart.')
+    counts = [r[2] for r in rows]
+    x, y = aggregate_axes(args)
+    return {
+        'x': x,
+        'y': y,
+        'labels': [r[0] for r in rows],
+        'values': [r[1] if r[1] is not None else 0 for r in rows],
+        'counts': counts,
+        'total': sum(counts),
+    }
@@ -0,0 +1,121 @@
+"""
+Thread-local SQLite connection pools.
+
+Each worker thread keeps one open connection per database and reuses it
+across requests. Analytics connections are opened read-only (mode=ro URI,
+query_only) with mmap and a larger page cache; the users database runs in
+WAL mode so logins never block on registration.
+
+A connection is reopened automatically when the database file is replaced
+(different inode), i.e. after the ETL swaps in a rebuilt dummy_data.db, and
+closed when its thread exits, so a thread-per-request server (app.run) does
+not leak one connection per request.
+"""
+
+import os
+import sqlite3
+import threading
+import weakref
+from typing import Callable, Dict, List, Optional
+
+# Tuned for read-heavy dashboard queries
+READ_PRAGMAS = {
+    'mmap_size': 268435456,   # 256 MB
+    'cache_size': -65536,     # 64 MB (negative = KiB)
+    'temp_store': 'MEMORY',
+    'query_only': 'ON',
+    'busy_timeout': 5000,     # rides out an in-place swap (backup API fallback on Windows)
+}
+WRITE_PRAGMAS = {
+    'busy_timeout': 5000,
+    'synchronous': 'NORMAL',
+}
+
+
+def enable_wal(path: str) -> None:
+    """Switch a database file to WAL journaling (persistent; needs a writable connection)."""
+    if not os.path.exists(path):
+        return
+    conn = sqlite3.connect(path, timeout=5)
+    try:
+        conn.execute('PRAGMA journal_mode = WAL;')
+    finally:
+        conn.close()
+
+
+def _inode(path: str) -> Optional[int]:
+    try:
+        return os.stat(path).st_ino
+    except FileNotFoundError:
+        return None
+
+
+class _Slot:
+    """A thread's connection; the finalizer closes it once the thread's local storage is freed."""
+
+    __slots__ = ('conn', 'inode', 'close', '__weakref__')
+
+    def __init__(self, conn: sqlite3.Connection, inode: Optional[int], close: Callable[[sqlite3.Connection], None]):
+        self.conn = conn
+        self.inode = inode
+        self.close = weakref.finalize(self, close, conn)
+
+
+class ConnectionPool:
+    """One reusable connection per thread for a single database file."""
+
+    def __init__(self, path: str, read_only: bool = False, pragmas: Optional[Dict[str, object]] = None,
+                 on_open: Optional[Callable[[sqlite3.Connection], None]] = None):
+        self.path = path
+        self.read_only = read_only
+        self.pragmas = dict(pragmas if pragmas is not None else (READ_PRAGMAS if read_only else WRITE_PRAGMAS))
+        self.on_open = on_open  # e.g. metrics.instrument_connection
+        self._local = threading.local()
+        self._all: List[sqlite3.Connection] = []
+        self._lock = threading.Lock()
+
+    def _open(self) -> sqlite3.Connection:
+        if self.read_only:
+            uri = 'file:' + os.path.abspath(self.path).replace('\\', '/') + '?mode=ro'
+            conn = sqlite3.connect(uri, uri=True, check_same_thread=False)
+        else:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value};')
+        if self.on_open is not None:
+            self.on_open(conn)
+        with self._lock:
+            self._all.append(conn)
+        return conn
+
+    def _discard(self, conn: sqlite3.Connection) -> None:
+        with self._lock:
+            if conn in self._all:
+                self._all.remove(conn)
+        try:
+            conn.close()
+        except sqlite3.Error:
+            pass
+
+    def get(self) -> sqlite3.Connection:
+        """Return this thread's connection, (re)opening it if needed."""
+        slot = getattr(self._local, 'slot', None)
+        inode = _inode(self.path)
+        if slot is not None and slot.inode != inode:
+            slot.close()
+            slot = None
+        if slot is None:
+            slot = _Slot(self._open(), inode, self._discard)
+            self._local.slot = slot
+        return slot.conn
+
+    def close_all(self) -> None:
+        """Close every connection handed out by this pool (threads reopen lazily)."""
+        with self._lock:
+            conns, self._all = self._all, []
+        for conn in conns:
+            try:
+                conn.close()
+            except sqlite3.Error:
+                pass
+        self._local = threading.local()
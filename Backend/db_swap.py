@@ -0,0 +1,136 @@
+"""
+Shadow-database builds with an atomic swap into place.
+
+Loaders write a sibling file (shadow_path), finish it (finalize_shadow:
+ANALYZE, rollback journal) and then publish() it over the live database
+with a single os.replace(). A reader sees either the old file or the new
+one, never a half-built database; the API's ConnectionPool notices the new
+inode and reopens its connections on the next request.
+
+If WSGI_PIDFILE names a running gunicorn master (gunicorn.conf.py),
+publish() also sends it SIGHUP so it swaps in freshly warmed workers.
+
+The analytics database is therefore left in rollback-journal mode: it is
+only ever replaced, never written in place, and a stale -wal sidecar
+from the old file must not be replayed against the new one.
+"""
+
+import os
+import signal
+import sqlite3
+import time
+
+# A builder lock older than this was left behind by a crashed process
+STALE_LOCK_SECONDS = 3600
+
+
+def shadow_path(live_path: str) -> str:
+    """Temporary build location next to the live file (same filesystem, so the rename is atomic)."""
+    return f"{live_path}.{os.getpid()}.building"
+
+
+def _sidecars(path: str):
+    return [path + suffix for suffix in ("-journal", "-wal", "-shm")]
+
+
+def discard_shadow(path: str) -> None:
+    for p in [path] + _sidecars(path):
+        try:
+            os.remove(p)
+        except FileNotFoundError:
+            pass
+
+
+def copy_database(src_path: str, dst_path: str) -> None:
+    """Consistent copy of a (possibly in-use) database via the SQLite backup API."""
+    discard_shadow(dst_path)
+    src = sqlite3.connect(src_path, timeout=30)
+    dst = sqlite3.connect(dst_path)
+    try:
+        src.backup(dst)
+        dst.execute("PRAGMA journal_mode = DELETE;")
+    finally:
+        dst.close()
+        src.close()
+
+
+def finalize_shadow(path: str) -> None:
+    """Refresh planner statistics and leave the file self-contained (no WAL sidecar)."""
+    conn = sqlite3.connect(path)
+    try:
+        conn.execute("ANALYZE;")
+        conn.execute("PRAGMA journal_mode = DELETE;")
+    finally:
+        conn.close()
+
+
+def _retire_wal(live_path: str) -> None:
+    # Older deployments ran the analytics DB in WAL mode. Fold the log back in
+    # so no frames of the old file are left behind for the new one to pick up.
+    if not os.path.exists(live_path + "-wal"):
+        return
+    conn = sqlite3.connect(live_path, timeout=30)
+    try:
+        conn.execute("PRAGMA wal_checkpoint(TRUNCATE);")
+        conn.execute("PRAGMA journal_mode = DELETE;")
+    finally:
+        conn.close()
+    if os.path.exists(live_path + "-wal") and os.path.getsize(live_path + "-wal") > 0:
+        raise RuntimeError(f"{live_path} still has an active WAL; stop readers once and retry")
+
+
+def try_lock(path: str) -> bool:
+    """Take an exclusive lock file so one process at a time rebuilds a database; False if it is held."""
+    for _ in range(2):
+        try:
+            os.close(os.open(path, os.O_CREAT | os.O_EXCL | os.O_WRONLY))
+            return True
+        except FileExistsError:
+            try:
+                if time.time() - os.path.getmtime(path) < STALE_LOCK_SECONDS:
+                    return False
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+    return False
+
+
+def release_lock(path: str) -> None:
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+def notify_reload() -> bool:
+    """SIGHUP the WSGI master named by $WSGI_PIDFILE (graceful worker reload); False if there is none."""
+    pidfile = os.getenv("WSGI_PIDFILE")
+    if not pidfile or not hasattr(signal, "SIGHUP"):
+        return False
+    try:
+        with open(pidfile) as f:
+            pid = int(f.read().strip())
+        os.kill(pid, signal.SIGHUP)
+    except (OSError, ValueError):
+        return False
+    return True
+
+
+def publish(shadow: str, live_path: str) -> None:
+    """Atomically move a finished shadow database over the live one."""
+    if os.path.exists(live_path):
+        _retire_wal(live_path)
+    try:
+        os.replace(shadow, live_path)
+    except PermissionError:
+        # Windows refuses to replace a file other processes hold open; copy the
+        # pages in instead (one write transaction, so readers still see old or new)
+        src = sqlite3.connect(shadow)
+        dst = sqlite3.connect(live_path, timeout=30)
+        try:
+            src.backup(dst)
+        finally:
+            dst.close()
+            src.close()
+        discard_shadow(shadow)
+    notify_reload()
@@ -3,10 +3,23 @@
 """
 ETL: Excel (.xlsx) -> SQLite (.db)
 - Infers SQLite column types: INTEGER, REAL, TEXT (ISO date/datetime stored as TEXT)
+  (once per distinct value, with vectorized pandas/NumPy ops)
 - Coerces booleans (yes/no, true/false, 1/0) -> INTEGER 0/1
 - Sanitizes table & column names, resolves duplicates
-- Drops/recreates tables, bulk inserts
-- Adds helpful indexes on common columns
+- Streams each sheet in --batch-size row batches (see excel_stream.py); types
+  come from the first batch and widen if a later batch does not fit
+- Drops/recreates tables, bulk inserts (--mode full, default)
+- Or upserts by natural key into a copy of the current DB (--mode incremental)
+- Adds helpful indexes on common columns, plus the composite/covering indexes
+  the report queries read (reports.REPORT_INDEXES)
+- Stores integer year/month/day keys for the fact table's date columns
+  (reports.add_date_keys), so time-bucketed reports scan an index
+- Builds the v_* report summary tables and the /api/aggregate rollup (see reports.py, rollup.py)
+- Builds into a shadow file and swaps it over the live DB atomically (see db_swap.py)
+- --workers N parses and types sheets in a process pool; this process stays the
+  only writer and reports per-sheet timings
+- --advise replays the report queries against --db under EXPLAIN QUERY PLAN
+  and lists the full table scans left (nothing is loaded)
 """
 
 import os
@@ -15,12 +28,18 @@ import sys
 import time
 import argparse
 import sqlite3
-from typing import Dict, List, Tuple
-from datetime import datetime
+import tempfile
+import warnings
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Iterable, Iterator, List, Tuple
 
 import numpy as np
 import pandas as pd
 
+from excel_stream import DEFAULT_BATCH_ROWS, iter_sheet_batches, sheet_names
+from db_swap import copy_database, discard_shadow, finalize_shadow, publish, shadow_path
+from reports import SOURCE_TABLE, add_date_keys, create_report_indexes, materialize_reports, report_plans
+
 # -------- CLI --------
 
 def parse_args():
@@ -29,6 +48,14 @@ def parse_args():
     p.add_argument("--db", default="dummy_data.db", help="Output SQLite file")
     p.add_argument("--retries", type=int, default=8, help="Retries if files are locked")
     p.add_argument("--wait", type=float, default=0.75, help="Seconds between retries")
+    p.add_argument("--mode", choices=["full", "incremental"], default="full",
+                   help="full: rebuild the DB; incremental: upsert changed rows into a copy of the current DB")
+    p.add_argument("--workers", type=int, default=1,
+                   help="Processes that parse and type sheets in parallel (1: serial)")
+    p.add_argument("--batch-size", type=int, default=DEFAULT_BATCH_ROWS,
+                   help="Rows read, typed and inserted per batch (types are inferred from the first batch)")
+    p.add_argument("--advise", action="store_true",
+                   help="Print the report query plans for --db and flag full table scans, then exit")
     return p.parse_args()
 
 # -------- Name utilities --------
@@ -100,142 +127,269 @@ BOOL_MAP = {
     True: 1, False: 0,
 }
 
-def coerce_bool(series: pd.Series) -> Tuple[pd.Series, bool]:
-    s = series.copy()
-    # Treat NaN as NaN (don’t turn into "nan")
-    mask_nonnull = s.notna()
-    s_str = s.astype(str).str.strip().str.lower()
-    mapped = s_str.map(BOOL_MAP)
-    # keep NaNs
-    mapped = mapped.where(mask_nonnull, np.nan)
-    # Consider boolean if >=90% of non-nulls mapped
-    if mapped.notna().sum() >= 0.9 * mask_nonnull.sum() and mask_nonnull.sum() > 0:
-        return mapped.astype("Int64"), True
-    return series, False
-
-def infer_datetime(series: pd.Series) -> Tuple[pd.Series, bool]:
-    # Use pandas to attempt parse
-    dt = pd.to_datetime(series, errors="coerce", dayfirst=False, infer_datetime_format=True)
-    nonnull = series.notna().sum()
+# Distinct values parsed up front when looking for dates; a column where
+# fewer than half of them parse is rejected without parsing the rest
+DATE_SAMPLE_SIZE = 1000
+
+def distinct_values(series: pd.Series) -> Tuple[np.ndarray, pd.Series]:
+    """(codes, uniques): codes index into uniques per row, -1 for nulls.
+
+    Inference runs once per distinct value instead of once per cell.
+    """
+    if series.dtype == object and pd.api.types.infer_dtype(series, skipna=True).startswith("mixed"):
+        # 1, 1.0 and True hash alike but render differently; don't merge them
+        notna = series.notna().to_numpy()
+        codes = np.full(len(series), -1, dtype=np.intp)
+        codes[notna] = np.arange(notna.sum())
+        return codes, series[notna].reset_index(drop=True)
+    codes, uniques = pd.factorize(series)
+    return codes, pd.Series(uniques)
+
+def expand(values, codes: np.ndarray, fill=None) -> np.ndarray:
+    """Map per-distinct-value results back onto every row; nulls become `fill`."""
+    values = np.asarray(values)
+    if len(values) == 0:
+        return np.full(len(codes), fill, dtype=object if fill is None else float)
+    out = values.take(codes)
+    out[codes < 0] = fill
+    return out
+
+def bool_values(u: pd.Series) -> pd.Series | None:
+    """yes/no, true/false, 1/0 -> 1/0 (NaN where unmapped); None for dtypes that never map."""
+    if pd.api.types.is_float_dtype(u) or pd.api.types.is_datetime64_any_dtype(u):
+        return None  # never renders as a BOOL_MAP key
+    if pd.api.types.is_integer_dtype(u):
+        return u.where(u.isin([0, 1]))
+    return u.astype(str).str.strip().str.lower().map(BOOL_MAP)
+
+def coerce_bool(u: pd.Series, w: np.ndarray) -> pd.Series | None:
+    """Map to 1/0 if >=90% of non-nulls map; else None."""
+    mapped = bool_values(u)
+    nonnull = w.sum()
+    if mapped is not None and nonnull > 0 and w[mapped.notna().to_numpy()].sum() >= 0.9 * nonnull:
+        return mapped
+    return None
+
+def datetime_values(u: pd.Series) -> pd.Series:
+    # Numbers would parse as nanoseconds since 1970; leave them to infer_numeric
+    if pd.api.types.is_numeric_dtype(u) and not pd.api.types.is_bool_dtype(u):
+        return pd.Series(pd.NaT, index=u.index, dtype="datetime64[ns]")
+    # pandas infers the format from the first value, which is also uniques[0];
+    # text columns that are not dates fail that inference on every load
+    with warnings.catch_warnings():
+        warnings.filterwarnings("ignore", message="Could not infer format", category=UserWarning)
+        return pd.to_datetime(u, errors="coerce", dayfirst=False)
+
+def infer_datetime(u: pd.Series, w: np.ndarray, has_nulls: bool) -> Tuple[pd.Series | None, str | None]:
+    """(parsed, "date" | "datetime") if >=80% of non-nulls parse; else (None, None)."""
+    if pd.api.types.is_numeric_dtype(u) and not pd.api.types.is_bool_dtype(u):
+        return None, None
+    nonnull = w.sum()
     if nonnull == 0:
-        return series, False
-    # Consider datetime if >=80% of non-nulls parse
-    if dt.notna().sum() >= max(3, int(0.8 * nonnull)):
-        # Pick DATE vs DATETIME by checking for time components
-        times = dt.dt.time
-        is_all_midnight = (times == datetime.min.time()).all()
-        if is_all_midnight:
-            out = dt.dt.strftime("%Y-%m-%d")
-        else:
-            out = dt.dt.strftime("%Y-%m-%d %H:%M:%S")
-        return out.where(dt.notna(), None), True
-    return series, False
-
-def infer_numeric(series: pd.Series) -> Tuple[pd.Series, str | None]:
-    s = series.replace(list(NUMERIC_NULLS), np.nan)
-    nums = pd.to_numeric(s, errors="coerce")
-    nonnull = s.notna().sum()
+        return None, None
+    if u.dtype == object and len(u) > DATE_SAMPLE_SIZE:
+        sample = datetime_values(u[:DATE_SAMPLE_SIZE])
+        if w[:DATE_SAMPLE_SIZE][sample.notna().to_numpy()].sum() < 0.5 * w[:DATE_SAMPLE_SIZE].sum():
+            return None, None
+    dt = datetime_values(u)
+    parsed = dt.notna().to_numpy()
+    if w[parsed].sum() < max(3, int(0.8 * nonnull)):
+        return None, None
+    # DATE when every row is a parsed midnight; a blank or unparsed cell keeps the time
+    if not has_nulls and parsed.all() and (dt == dt.dt.normalize()).all():
+        return dt, "date"
+    return dt, "datetime"
+
+def numeric_values(u: pd.Series) -> Tuple[pd.Series, np.ndarray]:
+    """(numbers with NaN where not numeric, mask of NUMERIC_NULLS spellings)."""
+    nullish = u.isin([v for v in NUMERIC_NULLS if v is not None]).to_numpy()
+    return pd.to_numeric(u.where(~nullish), errors="coerce"), nullish
+
+def infer_numeric(u: pd.Series, w: np.ndarray) -> Tuple[pd.Series | None, str | None]:
+    """(numbers, "integer" | "real") if >=80% of non-nulls convert; else (None, None)."""
+    nums, nullish = numeric_values(u)
+    nonnull = w[~nullish].sum()
     if nonnull == 0:
-        return series, None
-    if nums.notna().sum() >= max(3, int(0.8 * nonnull)):
+        return None, None
+    if w[nums.notna().to_numpy()].sum() >= max(3, int(0.8 * nonnull)):
         # INTEGER if all non-nulls are whole numbers
-        only_whole = np.isclose(nums.dropna() % 1, 0).all()
-        if only_whole:
-            return nums.astype("Int64"), "INTEGER"
-        return nums.astype(float), "REAL"
-    return series, None
+        if np.isclose(nums.dropna() % 1, 0).all():
+            return nums, "integer"
+        return nums, "real"
+    return None, None
+
+# Column kinds chosen by inference and the SQLite type each is stored as
+KIND_TYPES = {"bool": "INTEGER", "date": "TEXT", "datetime": "TEXT",
+              "integer": "INTEGER", "real": "REAL", "text": "TEXT"}
+DATE_FORMATS = {"date": "%Y-%m-%d", "datetime": "%Y-%m-%d %H:%M:%S"}
+
+def build_column(u: pd.Series, codes: np.ndarray, index: pd.Index, kind: str, values: pd.Series) -> pd.Series:
+    """Expand per-distinct-value results for `kind` back to a full column."""
+    if kind == "bool":
+        out = pd.array(values.to_numpy(dtype=float), dtype="Int64").take(codes, allow_fill=True)
+    elif kind in DATE_FORMATS:
+        iso = values.dt.strftime(DATE_FORMATS[kind]).where(values.notna(), None)
+        out = expand(iso.to_numpy(dtype=object), codes)
+    elif kind == "integer" and np.isclose(values.dropna() % 1, 0).all():
+        out = pd.array(values.to_numpy(), dtype="Int64").take(codes, allow_fill=True)
+    elif kind in ("integer", "real"):
+        out = expand(values.to_numpy(dtype=float), codes, np.nan)
+    else:
+        out = expand(u.astype(str).to_numpy(dtype=object), codes)
+    return pd.Series(out, index=index)
+
+def infer_column(series: pd.Series) -> Tuple[pd.Series, str]:
+    """Classify one column (bool -> date/datetime -> number -> text) and convert it."""
+    codes, u = distinct_values(series)
+    w = np.bincount(codes[codes >= 0], minlength=len(u))
+    has_nulls = bool((codes < 0).any())
+
+    # 1) Boolean?
+    mapped = coerce_bool(u, w)
+    if mapped is not None:
+        return build_column(u, codes, series.index, "bool", mapped), "bool"
+
+    # 2) Datetime? (ISO 8601 text)
+    dt, kind = infer_datetime(u, w, has_nulls)
+    if kind is not None:
+        return build_column(u, codes, series.index, kind, dt), kind
+
+    # 3) Numeric?
+    nums, kind = infer_numeric(u, w)
+    if kind is not None:
+        return build_column(u, codes, series.index, kind, nums), kind
+
+    # 4) Fallback text
+    return build_column(u, codes, series.index, "text", u), "text"
+
+def convert_column(series: pd.Series, kind: str) -> pd.Series:
+    """Convert a column to an already inferred kind (no thresholds; values that don't fit become NULL)."""
+    codes, u = distinct_values(series)
+    if kind == "bool":
+        values = bool_values(u)
+        values = pd.Series(np.nan, index=u.index) if values is None else values
+    elif kind in DATE_FORMATS:
+        values = datetime_values(u)
+    elif kind in ("integer", "real"):
+        values = numeric_values(u)[0]
+    else:
+        values = u
+    return build_column(u, codes, series.index, kind, values)
 
 def infer_df_types(df: pd.DataFrame) -> Tuple[pd.DataFrame, Dict[str, str]]:
-    """Return converted DataFrame and {col: sqlite_type}."""
-    out = pd.DataFrame(index=df.index)
-    coltypes: Dict[str, str] = {}
+    """Return converted DataFrame and {col: kind} (see KIND_TYPES)."""
+    converted: Dict[str, pd.Series] = {}
+    kinds: Dict[str, str] = {}
     for col in df.columns:
-        s = df[col]
-
-        # 1) Boolean?
-        s2, is_bool = coerce_bool(s)
-        if is_bool:
-            out[col] = s2
-            coltypes[col] = "INTEGER"
-            continue
-
-        # 2) Datetime?
-        s3, is_dt = infer_datetime(s2)
-        if is_dt:
-            out[col] = s3
-            coltypes[col] = "TEXT"  # ISO 8601
-            continue
-
-        # 3) Numeric?
-        s4, num_type = infer_numeric(s3)
-        if num_type is not None:
-            out[col] = s4
-            coltypes[col] = num_type
+        converted[col], kinds[col] = infer_column(df[col])
+    return pd.DataFrame(converted, index=df.index), kinds
+
+# Kinds a column may be widened along when a later batch doesn't fit
+KIND_CHAINS = [["bool", "integer", "real"], ["date", "datetime"]]
+
+def widen(a: str, b: str) -> str:
+    """Narrowest kind that holds both (rows already written as `a` stay valid)."""
+    for chain in KIND_CHAINS:
+        if a in chain and b in chain:
+            return chain[max(chain.index(a), chain.index(b))]
+    return a if a == b else "text"
+
+def typed_batches(batches: Iterable[pd.DataFrame], table: str = "") -> Iterator[Tuple[pd.DataFrame, Dict[str, str]]]:
+    """The first batch decides each column's kind; later batches are converted to it.
+
+    A later column whose values would be lost in that conversion (e.g. a 2 in
+    a column the first batch saw as 0/1 flags) widens the kind from then on.
+    """
+    kinds = None
+    nullish = [v for v in NUMERIC_NULLS if v is not None]
+    for df in batches:
+        if kinds is None:
+            df_conv, kinds = infer_df_types(df)
+            yield df_conv, kinds
             continue
-
-        # 4) Fallback text
-        txt = s3.astype(str)
-        # Keep None/NaN as None
-        txt = txt.where(s3.notna(), None)
-        out[col] = txt
-        coltypes[col] = "TEXT"
-
-    return out, coltypes
+        converted = {}
+        for c in df.columns:
+            s = df[c]
+            out = convert_column(s, kinds[c])
+            if (s.notna() & out.isna() & ~s.isin(nullish)).any():
+                wider = widen(kinds[c], infer_column(s)[1])
+                if wider != kinds[c]:
+                    print(f"[WARN] {table}.{c}: widened {kinds[c]} -> {wider}")
+                    kinds[c] = wider
+                    out = convert_column(s, wider)
+            converted[c] = out
+        yield pd.DataFrame(converted, index=df.index), kinds
+
+def sqlite_types(kinds: Dict[str, str]) -> Dict[str, str]:
+    return {c: KIND_TYPES[k] for c, k in kinds.items()}
 
 # -------- Excel loading --------
 
-def open_excel(path: str, retries: int, wait: float) -> Dict[str, pd.DataFrame]:
-    """Load all sheets; sanitize sheet & column names; ensure unique columns."""
+def open_excel(path: str, retries: int, wait: float) -> Dict[str, str]:
+    """Map sanitized, de-duplicated table names to sheet names (rows are streamed later)."""
     if not os.path.exists(path):
         sys.exit(f"[ERROR] Excel file not found: {path}")
     wait_for_file(path, retries=retries, wait=wait)
 
     try:
-        xls = pd.ExcelFile(path, engine="openpyxl")
+        names = sheet_names(path)
     except Exception as e:
         sys.exit(
             f"[ERROR] Could not open '{path}'. "
             f"If it's .xlsx, ensure 'openpyxl' is installed: pip install openpyxl\n{e}"
         )
 
-    tables: Dict[str, pd.DataFrame] = {}
-    used_names = set()
-
-    for sheet in xls.sheet_names:
-        raw = pd.read_excel(xls, sheet_name=sheet)
-        # Sanitize and dedupe columns
-        cols = [sanitize_name(c) for c in raw.columns]
-        cols = ensure_unique(cols)
-        raw.columns = cols
+    return table_names(names)
 
+def table_names(names: List[str]) -> Dict[str, str]:
+    """Map sanitized, de-duplicated table names to sheet names."""
+    tables: Dict[str, str] = {}
+    for sheet in names:
         # Sanitize table name; dedupe across sheets if needed
         tname = sanitize_name(sheet)
         suffix = 2
         base = tname
-        while tname in used_names:
+        while tname in tables:
             tname = f"{base}_{suffix}"
             suffix += 1
-        used_names.add(tname)
-
-        tables[tname] = raw
+        tables[tname] = sheet
 
     return tables
 
+def sheet_batches(path: str, sheet: str, batch_size: int) -> Iterator[pd.DataFrame]:
+    """Stream one sheet in row batches with sanitized, unique column names."""
+    for df in iter_sheet_batches(path, sheet, batch_size):
+        df.columns = ensure_unique([sanitize_name(c) for c in df.columns])
+        yield df
+
 # -------- SQL helpers --------
 
-def create_table_sql(table: str, df: pd.DataFrame, coltypes: Dict[str, str]) -> str:
-    cols_sql = [f'"{c}" {coltypes[c]}' for c in df.columns]
+def create_table_sql(table: str, columns: List[str], coltypes: Dict[str, str]) -> str:
+    cols_sql = [f'"{c}" {coltypes[c]}' for c in columns]
 
     # Add synthetic PK only if you want explicit primary key;
     # SQLite already has an implicit rowid, so this is optional.
     # Keep for backward-compat with your previous script:
     has_id_like = any(
-        c in df.columns
+        c in columns
         for c in ["id", "student_id", "application_id", "offer_id"]
     )
     pk = "" if has_id_like else ', "__rowid__" INTEGER PRIMARY KEY AUTOINCREMENT'
     return f'CREATE TABLE "{table}" ({", ".join(cols_sql)}{pk});'
 
+def sqlite_values(s: pd.Series) -> list:
+    """One column as plain Python values (numpy scalars would bind as BLOBs); NaN/NaT/"nan" -> None."""
+    values = s.to_numpy(dtype=object)  # ints/floats come out as Python int/float
+    null = s.isna().to_numpy()
+    if s.dtype == object:
+        null |= values == "nan"
+    values[null] = None
+    return values.tolist()
+
+def sqlite_rows(df: pd.DataFrame) -> List[tuple]:
+    """Rows for executemany, assembled column-wise from the underlying arrays."""
+    return list(zip(*(sqlite_values(df[c]) for c in df.columns)))
+
 IDX_TARGETS = [
     "id", "student_id", "application_id", "offer_id", "enrollment_id", "visa_id",
     "agent_id", "term", "intake", "status",
@@ -243,11 +397,28 @@ IDX_TARGETS = [
     "granted_date", "lodged_date", "startdate", "finishdate"
 ]
 
-def add_indexes(conn: sqlite3.Connection, table: str, df: pd.DataFrame) -> None:
-    existing = set(df.columns)
+def add_keys_and_indexes(conn: sqlite3.Connection, table: str, columns: List[str]) -> None:
+    if table == SOURCE_TABLE:
+        keyed = add_date_keys(conn, table)
+        if keyed:
+            print(f"  - Date keys for {', '.join(keyed)}")
+    add_indexes(conn, table, columns)
+
+def add_indexes(conn: sqlite3.Connection, table: str, columns: List[str]) -> None:
     made = 0
+    leading = set()
+    if table == SOURCE_TABLE:
+        # Composite indexes shaped after the report queries; they also serve
+        # lookups on their first column, so no single-column copy is needed
+        try:
+            report_idx = create_report_indexes(conn, table)
+            made += len(report_idx)
+            leading = {cols[0] for cols in report_idx}
+        except Exception as e:
+            print(f"[WARN] Could not create report indexes on {table}: {e}")
+    existing = set(columns)
     for col in IDX_TARGETS:
-        if col in existing:
+        if col in existing and col not in leading:
             idx_name = f'idx_{table}_{col}'
             try:
                 conn.execute(f'CREATE INDEX IF NOT EXISTS "{idx_name}" ON "{table}" ("{col}");')
@@ -257,75 +428,376 @@ def add_indexes(conn: sqlite3.Connection, table: str, df: pd.DataFrame) -> None:
     if made:
         print(f"  - Added {made} index(es) to {table}")
 
-def write_table(conn: sqlite3.Connection, table: str, df_raw: pd.DataFrame) -> None:
-    # Infer & convert types
-    df_conv, coltypes = infer_df_types(df_raw)
-
-    # Create table
+def write_table(conn: sqlite3.Connection, table: str, batches: Iterable[pd.DataFrame]) -> int:
+    """Recreate `table` from row batches; returns the number of rows (0: nothing written)."""
     cur = conn.cursor()
-    cur.execute(f'DROP TABLE IF EXISTS "{table}";')
-    ddl = create_table_sql(table, df_conv, coltypes)
-    cur.execute(ddl)
-
-    # Bulk insert
-    placeholders = ",".join(["?"] * len(df_conv.columns))
-    collist = ",".join([f'"{c}"' for c in df_conv.columns])
-    sql = f'INSERT INTO "{table}" ({collist}) VALUES ({placeholders})'
-
-    # Replace NaN/NaT with None for SQLite
-    rows = [
-        tuple(None if (pd.isna(v) or v == "nan") else v for v in row)
-        for row in df_conv.itertuples(index=False, name=None)
-    ]
-    if rows:
-        cur.executemany(sql, rows)
+    total = 0
+    sql = None
+    for df_conv, kinds in typed_batches(batches, table):
+        if sql is None:
+            if df_conv.empty:
+                return 0
+            # Create table
+            cur.execute(f'DROP TABLE IF EXISTS "{table}";')
+            cur.execute(create_table_sql(table, list(df_conv.columns), sqlite_types(kinds)))
+            placeholders = ",".join(["?"] * len(df_conv.columns))
+            collist = ",".join([f'"{c}"' for c in df_conv.columns])
+            sql = f'INSERT INTO "{table}" ({collist}) VALUES ({placeholders})'
+
+        # Bulk insert
+        rows = sqlite_rows(df_conv)
+        if rows:
+            cur.executemany(sql, rows)
+        total += len(rows)
+    if sql is None:
+        return 0
+
+    add_keys_and_indexes(conn, table, list(df_conv.columns))
     conn.commit()
-
-    add_indexes(conn, df_conv, df_conv)  # pass df for column existence
     # Log summary
+    coltypes = sqlite_types(kinds)
     summary = ", ".join(f"{k}:{coltypes[k]}" for k in df_conv.columns)
-    print(f"[OK] {table}: {len(rows)} rows → {summary}")
+    print(f"[OK] {table}: {total} rows → {summary}")
+    return total
+
+# -------- Incremental load --------
+
+# Natural key for fact rows; sheets without it are keyed by a content hash
+NATURAL_KEY = ["studentid", "offerid"]
+ROW_HASH_COL = "__row_hash__"
+
+def table_exists(conn: sqlite3.Connection, table: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='table' AND name=?", (table,)).fetchone()
+    return row is not None
+
+def index_exists(conn: sqlite3.Connection, name: str) -> bool:
+    row = conn.execute("SELECT 1 FROM sqlite_master WHERE type='index' AND name=?", (name,)).fetchone()
+    return row is not None
+
+def key_exprs(key_cols: List[str]) -> List[str]:
+    # COALESCE so rows with a NULL key part still conflict (NULLs never match in UNIQUE)
+    return [f"COALESCE(\"{c}\", '')" for c in key_cols]
+
+def row_hashes(df: pd.DataFrame, seen: Dict[str, int]) -> pd.Series:
+    """Content hash per row; repeats of an identical row get "#2", "#3", ... (counted across batches)."""
+    h = pd.util.hash_pandas_object(df, index=False).astype(str)
+    occurrence = h.groupby(h).cumcount() + h.map(seen).fillna(0).astype(int)
+    for value, count in h.value_counts().items():
+        seen[value] = seen.get(value, 0) + count
+    return h.where(occurrence == 0, h + "#" + (occurrence + 1).astype(str))
+
+def stage_rows(conn: sqlite3.Connection, stage: str, table: str, batches: Iterable[pd.DataFrame]) -> dict | None:
+    """Write typed rows to `stage` (plus a row hash when the natural key is missing).
+
+    Returns the stage layout upsert_table needs, or None for an empty sheet.
+    """
+    cur = conn.cursor()
+    layout = None
+    seen: Dict[str, int] = {}
+    for df_conv, kinds in typed_batches(batches, table):
+        if layout is None:
+            if df_conv.empty:
+                return None
+            coltypes = sqlite_types(kinds)
+            key_cols = [c for c in NATURAL_KEY if c in df_conv.columns]
+            hashed = len(key_cols) != len(NATURAL_KEY)
+            if hashed:
+                coltypes[ROW_HASH_COL] = "TEXT"
+                key_cols = [ROW_HASH_COL]
+            cols = list(df_conv.columns) + ([ROW_HASH_COL] if hashed else [])
+            layout = {"columns": cols, "coltypes": coltypes, "key_cols": key_cols, "hashed": hashed, "rows": 0}
+            collist = ",".join(f'"{c}"' for c in cols)
+            cur.execute(f'DROP TABLE IF EXISTS {stage};')
+            coldefs = ", ".join(f'"{c}" {coltypes[c]}' for c in cols)
+            cur.execute(f'CREATE TABLE {stage} ({coldefs});')
+            insert = f'INSERT INTO {stage} ({collist}) VALUES ({",".join(["?"] * len(cols))})'
+        if hashed:
+            df_conv[ROW_HASH_COL] = row_hashes(df_conv, seen)
+        rows = sqlite_rows(df_conv)
+        cur.executemany(insert, rows)
+        layout["rows"] += len(rows)
+    return layout
+
+def upsert_table(conn: sqlite3.Connection, table: str, stage: str, layout: dict) -> None:
+    """Apply new/changed/removed rows from `stage` with INSERT ... ON CONFLICT DO UPDATE; caller commits."""
+    cols, coltypes, key_cols = layout["columns"], layout["coltypes"], layout["key_cols"]
+    cur = conn.cursor()
+    reloaded = 0
+
+    keylist = ", ".join(f'"{c}"' for c in key_cols)
+    if not layout["hashed"] and cur.execute(
+        f'SELECT 1 FROM {stage} GROUP BY {keylist} HAVING COUNT(*) > 1 LIMIT 1'
+    ).fetchone():
+        sys.exit(f"[ERROR] {table}: duplicate {'+'.join(key_cols)} keys; use --mode full")
+
+    if not table_exists(conn, table):
+        cur.execute(create_table_sql(table, cols, coltypes))
+    else:
+        # Schema drift: add columns that appeared in the workbook
+        existing = {r[1] for r in cur.execute(f'PRAGMA table_info("{table}")')}
+        for c in cols:
+            if c not in existing:
+                cur.execute(f'ALTER TABLE "{table}" ADD COLUMN "{c}" {coltypes[c]};')
+        if layout["hashed"] and ROW_HASH_COL not in existing:
+            # Loaded by --mode full, so its rows carry no hash to diff against; reload them
+            cur.execute(f'DELETE FROM "{table}";')
+            reloaded = cur.rowcount
+    kexpr = ", ".join(key_exprs(key_cols))
+    if not index_exists(conn, f"ux_{table}_key"):
+        # A --mode full load does not enforce the key; the unique index below would fail on duplicates
+        dup = cur.execute(
+            f'SELECT {keylist}, COUNT(*) FROM "{table}" GROUP BY {kexpr} HAVING COUNT(*) > 1 LIMIT 1'
+        ).fetchone()
+        if dup:
+            sys.exit(f"[ERROR] {table}: the DB already has {dup[-1]} rows with {'+'.join(key_cols)} = "
+                     f"{', '.join(map(str, dup[:-1]))}; an upsert needs unique keys, use --mode full")
+    cur.execute(f'CREATE UNIQUE INDEX IF NOT EXISTS "ux_{table}_key" ON "{table}" ({kexpr});')
+
+    collist = ",".join(f'"{c}"' for c in cols)
+    match = " AND ".join(f"COALESCE(s.\"{c}\", '') = COALESCE(t.\"{c}\", '')" for c in key_cols)
+    new = cur.execute(
+        f'SELECT COUNT(*) FROM {stage} s WHERE NOT EXISTS (SELECT 1 FROM "{table}" t WHERE {match})'
+    ).fetchone()[0]
+
+    # Upsert; rows whose values are unchanged are left alone
+    value_cols = [c for c in cols if c not in key_cols]
+    before = conn.total_changes
+    if value_cols:
+        sets = ", ".join(f'"{c}" = excluded."{c}"' for c in value_cols)
+        old_vals = ", ".join(f'"{table}"."{c}"' for c in value_cols)
+        new_vals = ", ".join(f'excluded."{c}"' for c in value_cols)
+        upsert = (f'INSERT INTO "{table}" ({collist}) SELECT {collist} FROM {stage} WHERE true '
+                  f'ON CONFLICT ({kexpr}) DO UPDATE SET {sets} WHERE ({old_vals}) IS NOT ({new_vals});')
+    else:
+        upsert = (f'INSERT INTO "{table}" ({collist}) SELECT {collist} FROM {stage} WHERE true '
+                  f'ON CONFLICT ({kexpr}) DO NOTHING;')
+    cur.execute(upsert)
+    changed = conn.total_changes - before - new
+
+    cur.execute(f'DELETE FROM "{table}" AS t WHERE NOT EXISTS (SELECT 1 FROM {stage} s WHERE {match});')
+    removed = cur.rowcount + reloaded
+    add_keys_and_indexes(conn, table, cols)
+
+    print(f"[OK] {table}: {new} new, {changed} changed, {removed} removed ({layout['rows']} rows in source)")
+
+def stage_and_upsert(conn: sqlite3.Connection, table: str, batches: Iterable[pd.DataFrame]) -> dict | None:
+    layout = stage_rows(conn, 'temp."_stage"', table, batches)
+    if layout:
+        upsert_table(conn, table, 'temp."_stage"', layout)
+        conn.execute('DROP TABLE temp."_stage";')
+    return layout
+
+# -------- Parallel sheet preparation --------
+
+WORKER_STAGE = '"_stage"'
+
+def prepare_sheet(excel_path: str, table: str, sheet: str, batch_size: int, mode: str, out_path: str):
+    """Worker: parse, type and write one sheet to its own SQLite file.
+
+    full: the finished table (see write_table); incremental: a stage (see stage_rows).
+    Returns (table, row count or stage layout, seconds).
+    """
+    start = time.perf_counter()
+    conn = sqlite3.connect(out_path)
+    try:
+        conn.execute("PRAGMA synchronous = OFF;")
+        batches = sheet_batches(excel_path, sheet, batch_size)
+        if mode == "full":
+            result = write_table(conn, table, batches)
+        else:
+            result = stage_rows(conn, WORKER_STAGE, table, batches)
+            conn.commit()
+    finally:
+        conn.close()
+    return table, result, time.perf_counter() - start
+
+def prepare_in_pool(excel_path: str, sheets: Dict[str, str], batch_size: int, mode: str,
+                    workers: int, tmpdir: str) -> Iterator[Tuple[str, object, str, float]]:
+    """Run prepare_sheet for every sheet in a process pool; yields (table, result, worker_db, seconds).
+
+    Results come back in sheet order so the output file doesn't depend on scheduling.
+    """
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = {}
+        for table, sheet in sheets.items():
+            out_path = os.path.join(tmpdir, f"{table}.db")
+            futures[pool.submit(prepare_sheet, excel_path, table, sheet, batch_size, mode, out_path)] = out_path
+        for fut, out_path in futures.items():
+            table, result, seconds = fut.result()
+            yield table, result, out_path, seconds
+
+def copy_table(conn: sqlite3.Connection, src_path: str, table: str) -> None:
+    """Copy a table and its indexes out of a worker's database file."""
+    conn.execute("ATTACH DATABASE ? AS w;", (src_path,))
+    try:
+        ddl = [r[0] for r in conn.execute(
+            "SELECT sql FROM w.sqlite_master WHERE tbl_name = ? AND sql IS NOT NULL ORDER BY type = 'index'",
+            (table,))]
+        conn.execute(f'DROP TABLE IF EXISTS main."{table}";')
+        conn.execute(ddl[0])
+        conn.execute(f'INSERT INTO main."{table}" SELECT * FROM w."{table}";')
+        for sql in ddl[1:]:
+            conn.execute(sql)
+        conn.commit()
+    finally:
+        conn.execute("DETACH DATABASE w;")
+
+# -------- Index advisor --------
+
+def is_full_scan(detail: str) -> bool:
+    # "SCAN t" ("SCAN TABLE t" before SQLite 3.36); index scans read "... USING [COVERING] INDEX ..."
+    return detail.startswith("SCAN ") and "INDEX" not in detail and detail != "SCAN CONSTANT ROW"
+
+def advise(db_path: str) -> int:
+    """Print how SQLite runs each report query on db_path; returns the number of full table scans."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA query_only = ON;")
+        if not table_exists(conn, SOURCE_TABLE):
+            sys.exit(f"[ERROR] {db_path} has no {SOURCE_TABLE} table")
+        scans = 0
+        for view, plan in report_plans(conn, SOURCE_TABLE).items():
+            full = [d for d in plan if is_full_scan(d)]
+            scans += len(full)
+            print(f"[{'SCAN' if full else 'OK'}] {view}")
+            for detail in plan:
+                print(f"    {detail}")
+    finally:
+        conn.close()
+    if scans:
+        print(f"[INFO] {scans} full table scan(s) left; a load with this ETL adds the report indexes")
+    else:
+        print("[INFO] Every report reads an index")
+    return scans
 
 # -------- Main --------
 
+def load_full(db_path: str, excel_path: str, sheets: Dict[str, str], batch_size: int, workers: int = 1) -> None:
+    """Create every table from scratch in a fresh database file."""
+    conn = sqlite3.connect(db_path)
+    try:
+        conn.execute("PRAGMA synchronous = OFF;")  # shadow file; a crash just discards it
+
+        loaded = set()
+        if workers > 1:
+            # Sheets are parsed and typed in parallel; this process is the only writer
+            with tempfile.TemporaryDirectory(prefix="etl_") as tmpdir:
+                for table, rows, src, seconds in prepare_in_pool(excel_path, sheets, batch_size, "full", workers, tmpdir):
+                    if not rows:
+                        print(f"[SKIP] {table} is empty")
+                        continue
+                    start = time.perf_counter()
+                    copy_table(conn, src, table)
+                    loaded.add(table)
+                    print(f"[TIME] {table}: prepared in {seconds:.2f}s, copied in {time.perf_counter() - start:.2f}s")
+        else:
+            for table, sheet in sheets.items():
+                start = time.perf_counter()
+                if write_table(conn, table, sheet_batches(excel_path, sheet, batch_size)):
+                    loaded.add(table)
+                    print(f"[TIME] {table}: {time.perf_counter() - start:.2f}s")
+                else:
+                    print(f"[SKIP] {table} is empty")
+
+        # Pre-compute every report so the API serves plain reads
+        if SOURCE_TABLE in loaded:
+            print(f"[INFO] Building report summary tables from {SOURCE_TABLE}")
+            materialize_reports(conn, SOURCE_TABLE)
+    finally:
+        conn.close()
+
+def in_transaction(conn: sqlite3.Connection, fn):
+    """Run fn() inside BEGIN IMMEDIATE ... COMMIT on an autocommit connection."""
+    conn.execute("BEGIN IMMEDIATE;")
+    try:
+        result = fn()
+        conn.execute("COMMIT;")
+        return result
+    except BaseException:
+        conn.execute("ROLLBACK;")
+        raise
+
+def load_incremental(db_path: str, excel_path: str, sheets: Dict[str, str], batch_size: int, workers: int = 1) -> None:
+    """Upsert every sheet, then rebuild the reports.
+
+    db_path is a private copy that main() only publishes once everything
+    succeeded, so each sheet commits on its own.
+    """
+    conn = sqlite3.connect(db_path, timeout=30, isolation_level=None)
+    try:
+        conn.execute("PRAGMA synchronous = OFF;")
+        loaded = set()
+        if workers > 1:
+            with tempfile.TemporaryDirectory(prefix="etl_") as tmpdir:
+                for table, layout, src, seconds in prepare_in_pool(excel_path, sheets, batch_size, "incremental", workers, tmpdir):
+                    if not layout:
+                        print(f"[SKIP] {table} is empty")
+                        continue
+                    start = time.perf_counter()
+                    conn.execute("ATTACH DATABASE ? AS w;", (src,))
+                    try:
+                        in_transaction(conn, lambda: upsert_table(conn, table, f"w.{WORKER_STAGE}", layout))
+                    finally:
+                        conn.execute("DETACH DATABASE w;")
+                    loaded.add(table)
+                    print(f"[TIME] {table}: prepared in {seconds:.2f}s, upserted in {time.perf_counter() - start:.2f}s")
+        else:
+            for table, sheet in sheets.items():
+                start = time.perf_counter()
+                batches = sheet_batches(excel_path, sheet, batch_size)
+                layout = in_transaction(conn, lambda: stage_and_upsert(conn, table, batches))
+                if not layout:
+                    print(f"[SKIP] {table} is empty")
+                    continue
+                loaded.add(table)
+                print(f"[TIME] {table}: {time.perf_counter() - start:.2f}s")
+
+        if SOURCE_TABLE in loaded:
+            print(f"[INFO] Rebuilding report summary tables from {SOURCE_TABLE}")
+            in_transaction(conn, lambda: materialize_reports(conn, SOURCE_TABLE, commit=False))
+    finally:
+        conn.close()
+
 def main():
     args = parse_args()
     excel_path = os.path.abspath(args.excel)
     db_path = os.path.abspath(args.db)
 
+    if args.advise:
+        advise(db_path)
+        return
+
     print(f"[INFO] Excel: {excel_path}")
     print(f"[INFO] DB out: {db_path}")
 
-    # Load excel (with lock retry)
+    # List sheets (with lock retry); rows are streamed per sheet during the load
     sheets = open_excel(excel_path, retries=args.retries, wait=args.wait)
     if not sheets:
         sys.exit("[ERROR] No sheets found.")
 
     # Prepare DB (ensure not locked by DB Browser)
     assert_db_not_locked(db_path)
-    if os.path.exists(db_path):
-        try:
-            os.remove(db_path)
-        except PermissionError as e:
-            sys.exit(f"[ERROR] Can't remove existing DB (locked?): {db_path}\n{e}")
+    incremental = args.mode == "incremental" and os.path.exists(db_path)
 
-    conn = sqlite3.connect(db_path)
+    # Build next to the live DB; the API keeps serving the old file until the swap
+    shadow = shadow_path(db_path)
     try:
-        # Slightly safer journaling for bulk load
-        conn.execute("PRAGMA journal_mode = WAL;")
-        conn.execute("PRAGMA synchronous = NORMAL;")
-
-        for table, df in sheets.items():
-            if df.empty:
-                print(f"[SKIP] {table} is empty")
-                continue
-            # Ensure columns are unique/safe (already done, but enforce again)
-            df.columns = ensure_unique([sanitize_name(c) for c in df.columns])
-            write_table(conn, table, df)
-    finally:
-        conn.close()
-
-    print(f"\nDone. Created SQLite DB: {db_path}")
+        if incremental:
+            copy_database(db_path, shadow)
+            load_incremental(shadow, excel_path, sheets, args.batch_size, args.workers)
+        else:
+            discard_shadow(shadow)
+            load_full(shadow, excel_path, sheets, args.batch_size, args.workers)
+        finalize_shadow(shadow)
+        publish(shadow, db_path)
+    except BaseException:
+        discard_shadow(shadow)
+        raise
+
+    if incremental:
+        print(f"\nDone. Updated SQLite DB: {db_path}")
+    else:
+        print(f"\nDone. Created SQLite DB: {db_path}")
     print("Open it fresh in DB Browser (don’t rely on an old tab).")
 
 if __name__ == "__main__":
@@ -0,0 +1,100 @@
+"""
+Streaming reader for .xlsx sheets.
+
+openpyxl's read-only mode parses the sheet XML incrementally. Rows are
+grouped into fixed-size batches and each batch goes through pandas'
+TextParser with the header row, i.e. the same header, NA and dtype handling
+pd.read_excel applies, so a batch equals the matching slice of read_excel's
+DataFrame. Memory is bounded by the batch size instead of the workbook.
+
+Unlike read_excel, the header is the first non-blank row and cells to the
+right of the last header cell are ignored (the sheet width is not known
+until the whole sheet has been read).
+"""
+
+import sqlite3
+from typing import IO, Iterator, List, Union
+
+import pandas as pd
+from pandas.io.parsers import TextParser
+
+DEFAULT_BATCH_ROWS = 50000
+
+Source = Union[str, IO[bytes]]
+
+
+def _load_workbook(source: Source):
+    try:
+        import openpyxl
+    except Exception as e:
+        raise RuntimeError('openpyxl not installed. pip install openpyxl') from e
+    return openpyxl.load_workbook(source, read_only=True, data_only=True, keep_links=False)
+
+
+def sheet_names(source: Source) -> List[str]:
+    wb = _load_workbook(source)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def _cell_value(cell):
+    # Same conversion as pandas' openpyxl reader: blanks -> "", errors -> NaN, whole floats -> int
+    if cell.value is None:
+        return ''
+    if cell.data_type == 'e':
+        return float('nan')
+    if cell.data_type == 'n':
+        value = int(cell.value)
+        return value if value == cell.value else float(cell.value)
+    return cell.value
+
+
+def _parse(header: list, rows: List[list]) -> pd.DataFrame:
+    width = len(header)
+    rows = [r[:width] + [''] * (width - len(r)) for r in rows]
+    return TextParser([header] + rows, header=0).read()
+
+
+def iter_sheet_batches(source: Source, sheet: Union[int, str] = 0,
+                       batch_size: int = DEFAULT_BATCH_ROWS) -> Iterator[pd.DataFrame]:
+    """Yield a sheet as DataFrames of at most batch_size rows (one empty frame if it has only a header)."""
+    wb = _load_workbook(source)
+    try:
+        ws = wb.worksheets[sheet] if isinstance(sheet, int) else wb[sheet]
+        header = None
+        batch: List[list] = []
+        blank = 0
+        emitted = False
+        for row in ws.iter_rows():
+            values = [_cell_value(c) for c in row]
+            while values and values[-1] == '':
+                values.pop()
+            if header is None:
+                header = values or None
+                continue
+            if not values:
+                # Blank rows inside the data are kept, trailing ones dropped
+                blank += 1
+                continue
+            batch.extend([[]] * blank)
+            blank = 0
+            batch.append(values)
+            if len(batch) >= batch_size:
+                yield _parse(header, batch)
+                batch, emitted = [], True
+        if header is not None and (batch or not emitted):
+            yield _parse(header, batch)
+    finally:
+        wb.close()
+
+
+def stage_sheet(conn: sqlite3.Connection, source: Source, table: str, sheet: Union[int, str] = 0,
+                batch_size: int = DEFAULT_BATCH_ROWS) -> int:
+    """Load a sheet into a SQLite table batch by batch (created from the first batch, like to_sql)."""
+    rows = 0
+    for i, df in enumerate(iter_sheet_batches(source, sheet, batch_size)):
+        df.to_sql(table, conn, index=False, if_exists='replace' if i == 0 else 'append')
+        rows += len(df)
+    return rows
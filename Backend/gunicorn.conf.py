@@ -0,0 +1,32 @@
+"""
+Gunicorn serving profile: gunicorn -c gunicorn.conf.py wsgi:app
+
+Workers are separate processes (report serialization is CPU-bound Python,
+so throughput scales with processes, not threads); each runs a few threads
+for requests waiting on SQLite or the network. Every worker warms its own
+caches before it accepts requests, then starts its refresh scheduler
+(scheduler.py), which re-warms them whenever the data changes.
+
+When WSGI_PIDFILE is set, loaders that publish a new dummy_data.db (see
+db_swap.publish) send the master SIGHUP: it starts fresh, pre-warmed
+workers and lets the old ones finish their in-flight requests.
+"""
+
+import os
+
+bind = os.getenv('WSGI_BIND', '0.0.0.0:5001')
+workers = int(os.getenv('WEB_CONCURRENCY', str((os.cpu_count() or 1) * 2 + 1)))
+threads = int(os.getenv('WSGI_THREADS', '4'))
+worker_class = 'gthread'
+timeout = int(os.getenv('WSGI_TIMEOUT', '60'))
+graceful_timeout = int(os.getenv('WSGI_GRACEFUL_TIMEOUT', '30'))
+keepalive = 5
+pidfile = os.getenv('WSGI_PIDFILE') or None
+accesslog = os.getenv('WSGI_ACCESS_LOG') or None
+
+
+def post_worker_init(worker):
+    # Runs in the new worker before it starts accepting connections
+    from app import start_scheduler, warmup
+    worker.log.info('Worker %s warmed %d reports', worker.pid, warmup())
+    start_scheduler()
@@ -0,0 +1,59 @@
+"""
+JSON encoding of SQLite result rows without building a DataFrame.
+
+Record responses (/api/data, the v_* reports, the ndjson/json-stream
+exports) are arrays of objects, one per row, keyed by column name. Going
+through pandas (read_sql_query, fillna, to_dict, jsonify) copies every row
+several times; here each row tuple from the cursor becomes one dict that
+goes straight to the encoder.
+
+- orjson is used when installed (optional; pip install orjson), else the
+  json module. Both emit compact UTF-8 JSON.
+- Values are encoded as SQLite returns them: null replacement belongs in
+  the query (COALESCE, see build_data_query(fill_nulls=True)).
+- Keys follow the query's column order. Row values past the last column
+  name are dropped, so keyset helper columns selected after the projection
+  (see data_query.py) never reach the body.
+"""
+
+import json
+from functools import lru_cache
+from typing import Iterable, List, Sequence
+
+
+@lru_cache(maxsize=None)
+def _orjson():
+    # The orjson module, or None when it is not installed
+    try:
+        import orjson
+    except ImportError:
+        return None
+    return orjson
+
+
+def _default(value):
+    # BLOB values; SQLite returns every other type as a JSON-native Python value
+    if isinstance(value, (bytes, bytearray, memoryview)):
+        return bytes(value).decode('utf-8', 'replace')
+    raise TypeError(f'Type is not JSON serializable: {type(value).__name__}')
+
+
+def dumps(obj) -> bytes:
+    fast = _orjson()
+    if fast is not None:
+        return fast.dumps(obj, default=_default)
+    return json.dumps(obj, separators=(',', ':'), ensure_ascii=False, default=_default).encode('utf-8')
+
+
+def records(columns: Sequence[str], rows: Iterable[tuple]) -> List[dict]:
+    return [dict(zip(columns, row)) for row in rows]
+
+
+def encode_rows(columns: Sequence[str], rows: Iterable[tuple]) -> bytes:
+    """A JSON array with one object per row."""
+    return dumps(records(columns, rows))
+
+
+def encode_lines(columns: Sequence[str], rows: Iterable[tuple]) -> bytes:
+    """One JSON object per row, each followed by a newline (ndjson)."""
+    return b''.join(dumps(r) + b'\n' for r in records(columns, rows))
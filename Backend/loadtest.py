@@ -0,0 +1,188 @@
+"""
+Load-test harness for the report endpoints.
+
+    python loadtest.py --url http://127.0.0.1:5001     # a server that is already running
+    python loadtest.py --workers 1,2,4                 # spawn gunicorn (gunicorn.conf.py) per worker count
+
+Each client is its own process with one keep-alive connection, cycling
+through the endpoints, so the client side is not capped by a single GIL.
+Reports requests/s and latency percentiles per run and, with --workers, the
+speedup over the first worker count. Use at least as many clients as
+workers x threads, and run the clients on a machine with spare cores.
+
+--no-cache starts the servers with REPORT_CACHE_SIZE=0, so every request
+rebuilds its report instead of serving the cached bytes.
+"""
+
+import argparse
+import http.client
+import importlib.util
+import json
+import os
+import socket
+import subprocess
+import sys
+import time
+from multiprocessing import Pool
+from typing import Dict, List, Optional
+from urllib.parse import urlsplit
+
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+
+REPORT_ENDPOINTS = [
+    '/api/application-status',
+    '/api/deferred-offers',
+    '/api/agent-performance',
+    '/api/student-classification',
+    '/api/current-vs-enrolled',
+    '/api/enrolled-vs-offer',
+    '/api/visa-breakdown',
+    '/api/offer-expiry-surge',
+]
+
+
+def _connect(url: str) -> http.client.HTTPConnection:
+    parts = urlsplit(url)
+    return http.client.HTTPConnection(parts.hostname, parts.port or 80, timeout=30)
+
+
+def _client(job) -> tuple:
+    # One client process: (latencies of successful requests, error count)
+    url, paths, offset, duration, headers = job
+    conn = _connect(url)
+    latencies, errors = [], 0
+    i = offset
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        path = paths[i % len(paths)]
+        i += 1
+        start = time.perf_counter()
+        try:
+            conn.request('GET', path, headers=headers)
+            resp = conn.getresponse()
+            resp.read()
+            ok = resp.status == 200
+        except (OSError, http.client.HTTPException):
+            ok = False
+            conn.close()
+            conn = _connect(url)
+        if ok:
+            latencies.append(time.perf_counter() - start)
+        else:
+            errors += 1
+    conn.close()
+    return latencies, errors
+
+
+def _percentile(sorted_values: List[float], p: float) -> float:
+    if not sorted_values:
+        return float('nan')
+    return sorted_values[min(len(sorted_values) - 1, int(p / 100 * len(sorted_values)))]
+
+
+def run_load(url: str, paths: List[str], clients: int, duration: float,
+             headers: Optional[Dict[str, str]] = None) -> dict:
+    """Drive url with `clients` concurrent keep-alive clients for `duration` seconds."""
+    jobs = [(url, paths, i, duration, headers or {}) for i in range(clients)]
+    with Pool(clients) as pool:
+        results = pool.map(_client, jobs)
+    latencies = sorted(l for ls, _ in results for l in ls)
+    return {
+        'requests': len(latencies),
+        'errors': sum(e for _, e in results),
+        'rps': len(latencies) / duration,
+        'p50_ms': _percentile(latencies, 50) * 1000,
+        'p95_ms': _percentile(latencies, 95) * 1000,
+        'p99_ms': _percentile(latencies, 99) * 1000,
+    }
+
+
+def _free_port() -> int:
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def start_server(workers: int, threads: int, port: int, no_cache: bool = False) -> subprocess.Popen:
+    """Start gunicorn with gunicorn.conf.py on 127.0.0.1:port."""
+    if importlib.util.find_spec('gunicorn') is None:
+        raise RuntimeError('gunicorn not installed. pip install gunicorn')
+    env = dict(os.environ, WEB_CONCURRENCY=str(workers), WSGI_THREADS=str(threads),
+               WSGI_BIND=f'127.0.0.1:{port}')
+    env.pop('WSGI_PIDFILE', None)  # don't let a test server receive the ETL's reload signal
+    if no_cache:
+        env['REPORT_CACHE_SIZE'] = '0'
+    return subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                            cwd=BASE_DIR, env=env)
+
+
+def wait_ready(url: str, path: str, proc: subprocess.Popen, timeout: float = 60) -> None:
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f'server exited with status {proc.returncode}')
+        try:
+            conn = _connect(url)
+            conn.request('GET', path)
+            if conn.getresponse().status == 200:
+                return
+        except OSError:
+            pass
+        time.sleep(0.2)
+    raise RuntimeError(f'server not ready after {timeout:.0f}s')
+
+
+def _print_result(label: str, r: dict, base_rps: Optional[float] = None) -> None:
+    speedup = f'  x{r["rps"] / base_rps:.2f}' if base_rps else ''
+    print(f'{label:<14} {r["rps"]:9.1f} req/s  p50 {r["p50_ms"]:7.2f} ms  p95 {r["p95_ms"]:7.2f} ms  '
+          f'p99 {r["p99_ms"]:7.2f} ms  errors {r["errors"]}{speedup}')
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description='Load-test the report endpoints.')
+    parser.add_argument('--url', help='Base URL of a running server (default: spawn gunicorn per --workers)')
+    parser.add_argument('--workers', default='1,2,4', help='Comma-separated gunicorn worker counts to compare')
+    parser.add_argument('--threads', type=int, default=4, help='Threads per gunicorn worker')
+    parser.add_argument('--clients', type=int, default=16, help='Concurrent client processes')
+    parser.add_argument('--duration', type=float, default=10, help='Seconds of load per run')
+    parser.add_argument('--warmup', type=float, default=2, help='Seconds of untimed load before each run')
+    parser.add_argument('--encoding', default='gzip', help='Accept-Encoding to send (identity to disable)')
+    parser.add_argument('--endpoints', help='Comma-separated paths (default: the report endpoints)')
+    parser.add_argument('--no-cache', action='store_true', help='Spawned servers run with REPORT_CACHE_SIZE=0')
+    parser.add_argument('--json', help='Also write the results to this file')
+    args = parser.parse_args()
+
+    paths = args.endpoints.split(',') if args.endpoints else REPORT_ENDPOINTS
+    headers = {'Accept-Encoding': args.encoding}
+    results = []
+    if args.url:
+        if args.warmup:
+            run_load(args.url, paths, args.clients, args.warmup, headers)
+        r = run_load(args.url, paths, args.clients, args.duration, headers)
+        _print_result(args.url, r)
+        results.append(dict(r, url=args.url))
+    else:
+        base_rps = None
+        for workers in [int(w) for w in args.workers.split(',')]:
+            port = _free_port()
+            url = f'http://127.0.0.1:{port}'
+            proc = start_server(workers, args.threads, port, args.no_cache)
+            try:
+                wait_ready(url, paths[0], proc)
+                if args.warmup:
+                    run_load(url, paths, args.clients, args.warmup, headers)
+                r = run_load(url, paths, args.clients, args.duration, headers)
+            finally:
+                proc.terminate()
+                proc.wait(timeout=30)
+            base_rps = base_rps or r['rps']
+            _print_result(f'{workers} worker(s)', r, base_rps)
+            results.append(dict(r, workers=workers, threads=args.threads))
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'endpoints': paths, 'clients': args.clients, 'duration': args.duration,
+                       'no_cache': args.no_cache, 'runs': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,273 @@
+"""
+Request, phase and SQLite statement instrumentation for the API.
+
+- begin_request() / end_request() bracket a request on the current thread,
+  and phase(name) times a block of it (connect, frame, serialize,
+  compress, ...). Phases are exclusive: SQLite time spent inside a phase is
+  booked to 'sql', not to the phase. bind() attributes work done on a
+  helper thread (the dashboard executor) to the request that submitted it.
+- instrument_connection() hooks a sqlite3 connection. set_trace_callback
+  marks each statement's start, and a progress handler (every
+  PROGRESS_OPS VM instructions) marks its latest activity. A statement is
+  therefore timed from its start to the last instruction batch seen before
+  the next statement, or the end of the phase or request. Statements shorter
+  than one batch count as 0.
+- Counter / Histogram are minimal thread-safe Prometheus metric types;
+  REGISTRY.render() produces the text exposition format for /metrics, and
+  server_timing() the Server-Timing header of a request.
+"""
+
+import re
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Callable, Dict, Iterator, List, Optional, Sequence, Tuple
+
+# SQLite VM instructions between progress-handler calls (timing granularity vs overhead)
+PROGRESS_OPS = 1000
+
+DURATION_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+def _escape(value: str) -> str:
+    return str(value).replace('\\', '\\\\').replace('\n', '\\n').replace('"', '\\"')
+
+
+def _format_labels(labels: Labels) -> str:
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{k}="{_escape(v)}"' for k, v in labels) + '}'
+
+
+def _format_value(value: float) -> str:
+    if value == float('inf'):
+        return '+Inf'
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+class Counter:
+    kind = 'counter'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Labels, float] = defaultdict(float)
+        self._lock = threading.Lock()
+
+    def inc(self, amount: float = 1, **labels) -> None:
+        key = tuple((k, str(labels[k])) for k in self.labelnames)
+        with self._lock:
+            self._values[key] += amount
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        with self._lock:
+            return [(self.name, key, value) for key, value in sorted(self._values.items())]
+
+
+class Histogram:
+    kind = 'histogram'
+
+    def __init__(self, name: str, help: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DURATION_BUCKETS):
+        self.name = name
+        self.help = help
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(buckets) + (float('inf'),)
+        self._values: Dict[Labels, list] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, **labels) -> None:
+        key = tuple((k, str(labels[k])) for k in self.labelnames)
+        with self._lock:
+            counts = self._values.get(key)
+            if counts is None:
+                counts = self._values[key] = [0] * len(self.buckets) + [0.0]  # bucket counts..., sum
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    counts[i] += 1
+            counts[-1] += value
+
+    def samples(self) -> List[Tuple[str, Labels, float]]:
+        out = []
+        with self._lock:
+            for key, counts in sorted(self._values.items()):
+                for bound, count in zip(self.buckets, counts):
+                    out.append((f'{self.name}_bucket', key + (('le', _format_value(bound)),), count))
+                out.append((f'{self.name}_sum', key, counts[-1]))
+                out.append((f'{self.name}_count', key, counts[len(self.buckets) - 1]))
+        return out
+
+
+# A collector returns (name, type, help, [(labels dict, value), ...]) for values read at scrape time
+Collector = Callable[[], List[Tuple[str, str, str, List[Tuple[dict, float]]]]]
+
+
+class Registry:
+    def __init__(self):
+        self.metrics: list = []
+        self.collectors: List[Collector] = []
+
+    def counter(self, name: str, help: str, labelnames: Sequence[str] = ()) -> Counter:
+        metric = Counter(name, help, labelnames)
+        self.metrics.append(metric)
+        return metric
+
+    def histogram(self, name: str, help: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DURATION_BUCKETS) -> Histogram:
+        metric = Histogram(name, help, labelnames, buckets)
+        self.metrics.append(metric)
+        return metric
+
+    def add_collector(self, collector: Collector) -> None:
+        self.collectors.append(collector)
+
+    def render(self) -> str:
+        lines = []
+        for metric in self.metrics:
+            lines.append(f'# HELP {metric.name} {metric.help}')
+            lines.append(f'# TYPE {metric.name} {metric.kind}')
+            lines += [f'{name}{_format_labels(labels)} {_format_value(value)}' for name, labels, value in metric.samples()]
+        for collector in self.collectors:
+            for name, kind, help, samples in collector():
+                lines.append(f'# HELP {name} {help}')
+                lines.append(f'# TYPE {name} {kind}')
+                lines += [f'{name}{_format_labels(tuple(sorted(labels.items())))} {_format_value(value)}'
+                          for labels, value in samples if value is not None]
+        return '\n'.join(lines) + '\n'
+
+
+REGISTRY = Registry()
+REQUESTS = REGISTRY.counter('http_requests_total', 'Requests by endpoint, method and status.',
+                            ('endpoint', 'method', 'status'))
+REQUEST_SECONDS = REGISTRY.histogram('http_request_duration_seconds',
+                                     'Time to produce a response (streamed bodies: until the first byte).',
+                                     ('endpoint',))
+PHASE_SECONDS = REGISTRY.histogram('http_request_phase_seconds',
+                                   'Exclusive time per request phase (connect, sql, frame, serialize, compress, ...).',
+                                   ('endpoint', 'phase'))
+RESPONSE_BYTES = REGISTRY.counter('http_response_bytes_total', 'Response body bytes sent, after compression.',
+                                  ('endpoint',))
+STATEMENTS = REGISTRY.counter('sqlite_statements_total', 'SQLite statements executed, by leading keyword.', ('kind',))
+STATEMENT_SECONDS = REGISTRY.histogram('sqlite_statement_seconds',
+                                       'Approximate SQLite execution time per statement (see metrics.py).', ('kind',))
+
+
+class RequestTimings:
+    """Phase durations of one request; helper threads may add to it concurrently."""
+
+    def __init__(self):
+        self.start = time.perf_counter()
+        self.phases: Dict[str, float] = defaultdict(float)
+        self.statements = 0
+        self._lock = threading.Lock()
+
+    def add(self, phase: str, seconds: float) -> None:
+        with self._lock:
+            self.phases[phase] += seconds
+
+
+_local = threading.local()
+
+
+def current() -> Optional[RequestTimings]:
+    return getattr(_local, 'timings', None)
+
+
+def begin_request() -> RequestTimings:
+    _finish_statement()
+    _local.timings = RequestTimings()
+    return _local.timings
+
+
+def end_request() -> Optional[RequestTimings]:
+    """Close the open statement and detach the current request's timings from this thread."""
+    _finish_statement()
+    timings, _local.timings = current(), None
+    return timings
+
+
+@contextmanager
+def bind(timings: Optional[RequestTimings]) -> Iterator[None]:
+    """Book the SQLite and phase time of this (helper) thread to another request's timings."""
+    previous = current()
+    _local.timings = timings
+    try:
+        yield
+    finally:
+        _finish_statement()
+        _local.timings = previous
+
+
+@contextmanager
+def phase(name: str) -> Iterator[None]:
+    """Time a block as `name`, excluding the SQLite time spent in it (booked as 'sql')."""
+    timings = current()
+    if timings is None:
+        yield
+        return
+    start = time.perf_counter()
+    sql_before = getattr(_local, 'sql_seconds', 0.0)
+    try:
+        yield
+    finally:
+        _finish_statement()
+        sql = getattr(_local, 'sql_seconds', 0.0) - sql_before
+        timings.add(name, max(0.0, time.perf_counter() - start - sql))
+
+
+_KIND = re.compile(r'\s*(?:--[^\n]*\n\s*)*(\w+)')
+
+
+def _finish_statement() -> None:
+    stmt = getattr(_local, 'statement', None)
+    if stmt is None:
+        return
+    _local.statement = None
+    kind, start, last, timings = stmt
+    seconds = last - start
+    STATEMENTS.inc(kind=kind)
+    STATEMENT_SECONDS.observe(seconds, kind=kind)
+    _local.sql_seconds = getattr(_local, 'sql_seconds', 0.0) + seconds
+    if timings is not None:
+        timings.add('sql', seconds)
+        timings.statements += 1
+
+
+def _on_statement(sql: str) -> None:
+    _finish_statement()
+    m = _KIND.match(sql or '')
+    now = time.perf_counter()
+    _local.statement = [(m.group(1).upper() if m else 'OTHER'), now, now, current()]
+
+
+def _on_progress() -> int:
+    stmt = getattr(_local, 'statement', None)
+    if stmt is not None:
+        stmt[2] = time.perf_counter()
+    return 0
+
+
+def instrument_connection(conn) -> None:
+    """Time every statement run on conn (see module docstring)."""
+    conn.set_trace_callback(_on_statement)
+    conn.set_progress_handler(_on_progress, PROGRESS_OPS)
+
+
+def server_timing(timings: RequestTimings, total: float) -> str:
+    """Server-Timing header value (milliseconds) for a request's phases plus its total."""
+    parts = [f'{name};dur={seconds * 1000:.2f}' for name, seconds in timings.phases.items()]
+    parts.append(f'total;dur={total * 1000:.2f}')
+    if timings.statements:
+        parts.append(f'sql-statements;desc="{timings.statements}"')
+    return ', '.join(parts)
+
+
+def count_bytes(chunks, endpoint: str):
+    """Pass a streamed body through, adding its size to http_response_bytes_total as it goes."""
+    for chunk in chunks:
+        RESPONSE_BYTES.inc(len(chunk), endpoint=endpoint)
+        yield chunk
@@ -0,0 +1,432 @@
+"""
+Report definitions shared by the ETL and the API.
+
+Each v_* report is derived from the fact table (reportdata). The ETL calls
+materialize_reports() after loading so every report is stored as a physical
+summary table with an index on its key column, and builds the /api/aggregate
+rollup (see rollup.py); the API then serves a plain read.
+compute_report() is the same derivation, used directly only when a database
+predates the summary tables.
+
+REPORT_INDEXES are the fact-table indexes those derivations read from;
+report_plans() shows how SQLite actually runs each one. add_date_keys()
+stores integer year/month/day keys for the date columns so the time-bucketed
+reports group on an index instead of parsing dates per row.
+"""
+
+import re
+import sqlite3
+from typing import Dict, List, Optional
+
+import pandas as pd
+
+from rollup import build_rollup, rollup_table
+from schema_catalog import CATALOG
+
+SOURCE_TABLE = 'reportdata'
+
+# report name -> key column (first column, indexed in the summary table)
+REPORT_VIEWS: Dict[str, str] = {
+    'v_application_status_totals': 'status',
+    'v_deferred_offers_overview': 'term',
+    'v_agent_performance': 'agent',
+    'v_student_classification': 'classification',
+    'v_current_vs_enrolled': 'term',
+    'v_enrolled_vs_offer': 'term',
+    'v_offer_expiry_surge_daily': 'expiry_day',
+    'v_offer_expiry_surge_monthly': 'expiry_month',
+    'v_visa_breakdown': 'visa_type',
+}
+
+# Report SQL that doesn't depend on fragile column names
+REPORT_QUERIES = {
+    'v_application_status_totals': """
+        SELECT COALESCE(status,'Unknown') AS status,
+               COUNT(*) AS total
+        FROM {src}
+        GROUP BY COALESCE(status,'Unknown')
+        ORDER BY total DESC
+    """,
+    'v_agent_performance': """
+        SELECT COALESCE(agentname,'Unknown') AS agent,
+               SUM(CASE WHEN status='New Application Request' THEN 1 ELSE 0 END) AS applications,
+               SUM(CASE WHEN status='Offered' THEN 1 ELSE 0 END) AS offers,
+               SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
+        FROM {src}
+        GROUP BY agent
+        ORDER BY enrolled DESC, offers DESC, applications DESC
+    """,
+    'v_student_classification': """
+        SELECT COALESCE(coursetype,'Unknown') AS classification,
+               COUNT(*) AS total
+        FROM {src}
+        GROUP BY COALESCE(coursetype,'Unknown')
+        ORDER BY total DESC
+    """,
+    'v_current_vs_enrolled': """
+        SELECT strftime('%Y', date(startdate)) AS term,
+               SUM(CASE WHEN status='Current Student' THEN 1 ELSE 0 END) AS current_students,
+               SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
+        FROM {src}
+        WHERE startdate IS NOT NULL AND trim(startdate) <> ''
+        GROUP BY term
+        ORDER BY term
+    """,
+    'v_enrolled_vs_offer': """
+        SELECT strftime('%Y', date(startdate)) AS term,
+               SUM(CASE WHEN status='Offered' THEN 1 ELSE 0 END) AS offers,
+               SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
+        FROM {src}
+        WHERE startdate IS NOT NULL AND trim(startdate) <> ''
+        GROUP BY term
+        ORDER BY term
+    """,
+    # v_visa_breakdown, v_offer_expiry_* and v_deferred_offers_overview are resolved dynamically
+}
+
+# The same reports over the precomputed startdate keys (see add_date_keys);
+# used whenever the fact table has them
+DATE_KEY_QUERIES = {
+    'v_current_vs_enrolled': """
+        SELECT printf('%04d', startdate_year) AS term,
+               SUM(CASE WHEN status='Current Student' THEN 1 ELSE 0 END) AS current_students,
+               SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
+        FROM {src}
+        WHERE startdate_year IS NOT NULL
+        GROUP BY startdate_year
+        ORDER BY startdate_year
+    """,
+    'v_enrolled_vs_offer': """
+        SELECT printf('%04d', startdate_year) AS term,
+               SUM(CASE WHEN status='Offered' THEN 1 ELSE 0 END) AS offers,
+               SUM(CASE WHEN status LIKE 'Enrolled%' THEN 1 ELSE 0 END) AS enrolled
+        FROM {src}
+        WHERE startdate_year IS NOT NULL
+        GROUP BY startdate_year
+        ORDER BY startdate_year
+    """,
+}
+
+# Date columns that get integer keys <col>_year (YYYY), <col>_month (YYYYMM)
+# and <col>_day (YYYYMMDD). They follow SQLite's date() parsing, i.e. ISO
+# text as written by the ETL and pandas; anything else keys to NULL.
+DATE_KEY_FIELDS = ('startdate', 'finishdate', '@offer_expiry', 'application_date')
+DATE_KEY_PARTS = {'year': '%Y', 'month': '%Y%m', 'day': '%Y%m%d'}
+
+# Fact-table indexes for the reports above. Names starting with '@' are logical
+# fields resolved through schema_catalog, like the dynamic reports do. Each
+# index holds every column its report reads, so the report scans the (much
+# narrower) index instead of the table.
+REPORT_INDEXES = [
+    ('status',),                        # v_application_status_totals
+    ('agentname', 'status'),            # v_agent_performance
+    ('startdate_year', 'status'),       # v_current_vs_enrolled, v_enrolled_vs_offer
+    ('coursetype',),                    # v_student_classification
+    ('@visa',),                         # v_visa_breakdown
+    ('@intake', '@year', '@status'),    # v_deferred_offers_overview
+]
+
+
+def _q(name: str) -> str:
+    # Quote identifiers with spaces/special chars for SQLite
+    return f"[{name}]"
+
+
+def _slug(name: str) -> str:
+    return re.sub(r'\W+', '_', name.lower()).strip('_')
+
+
+# -------- Report derivation --------
+# Physical column names come from schema_catalog.CATALOG (resolved once per schema version)
+
+def _visa_sql(conn, src) -> Optional[str]:
+    visa_col = CATALOG.field(conn, src, 'visa')
+    if not visa_col:
+        return None
+    qc = _q(visa_col)
+    return f"""
+        SELECT COALESCE({qc}, 'Unknown') AS visa_type,
+               COUNT(*) AS total
+        FROM {src}
+        GROUP BY COALESCE({qc}, 'Unknown')
+        ORDER BY total DESC
+    """
+
+
+def _visa_breakdown(conn, src):
+    sql = _visa_sql(conn, src)
+    if not sql:
+        return pd.DataFrame(columns=['visa_type', 'total'])
+    return pd.read_sql_query(sql, conn)
+
+
+def _offer_expiry_sql(conn, src, monthly: bool) -> Optional[str]:
+    exp_col = CATALOG.field(conn, src, 'offer_expiry')
+    if not exp_col:
+        return None
+    day = date_key_column(conn, src, exp_col, 'day')
+    if day:
+        # Integer YYYYMMDD keys: bucket arithmetically, in index order
+        qd = _q(day)
+        if monthly:
+            return f"""
+                SELECT printf('%04d-%02d', {qd} / 10000, {qd} / 100 % 100) AS expiry_month,
+                       COUNT(*) AS expiring_offers
+                FROM {src}
+                WHERE {qd} IS NOT NULL
+                GROUP BY {qd} / 100
+                ORDER BY {qd} / 100
+            """
+        return f"""
+            SELECT printf('%04d-%02d-%02d', {qd} / 10000, {qd} / 100 % 100, {qd} % 100) AS expiry_day,
+                   COUNT(*) AS expiring_offers
+            FROM {src}
+            WHERE {qd} IS NOT NULL
+            GROUP BY {qd}
+            ORDER BY {qd}
+        """
+    qc = _q(exp_col)
+    return f"SELECT {qc} AS raw_date FROM {src} WHERE {qc} IS NOT NULL AND trim({qc}) <> ''"
+
+
+def _offer_expiry_surge(conn, src, monthly: bool):
+    key = 'expiry_month' if monthly else 'expiry_day'
+    sql = _offer_expiry_sql(conn, src, monthly)
+    if not sql:
+        return pd.DataFrame(columns=[key, 'expiring_offers'])
+    raw = pd.read_sql_query(sql, conn)
+    if key in raw.columns:
+        return raw
+    # ISO text (as the ETL and pandas write dates) first: dayfirst would read
+    # 2024-03-01 as 3 January and drop days past the 12th. dayfirst is for the rest.
+    iso = pd.to_datetime(raw['raw_date'], errors='coerce', format='ISO8601')
+    rest = pd.to_datetime(raw['raw_date'].where(iso.isna()), errors='coerce', dayfirst=True)
+    raw['raw_date'] = iso.fillna(rest)
+    raw = raw.dropna(subset=['raw_date'])
+    raw[key] = raw['raw_date'].dt.strftime('%Y-%m' if monthly else '%Y-%m-%d')
+    return raw.groupby(key).size().reset_index(name='expiring_offers').sort_values(key)
+
+
+def _deferred_sql(conn, src) -> Optional[str]:
+    fields = CATALOG.fields(conn, src)
+    intake_col, year_col, term_col = fields['intake'], fields['year'], fields['term']
+    status_col, flag_col = fields['status'], fields['deferred_flag']
+
+    # Pull minimum necessary raw data
+    if intake_col and year_col:
+        sel = [f"{_q(intake_col)} AS intake", f"{_q(year_col)} AS year"]
+    elif term_col:
+        sel = [f"{_q(term_col)} AS term"]
+    else:
+        return None
+    if status_col:
+        sel.append(f"{_q(status_col)} AS status")
+    if flag_col:
+        sel.append(f"{_q(flag_col)} AS flag")
+    return f"SELECT {', '.join(sel)} FROM {src}"
+
+
+def _deferred_offers_overview(conn, src):
+    sql = _deferred_sql(conn, src)
+    if not sql:
+        # Nothing we can form a term from
+        return pd.DataFrame(columns=['term', 'deferred_count', 'total_offers'])
+
+    raw = pd.read_sql_query(sql, conn)
+
+    # Build term
+    if 'term' not in raw.columns:
+        raw['term'] = raw['intake'].astype(str).str.strip() + ' ' + raw['year'].astype(str).str.strip()
+    raw['term'] = raw['term'].astype(str).str.strip()
+
+    # Determine 'deferred'
+    if 'flag' in raw.columns:
+        s = raw['flag'].astype(str).str.strip().str.lower()
+        is_deferred = s.isin(['1', 'true', 't', 'y', 'yes'])
+    elif 'status' in raw.columns:
+        s = raw['status'].astype(str).str.strip().str.lower()
+        is_deferred = s.str.startswith('deferred')
+    else:
+        is_deferred = pd.Series(False, index=raw.index)
+
+    grp = (
+        pd.DataFrame({'term': raw['term'], 'is_def': is_deferred})
+          .groupby('term', dropna=False)['is_def']
+          .agg(deferred_count='sum', total_offers='size')
+          .reset_index()
+    )
+
+    # Add common aliases some front-ends expect
+    grp['deferred'] = grp['deferred_count'].astype(int)
+    grp['total'] = grp['total_offers'].astype(int)
+
+    # Drop 'Unknown' buckets
+    mask = grp['term'].astype(str).str.strip().str.lower().ne('unknown')
+    return grp[mask]
+
+
+def compute_report(conn: sqlite3.Connection, view_name: str, src: str = SOURCE_TABLE) -> pd.DataFrame:
+    """Derive a report from the fact table."""
+    if view_name == 'v_visa_breakdown':
+        df = _visa_breakdown(conn, src)
+    elif view_name in ('v_offer_expiry_surge_daily', 'v_offer_expiry_surge'):
+        df = _offer_expiry_surge(conn, src, monthly=False)
+    elif view_name == 'v_offer_expiry_surge_monthly':
+        df = _offer_expiry_surge(conn, src, monthly=True)
+    elif view_name == 'v_deferred_offers_overview':
+        df = _deferred_offers_overview(conn, src)
+    elif view_name in REPORT_QUERIES:
+        df = pd.read_sql_query(report_sql(conn, view_name, src), conn)
+    else:
+        raise KeyError(f'Unknown report: {view_name}')
+
+    # Fill numeric
+    for col in df.select_dtypes(include=['float', 'int']).columns:
+        df[col] = df[col].fillna(0)
+    return df
+
+
+def report_sql(conn: sqlite3.Connection, view_name: str, src: str = SOURCE_TABLE) -> Optional[str]:
+    """The SQL a report reads from the fact table (None if its columns are missing)."""
+    if view_name == 'v_visa_breakdown':
+        return _visa_sql(conn, src)
+    if view_name in ('v_offer_expiry_surge_daily', 'v_offer_expiry_surge'):
+        return _offer_expiry_sql(conn, src, monthly=False)
+    if view_name == 'v_offer_expiry_surge_monthly':
+        return _offer_expiry_sql(conn, src, monthly=True)
+    if view_name == 'v_deferred_offers_overview':
+        return _deferred_sql(conn, src)
+    if view_name in DATE_KEY_QUERIES and date_key_column(conn, src, 'startdate', 'year'):
+        return DATE_KEY_QUERIES[view_name].format(src=src)
+    if view_name in REPORT_QUERIES:
+        return REPORT_QUERIES[view_name].format(src=src)
+    raise KeyError(f'Unknown report: {view_name}')
+
+
+def report_plans(conn: sqlite3.Connection, src: str = SOURCE_TABLE) -> Dict[str, List[str]]:
+    """EXPLAIN QUERY PLAN detail lines for every report that can run against src."""
+    plans = {}
+    for view_name in REPORT_VIEWS:
+        sql = report_sql(conn, view_name, src)
+        if sql:
+            plans[view_name] = [row[3] for row in conn.execute(f'EXPLAIN QUERY PLAN {sql}')]
+    return plans
+
+
+# -------- Fact-table indexes --------
+
+def _index_columns(conn, src, spec) -> Optional[List[str]]:
+    by_lower = {c.lower(): c for c in CATALOG.columns(conn, src)}
+    fields = CATALOG.fields(conn, src)
+    cols = [fields.get(name[1:]) if name.startswith('@') else by_lower.get(name.lower()) for name in spec]
+    if not all(cols) or len(set(cols)) < len(cols):
+        return None
+    return cols
+
+
+def create_report_indexes(conn: sqlite3.Connection, src: str = SOURCE_TABLE) -> List[List[str]]:
+    """Create the REPORT_INDEXES whose columns exist in src; returns their column lists."""
+    made = []
+    for spec in REPORT_INDEXES:
+        cols = _index_columns(conn, src, spec)
+        if not cols:
+            continue
+        name = f"idx_{src}_" + '_'.join(_slug(c) for c in cols)
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "{name}" ON "{src}" ({", ".join(_q(c) for c in cols)})')
+        made.append(cols)
+    return made
+
+
+# -------- Date keys --------
+
+def date_key_column(conn: sqlite3.Connection, src: str, date_col: str, part: str) -> Optional[str]:
+    """Physical name of date_col's year/month/day key if src has it."""
+    key = f'{_slug(date_col)}_{part}'
+    return key if key in CATALOG.columns(conn, src) else None
+
+
+def add_date_keys(conn: sqlite3.Connection, src: str = SOURCE_TABLE) -> List[str]:
+    """Add or refresh the DATE_KEY_FIELDS keys of src (no commit); returns the date columns keyed."""
+    keyed, sets, stale = [], [], []
+    for spec in DATE_KEY_FIELDS:
+        cols = _index_columns(conn, src, (spec,))
+        if not cols:
+            continue
+        col, base = cols[0], _slug(cols[0])
+        existing = set(CATALOG.columns(conn, src))
+        for part, fmt in DATE_KEY_PARTS.items():
+            if f'{base}_{part}' not in existing:
+                conn.execute(f'ALTER TABLE "{src}" ADD COLUMN "{base}_{part}" INTEGER')
+            sets.append(f'"{base}_{part}" = CAST(strftime(\'{fmt}\', {_q(col)}) AS INTEGER)')
+        stale.append(f'"{base}_day" IS NOT CAST(strftime(\'%Y%m%d\', {_q(col)}) AS INTEGER)')
+        keyed.append(col)
+    if not keyed:
+        return keyed
+    # One pass over the table, rewriting only rows whose dates changed since the last run
+    conn.execute(f'UPDATE "{src}" SET {", ".join(sets)} WHERE {" OR ".join(stale)}')
+    for col in keyed:
+        conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{src}_{_slug(col)}_day" ON "{src}" ("{_slug(col)}_day")')
+    return keyed
+
+
+def _sqlite_type(dtype) -> str:
+    if pd.api.types.is_bool_dtype(dtype) or pd.api.types.is_integer_dtype(dtype):
+        return 'INTEGER'
+    if pd.api.types.is_float_dtype(dtype):
+        return 'REAL'
+    return 'TEXT'
+
+
+def write_summary_table(conn: sqlite3.Connection, name: str, df: pd.DataFrame) -> None:
+    """Replace a summary table without committing, so callers control the transaction."""
+    row = conn.execute("SELECT type FROM sqlite_master WHERE name = ?", (name,)).fetchone()
+    if row:
+        # A legacy database may still carry a SQL view under the same name
+        conn.execute(f'DROP {"VIEW" if row[0] == "view" else "TABLE"} "{name}"')
+    cols = ', '.join(f'"{c}" {_sqlite_type(df[c].dtype)}' for c in df.columns)
+    conn.execute(f'CREATE TABLE "{name}" ({cols})')
+    if len(df):
+        marks = ', '.join('?' * len(df.columns))
+        conn.executemany(f'INSERT INTO "{name}" VALUES ({marks})', frame_rows(df))
+
+
+def materialize_reports(conn: sqlite3.Connection, src: str = SOURCE_TABLE, commit: bool = True) -> None:
+    """(Re)build every v_* report as a physical summary table with an index on its key, plus the rollup."""
+    for view_name, key in REPORT_VIEWS.items():
+        df = compute_report(conn, view_name, src)
+        write_summary_table(conn, view_name, df)
+        if key in df.columns:
+            conn.execute(f'CREATE INDEX IF NOT EXISTS "idx_{view_name}_{key}" ON "{view_name}" ("{key}")')
+        print(f"  - Summary table {view_name}: {len(df)} rows")
+    rows, sets = build_rollup(conn, src)
+    print(f"  - Rollup table {rollup_table(src)}: {rows} rows over {sets} grouping sets")
+    if commit:
+        conn.commit()
+
+
+def summary_sql(conn: sqlite3.Connection, view_name: str) -> str:
+    """SELECT over a summary table in column order, numeric NULLs as 0 like compute_report()."""
+    sel = []
+    for _, name, decl, *_ in conn.execute(f'PRAGMA table_info("{view_name}")'):
+        decl = (decl or '').upper()
+        # SQLite's INTEGER/REAL affinity rules; hand-written views may not declare a type
+        if 'INT' in decl:
+            sel.append(f'COALESCE({_q(name)}, 0) AS {_q(name)}')
+        elif any(t in decl for t in ('REAL', 'FLOA', 'DOUB')):
+            sel.append(f'COALESCE({_q(name)}, 0.0) AS {_q(name)}')
+        else:
+            sel.append(_q(name))
+    return f'SELECT {", ".join(sel) or "*"} FROM "{view_name}"'
+
+
+def frame_rows(df: pd.DataFrame):
+    """Row tuples of Python values (None for missing), as write_summary_table() stores them."""
+    return df.astype(object).where(df.notna(), None).itertuples(index=False, name=None)
+
+
+def has_summary_table(conn: sqlite3.Connection, view_name: str) -> bool:
+    """True if the report exists as a summary table (or a hand-written SQL view)."""
+    row = conn.execute(
+        "SELECT 1 FROM sqlite_master WHERE type IN ('table', 'view') AND name = ?", (view_name,)
+    ).fetchone()
+    return row is not None
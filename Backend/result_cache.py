@@ -0,0 +1,66 @@
+"""
+Bounded LRU/TTL cache for serialized API responses.
+
+Entries are tagged with the data generation they were computed from (see
+db_generation); a lookup under a different generation is a miss, so a new
+ETL load invalidates everything without an explicit flush.
+"""
+
+import os
+import threading
+import time
+from collections import OrderedDict
+from typing import Hashable, Tuple
+
+
+def db_generation(path: str) -> Tuple:
+    """Fingerprint of a SQLite file (main db + WAL) that changes whenever the data is rewritten."""
+    parts = []
+    for p in (path, path + '-wal'):
+        try:
+            st = os.stat(p)
+            parts.append((st.st_ino, st.st_size, st.st_mtime_ns))
+        except FileNotFoundError:
+            parts.append(None)
+    return tuple(parts)
+
+
+class ResultCache:
+    """Thread-safe LRU cache with a per-entry time-to-live."""
+
+    def __init__(self, maxsize: int = 64, ttl: float = 300.0):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: 'OrderedDict[Hashable, tuple]' = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable, generation: Hashable):
+        now = time.monotonic()
+        with self._lock:
+            entry = self._data.get(key)
+            if entry is None or entry[0] != generation or (self.ttl and now - entry[1] > self.ttl):
+                if entry is not None:
+                    del self._data[key]
+                self.misses += 1
+                return None
+            self._data.move_to_end(key)
+            self.hits += 1
+            return entry[2]
+
+    def put(self, key: Hashable, generation: Hashable, value) -> None:
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data[key] = (generation, time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._data.clear()
+
+    def __len__(self) -> int:
+        return len(self._data)
@@ -0,0 +1,173 @@
+"""
+Pre-aggregated rollup of the fact table for /api/aggregate.
+
+build_rollup() stores, for every single dashboard dimension and every pair
+of them (GROUPING SETS, written as one GROUP BY per set since SQLite has no
+such clause), the row count plus TOTAL() and COUNT() of each numeric column
+in <src>_rollup. __grouping_id__ is the bitmask of the dimensions a row is
+grouped by; the other dimension columns are NULL. Dimension columns keep the
+fact table's names and types, so request filters compile to the same SQL.
+
+rollup_aggregate_query() answers an aggregate request from those rows when
+its x dimension and filter columns fall within one grouping set; anything
+else (derived dimensions, __count_yes__, wider filters) goes to the table.
+"""
+
+import re
+import sqlite3
+from itertools import combinations
+from typing import List, Optional, Tuple
+
+from data_query import (
+    DERIVED_DIMENSIONS, PRECOMPUTED_DIMENSIONS, ColumnResolver, aggregate_axes, aggregate_cap,
+    parse_filters, quote_ident, table_columns, where_clause,
+)
+from schema_catalog import CATALOG
+
+# Dimensions the dashboards slice by; '@' names are schema_catalog logical fields
+ROLLUP_DIMENSIONS = (
+    'status', 'campus_name', 'region', 'nationality', '@visa',
+    'coursetype', 'agentname', '@intake', '@year',
+)
+# Largest grouping set: x plus one filter column
+MAX_SET_SIZE = 2
+
+GROUPING_COL = '__grouping_id__'
+COUNT_COL = '__n__'
+SUM_PREFIX = '__sum__'
+CNT_PREFIX = '__cnt__'
+
+# Integer columns that are identifiers or date keys, not quantities. Only whole-word ids:
+# amount_paid or prepaid are measures
+NOT_MEASURES = re.compile(r'(^__|^(studentid|offerid|courseid)$|(^|_)id$|(^|_)(year|month|day)$)', re.IGNORECASE)
+
+
+def rollup_table(src: str) -> str:
+    return f'{src}_rollup'
+
+
+def _dimensions(conn: sqlite3.Connection, src: str) -> List[str]:
+    by_lower = {c.lower(): c for c in CATALOG.columns(conn, src)}
+    fields = CATALOG.fields(conn, src)
+    dims = []
+    for name in ROLLUP_DIMENSIONS:
+        col = fields.get(name[1:]) if name.startswith('@') else by_lower.get(name.lower())
+        if col and col not in dims:
+            dims.append(col)
+    return dims
+
+
+def _measures(info, dims: List[str]) -> List[str]:
+    numeric = ('INT', 'REAL', 'FLOA', 'DOUB')
+    return [name for _, name, ctype, *_ in info
+            if name not in dims and not NOT_MEASURES.search(name)
+            and any(t in (ctype or '').upper() for t in numeric)]
+
+
+def build_rollup(conn: sqlite3.Connection, src: str) -> Tuple[int, int]:
+    """(Re)build src's rollup table without committing; returns (rows, grouping sets)."""
+    info = conn.execute(f'PRAGMA table_info("{src}")').fetchall()
+    types = {row[1]: row[2] for row in info}
+    dims = _dimensions(conn, src)
+    measures = _measures(info, dims)
+    table = rollup_table(src)
+
+    cols = [f'"{GROUPING_COL}" INTEGER']
+    cols += [f'{quote_ident(d)} {types[d]}' for d in dims]
+    cols += [f'"{COUNT_COL}" INTEGER']
+    cols += [f'{quote_ident(SUM_PREFIX + m)} REAL, {quote_ident(CNT_PREFIX + m)} INTEGER' for m in measures]
+    conn.execute(f'DROP TABLE IF EXISTS {quote_ident(table)}')
+    conn.execute(f'CREATE TABLE {quote_ident(table)} ({", ".join(cols)})')
+    if not dims:
+        return 0, 0
+
+    # One scan of the fact table at the finest grain; every grouping set is
+    # then summed from those (far fewer) rows
+    dim_list = ', '.join(quote_ident(d) for d in dims)
+    aggs = [f'COUNT(*) AS "{COUNT_COL}"']
+    aggs += [f'TOTAL({quote_ident(m)}) AS {quote_ident(SUM_PREFIX + m)}, '
+             f'COUNT({quote_ident(m)}) AS {quote_ident(CNT_PREFIX + m)}' for m in measures]
+    conn.execute('DROP TABLE IF EXISTS temp."_rollup_base"')
+    conn.execute(f'CREATE TEMP TABLE "_rollup_base" AS SELECT {dim_list}, {", ".join(aggs)} '
+                 f'FROM {quote_ident(src)} GROUP BY {dim_list}')
+
+    sums = [f'SUM("{COUNT_COL}")']
+    sums += [f'TOTAL({quote_ident(SUM_PREFIX + m)}), SUM({quote_ident(CNT_PREFIX + m)})' for m in measures]
+    sets = [s for size in range(1, MAX_SET_SIZE + 1) for s in combinations(range(len(dims)), size)]
+    for grouping in sets:
+        mask = sum(1 << i for i in grouping)
+        select = [str(mask)] + [quote_ident(d) if i in grouping else 'NULL' for i, d in enumerate(dims)]
+        group_by = ', '.join(quote_ident(dims[i]) for i in grouping)
+        conn.execute(f'INSERT INTO {quote_ident(table)} SELECT {", ".join(select + sums)} '
+                     f'FROM temp."_rollup_base" GROUP BY {group_by}')
+    conn.execute('DROP TABLE temp."_rollup_base"')
+    conn.execute(f'CREATE INDEX {quote_ident(f"idx_{table}_grouping")} ON {quote_ident(table)} ("{GROUPING_COL}")')
+    rows = conn.execute(f'SELECT COUNT(*) FROM {quote_ident(table)}').fetchone()[0]
+    return rows, len(sets)
+
+
+def _layout(conn: sqlite3.Connection, table: str) -> Optional[Tuple[List[str], List[str]]]:
+    # (dimensions, measures) of table's rollup, or None if there is none
+    cols = CATALOG.columns(conn, rollup_table(table))
+    if GROUPING_COL not in cols or COUNT_COL not in cols:
+        return None
+    dims = cols[cols.index(GROUPING_COL) + 1:cols.index(COUNT_COL)]
+    measures = [c[len(SUM_PREFIX):] for c in cols if c.startswith(SUM_PREFIX)]
+    return dims, measures
+
+
+def _measure_sql(y: str, resolver: ColumnResolver, measures: List[str]) -> Optional[str]:
+    # data_query._measure_sql over pre-aggregated rows; None if the rollup can't answer it
+    if y == '__count__':
+        return f'SUM("{COUNT_COL}")'
+    if y == '__pct_of_total__':
+        return f'SUM("{COUNT_COL}") * 100.0 / SUM(SUM("{COUNT_COL}")) OVER ()'
+    m = re.fullmatch(r'__avg__(.+)__', y)
+    if y == '__avg_age__' or m:
+        col = resolver.resolve('age' if y == '__avg_age__' else m.group(1))
+        if col not in measures:
+            return None
+        total, count = quote_ident(SUM_PREFIX + col), quote_ident(CNT_PREFIX + col)
+        return f'TOTAL({total}) / NULLIF(SUM({count}), 0)'
+    if y.startswith('__'):
+        return None
+    col = resolver.resolve(y)
+    return f'TOTAL({quote_ident(SUM_PREFIX + col)})' if col in measures else None
+
+
+def rollup_aggregate_query(conn: sqlite3.Connection, table: str, args) -> Optional[Tuple[str, List[object], Optional[int]]]:
+    """
+    (sql, params, cap) like data_query.build_aggregate_query, read from the
+    table's rollup; None when the rollup doesn't cover the request.
+    """
+    layout = _layout(conn, table)
+    if layout is None:
+        return None
+    dims, measures = layout
+
+    x, y = aggregate_axes(args)
+    if not x or x in DERIVED_DIMENSIONS or x in PRECOMPUTED_DIMENSIONS:
+        return None
+    try:
+        resolver = ColumnResolver(table_columns(conn, table))
+        x_col = resolver.resolve(x)
+        filters = parse_filters(args, resolver)
+        value = _measure_sql(y, resolver, measures)
+    except ValueError:
+        return None  # the table query reports the error
+    grouped = {x_col} | {col for col, _, _ in filters}
+    if value is None or not grouped <= set(dims) or len(grouped) > MAX_SET_SIZE:
+        return None
+
+    preds, params = where_clause(filters)
+    preds.insert(0, f'"{GROUPING_COL}" = ?')
+    params.insert(0, sum(1 << dims.index(c) for c in grouped))
+    cap = aggregate_cap(args)
+    sql = (f"SELECT COALESCE({quote_ident(x_col)}, 'Unknown') AS label, "
+           f'{value} AS value, SUM("{COUNT_COL}") AS n '
+           f"FROM {quote_ident(rollup_table(table))} WHERE {' AND '.join(preds)} "
+           f"GROUP BY label ORDER BY label")
+    if cap is not None:
+        sql += ' LIMIT ?'
+        params.append(cap + 1)
+    return sql, params, cap
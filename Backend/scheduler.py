@@ -0,0 +1,165 @@
+"""
+Background refresh of the analytics database and the API caches.
+
+RefreshScheduler runs jobs on one daemon thread per process (each gunicorn
+worker keeps its own caches warm). A job is a callable that returns True
+when it changed something. Per job, the scheduler records how often it ran
+and changed data, when it last did, how long it took and the last error.
+app.py serves these stats at /api/debug/refresh.
+
+DatabaseWatcher notices dummy_data.db changing on disk. A new inode means
+a loader published a rebuilt file. The same inode with a new size/mtime
+means someone wrote to it in place (e.g. edited reportdata in DB Browser);
+rebuild_derived_tables() then recomputes the date keys, report indexes,
+summary tables and rollup through a shadow copy, like update_db.py does.
+"""
+
+import sqlite3
+import threading
+import time
+from typing import Callable, Dict, Optional
+
+from db_swap import copy_database, discard_shadow, finalize_shadow, publish, release_lock, shadow_path, try_lock
+from reports import SOURCE_TABLE, add_date_keys, create_report_indexes, materialize_reports
+from result_cache import db_generation
+
+
+class Job:
+    def __init__(self, name: str, fn: Callable[[], bool], interval: float):
+        self.name = name
+        self.fn = fn
+        self.interval = interval
+        self.next_run = 0.0
+        self.runs = 0
+        self.changes = 0
+        self.errors = 0
+        self.last_run: Optional[float] = None       # wall-clock time the last run started
+        self.last_change: Optional[float] = None    # ... and the last run that changed data
+        self.last_duration: Optional[float] = None
+        self.total_seconds = 0.0
+        self.last_error: Optional[str] = None
+
+    def stats(self) -> dict:
+        return {
+            'interval': self.interval, 'runs': self.runs, 'changes': self.changes, 'errors': self.errors,
+            'last_run': self.last_run, 'last_change': self.last_change,
+            'last_duration': self.last_duration, 'total_seconds': round(self.total_seconds, 3),
+            'last_error': self.last_error,
+        }
+
+
+class RefreshScheduler:
+    """Runs each job every `interval` seconds on a single daemon thread."""
+
+    def __init__(self):
+        self.jobs: Dict[str, Job] = {}
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    def add(self, name: str, fn: Callable[[], bool], interval: float) -> Job:
+        job = self.jobs[name] = Job(name, fn, interval)
+        return job
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        if self.running:
+            return
+        self._stop.clear()
+        self._thread = threading.Thread(target=self._loop, name='refresh-scheduler', daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 10) -> None:
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout)
+
+    def run_job(self, job: Job) -> None:
+        start = time.perf_counter()
+        job.last_run = time.time()
+        try:
+            if job.fn():
+                job.changes += 1
+                job.last_change = job.last_run
+            job.last_error = None
+        except Exception as e:
+            job.errors += 1
+            job.last_error = f'{type(e).__name__}: {e}'
+        job.runs += 1
+        job.last_duration = round(time.perf_counter() - start, 3)
+        job.total_seconds += job.last_duration
+        job.next_run = time.monotonic() + job.interval
+
+    def run_pending(self) -> float:
+        """Run the jobs that are due; returns the seconds until the next one is."""
+        for job in list(self.jobs.values()):
+            if time.monotonic() >= job.next_run:
+                self.run_job(job)
+        if not self.jobs:
+            return 1.0
+        return max(0.0, min(job.next_run for job in self.jobs.values()) - time.monotonic())
+
+    def _loop(self) -> None:
+        while not self._stop.is_set():
+            self._stop.wait(self.run_pending())
+
+    def stats(self) -> dict:
+        return {'running': self.running, 'jobs': {name: job.stats() for name, job in self.jobs.items()}}
+
+
+class DatabaseWatcher:
+    """Reports how a SQLite file changed since the last poll: 'replaced', 'modified' or None."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._seen = db_generation(path)
+
+    def poll(self) -> Optional[str]:
+        generation = db_generation(self.path)
+        previous, self._seen = self._seen, generation
+        if generation == previous or generation[0] is None:
+            return None
+        if previous[0] is None or previous[0][0] != generation[0][0]:
+            return 'replaced'
+        return 'modified'
+
+    def sync(self) -> None:
+        """Accept the file's current state as seen (after writing it ourselves)."""
+        self._seen = db_generation(self.path)
+
+
+def rebuild_derived_tables(db_path: str, src: str = SOURCE_TABLE) -> bool:
+    """
+    Recompute src's date keys, report indexes, summary tables and rollup from
+    its current rows, in a shadow copy that is then published. False if
+    another process is already rebuilding or the database has no src table.
+    """
+    lock = db_path + '.rebuild.lock'
+    if not try_lock(lock):
+        return False
+    try:
+        shadow = shadow_path(db_path)
+        try:
+            copy_database(db_path, shadow)
+            conn = sqlite3.connect(shadow)
+            try:
+                exists = conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = ?", (src,)).fetchone()
+                if exists:
+                    add_date_keys(conn, src)
+                    create_report_indexes(conn, src)
+                    materialize_reports(conn, src)
+            finally:
+                conn.close()
+            if not exists:
+                discard_shadow(shadow)
+                return False
+            finalize_shadow(shadow)
+            publish(shadow, db_path)
+        except BaseException:
+            discard_shadow(shadow)
+            raise
+    finally:
+        release_lock(lock)
+    return True
@@ -0,0 +1,145 @@
+"""
+Schema catalog: physical columns and logical-field resolution, cached per schema version.
+
+Reports refer to logical fields (visa, offer expiry, intake, ...) whose
+physical names differ between databases loaded by the ETL (snake_case) and
+by update_db.py (original Excel headers). Resolution runs once per
+(database file, table, PRAGMA schema_version) instead of on every request.
+
+Checking that version costs a PRAGMA and an os.stat, so inside a request
+(begin_request() / end_request(), hooked up by the app) each connection and
+table is checked once and later lookups reuse the result. Outside a request
+(ETL, scripts) every lookup checks again, since those add tables and columns
+on the connection they read from.
+"""
+
+import os
+import re
+import sqlite3
+import threading
+from typing import Dict, List, Optional, Tuple
+
+# logical field -> candidate physical names, most specific first.
+# Only the fields in SUBSTRING_FIELDS fall back to matching part of a column name.
+LOGICAL_FIELDS: Dict[str, List[str]] = {
+    'visa': ['visa_type', 'visa_status', 'Visa Type', 'Visa Status', 'visa', 'Visa'],
+    'offer_expiry': ['offer_expiry_date', 'Offer Expiry Date', 'expiry_date', 'Expiry Date', 'offer expiry'],
+    'intake': ['Previous Offer Intake', 'Offer Intake', 'Intake', 'Trimester', 'Semester'],
+    'year': ['Previous Offer Year', 'Offer Year', 'Year'],
+    'status': ['Status', 'Offer Status', 'application_status'],
+    'deferred_flag': ['Is the Offer Deferred', 'is_the_offer_deferred', 'Offer Deferred', 'Deferred'],
+    'term': ['term', 'Term'],
+}
+SUBSTRING_FIELDS = {'visa'}
+
+
+def _normalize(name: str) -> str:
+    # 'Offer Expiry Date' and 'offer_expiry_date' are the same column
+    return re.sub(r'[^0-9a-z]', '', name.lower())
+
+
+def match_column(cols: List[str], candidates: List[str], substring: bool = False) -> Optional[str]:
+    """Return the actual column for the first matching candidate (exact, case-insensitive, then
+    normalized-equal; then, with substring=True, any column containing a candidate)."""
+    lower_map = {c.lower(): c for c in cols}
+    normalized_map = {}
+    for c in cols:
+        normalized_map.setdefault(_normalize(c), c)
+    for cand in candidates:
+        if cand in cols:
+            return cand
+        if cand.lower() in lower_map:
+            return lower_map[cand.lower()]
+        if _normalize(cand) in normalized_map:
+            return normalized_map[_normalize(cand)]
+    if not substring:
+        return None
+    tokens = [_normalize(c) for c in candidates if c]
+    for c in cols:
+        if any(tok in _normalize(c) for tok in tokens):
+            return c
+    return None
+
+
+def _db_key(conn: sqlite3.Connection, table: str) -> Optional[Tuple[str, str, Tuple[int, int]]]:
+    # In-memory databases have no path and are never cached
+    path = conn.execute("PRAGMA database_list").fetchone()[2]
+    if not path:
+        return None
+    # The inode catches a rebuilt file whose DDL happens to reach the same schema_version
+    version = (os.stat(path).st_ino, conn.execute("PRAGMA schema_version").fetchone()[0])
+    return path, table, version
+
+
+class SchemaCatalog:
+    """Per-process cache of table columns and resolved logical fields."""
+
+    def __init__(self):
+        self._entries: Dict[Tuple[str, str], dict] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+
+    def begin_request(self) -> None:
+        """Check each (connection, table) at most once until end_request() on this thread."""
+        self._local.keys = {}
+
+    def end_request(self) -> None:
+        self._local.keys = None
+
+    def _key(self, conn: sqlite3.Connection, table: str) -> Optional[Tuple[str, str, Tuple[int, int]]]:
+        keys = getattr(self._local, 'keys', None)
+        if keys is None:
+            return _db_key(conn, table)
+        # The request holds conn, so its id is not reused before end_request()
+        memo = (id(conn), table)
+        if memo not in keys:
+            keys[memo] = _db_key(conn, table)
+        return keys[memo]
+
+    def _entry(self, conn: sqlite3.Connection, table: str) -> dict:
+        key = self._key(conn, table)
+        if key is not None:
+            with self._lock:
+                entry = self._entries.get(key[:2])
+            if entry is not None and entry['schema_version'] == key[2]:
+                return entry
+
+        cur = conn.execute(f'PRAGMA table_info("{table}")')
+        cols = [row[1] for row in cur.fetchall()]
+        entry = {
+            'table': table,
+            'schema_version': key[2] if key else None,
+            'columns': cols,
+            'fields': {name: match_column(cols, cands, name in SUBSTRING_FIELDS)
+                       for name, cands in LOGICAL_FIELDS.items()},
+        }
+        if key is not None:
+            with self._lock:
+                self._entries[key[:2]] = entry
+        return entry
+
+    def columns(self, conn: sqlite3.Connection, table: str) -> List[str]:
+        return self._entry(conn, table)['columns']
+
+    def field(self, conn: sqlite3.Connection, table: str, name: str) -> Optional[str]:
+        return self._entry(conn, table)['fields'][name]
+
+    def fields(self, conn: sqlite3.Connection, table: str) -> Dict[str, Optional[str]]:
+        return dict(self._entry(conn, table)['fields'])
+
+    def describe(self, conn: sqlite3.Connection, table: str) -> dict:
+        entry = self._entry(conn, table)
+        return {
+            'table': entry['table'],
+            'schema_version': entry['schema_version'],
+            'columns': list(entry['columns']),
+            'fields': dict(entry['fields']),
+            'candidates': LOGICAL_FIELDS,
+        }
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+
+CATALOG = SchemaCatalog()
@@ -0,0 +1,205 @@
+"""
+Pluggable workbook sources and a local snapshot of the remote workbook.
+
+A DataSource downloads its workbook only when the version it reports (ETag,
+modified time) differs from the one already held:
+- LocalFileSource: a workbook on disk (version = mtime and size)
+- HttpSource: any HTTP(S) URL via conditional GET, e.g. `python -m
+  http.server` serving a copy of the workbook as a stand-in for SharePoint
+- SharePointSource: the office365 client; one authenticated ClientContext
+  is reused for every check and download
+
+SourceSnapshot keeps the last download next to the SQLite database and
+converts it once per version with the ETL's full load (typed tables,
+indexes, date keys, report summaries, rollup) into a shadow file that is
+published over the database every endpoint reads. Version checks are
+throttled to one per check_interval seconds, and a lock file keeps
+concurrent processes (gunicorn workers) from rebuilding the same version.
+"""
+
+import abc
+import json
+import os
+import shutil
+import threading
+import time
+import urllib.error
+import urllib.request
+from typing import Optional
+
+from db_swap import discard_shadow, finalize_shadow, publish, release_lock, shadow_path, try_lock
+from etl_load_from_excel_to_sqlite import load_full, table_names
+from excel_stream import DEFAULT_BATCH_ROWS, sheet_names
+
+
+class DataSource(abc.ABC):
+    """A workbook that can be downloaded when it changes."""
+
+    name = 'source'
+
+    @abc.abstractmethod
+    def fetch(self, dest: str, current: Optional[str]) -> Optional[str]:
+        """Write the workbook to dest unless its version equals current; returns the new version or None."""
+
+
+class LocalFileSource(DataSource):
+    name = 'file'
+
+    def __init__(self, path: str):
+        self.path = path
+
+    def fetch(self, dest: str, current: Optional[str]) -> Optional[str]:
+        st = os.stat(self.path)
+        version = f'{st.st_mtime_ns}-{st.st_size}'
+        if version == current:
+            return None
+        shutil.copyfile(self.path, dest)
+        return version
+
+
+class HttpSource(DataSource):
+    """Conditional GET: the stored version is the ETag when the server sends one, else Last-Modified."""
+
+    name = 'http'
+
+    def __init__(self, url: str, timeout: float = 60):
+        self.url = url
+        self.timeout = timeout
+
+    def fetch(self, dest: str, current: Optional[str]) -> Optional[str]:
+        req = urllib.request.Request(self.url)
+        if current:
+            is_etag = current.startswith(('"', 'W/'))
+            req.add_header('If-None-Match' if is_etag else 'If-Modified-Since', current)
+        try:
+            resp = urllib.request.urlopen(req, timeout=self.timeout)
+        except urllib.error.HTTPError as e:
+            if e.code == 304:
+                return None
+            raise
+        with resp, open(dest, 'wb') as f:
+            shutil.copyfileobj(resp, f)
+            return resp.headers.get('ETag') or resp.headers.get('Last-Modified') or str(time.time())
+
+
+class SharePointSource(DataSource):
+    """A file in a SharePoint site, read with app-only (client credential) auth."""
+
+    name = 'sharepoint'
+
+    def __init__(self, site_url: Optional[str], client_id: Optional[str],
+                 client_secret: Optional[str], file_path: Optional[str]):
+        self.site_url = site_url
+        self.client_id = client_id
+        self.client_secret = client_secret
+        self.file_path = file_path
+        self._ctx = None
+        self._lock = threading.Lock()
+
+    def _context(self):
+        # Built once; the client renews its access token as needed
+        with self._lock:
+            if self._ctx is None:
+                if not (self.client_id and self.client_secret and self.site_url and self.file_path):
+                    raise RuntimeError('SharePoint env vars missing: SP_CLIENT_ID, SP_CLIENT_SECRET, SP_SITE_URL, SP_FILE_PATH')
+                try:
+                    from office365.runtime.auth.client_credential import ClientCredential
+                    from office365.sharepoint.client_context import ClientContext
+                except Exception as e:
+                    raise RuntimeError('office365-rest-python-client not installed. pip install office365-rest-python-client') from e
+                creds = ClientCredential(self.client_id, self.client_secret)
+                self._ctx = ClientContext(self.site_url).with_credentials(creds)
+            return self._ctx
+
+    def fetch(self, dest: str, current: Optional[str]) -> Optional[str]:
+        # File metadata first (a small request); the content only when it changed
+        remote = self._context().web.get_file_by_server_relative_url(self.file_path).get().execute_query()
+        version = remote.properties.get('ETag') or str(remote.properties.get('TimeLastModified'))
+        if version == current:
+            return None
+        with open(dest, 'wb') as f:
+            remote.download(f).execute_query()
+        return version
+
+
+class SourceSnapshot:
+    """Local SQLite snapshot of a DataSource, rebuilt when the source's version changes."""
+
+    def __init__(self, source: DataSource, db_path: str, check_interval: float = 60.0,
+                 batch_size: int = DEFAULT_BATCH_ROWS):
+        self.source = source
+        self.db_path = db_path
+        self.check_interval = check_interval
+        self.batch_size = batch_size
+        self.workbook_path = db_path + '.snapshot.xlsx'
+        self.meta_path = db_path + '.snapshot.json'
+        self.lock_path = db_path + '.snapshot.lock'
+        self._checked = float('-inf')
+
+    def meta(self) -> dict:
+        """What the published database was built from: source, version, fetched_at, build_seconds."""
+        try:
+            with open(self.meta_path) as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _write_meta(self, meta: dict) -> None:
+        with open(self.meta_path + '.tmp', 'w') as f:
+            json.dump(meta, f)
+        os.replace(self.meta_path + '.tmp', self.meta_path)
+
+    def due(self) -> bool:
+        """True once check_interval has passed since the last check of the source."""
+        return time.monotonic() - self._checked >= self.check_interval
+
+    def refresh(self, force: bool = False, wait: bool = False, timeout: float = 600) -> bool:
+        """
+        Check the source (at most once per check_interval unless force) and
+        rebuild the database if it changed; True if a new version was published.
+        While another thread or process is rebuilding, returns False at once,
+        or with wait=True once that rebuild is done.
+        """
+        if not force and not self.due():
+            return False
+        self._checked = time.monotonic()
+        if not try_lock(self.lock_path):
+            deadline = time.monotonic() + timeout
+            while wait and os.path.exists(self.lock_path) and time.monotonic() < deadline:
+                time.sleep(0.2)
+            return False
+        try:
+            return self._rebuild()
+        finally:
+            release_lock(self.lock_path)
+
+    def _rebuild(self) -> bool:
+        previous = self.meta()
+        current = previous.get('version') if os.path.exists(self.db_path) else None
+        download = f'{self.db_path}.{os.getpid()}.download.xlsx'  # openpyxl goes by the extension
+        start = time.perf_counter()
+        try:
+            version = self.source.fetch(download, current)
+            if version is None:
+                return False
+            shadow = shadow_path(self.db_path)
+            try:
+                discard_shadow(shadow)
+                sheets = table_names(sheet_names(download))
+                load_full(shadow, download, sheets, self.batch_size)
+                finalize_shadow(shadow)
+                # Recorded before the swap: publish() may have the WSGI master replace
+                # this process, and the new version must not be built a second time
+                self._write_meta({'source': self.source.name, 'version': version, 'fetched_at': time.time(),
+                                  'build_seconds': round(time.perf_counter() - start, 3)})
+                publish(shadow, self.db_path)
+            except BaseException:
+                discard_shadow(shadow)
+                if previous:
+                    self._write_meta(previous)
+                raise
+            os.replace(download, self.workbook_path)
+        finally:
+            if os.path.exists(download):
+                os.remove(download)
+        return True
@@ -1,6 +1,7 @@
 // /static/js/custom_dashboard.js
 // Dashboard with dynamic X→Y logic, counts-only (+ averages), metric filter locked to current Y,
 // storytelling under each chart, value labels, and guarded Download (disabled until a chart exists).
+// Chart series and filter values are aggregated server-side by /api/aggregate.
 
 /* -------- (Optional) Chart.js visual defaults for this page -------- */
 try {
@@ -27,6 +28,9 @@ let FIELD_RULES_BY_KEY = {}; // key -> { type, roles:[...], label, xEligible, is
 const GLOBAL_GUARDS = { minSampleSize: 5, maxAxisCategories: 200 };
 
 const SKIP_FIELDS = new Set(["_rowid_", "rowid", "__rowid__"]);
+// Derived in the browser (deriveDomainFields); the API can group by intake_year /
+// intake_term but has no column to filter them on
+const CLIENT_ONLY_FIELDS = new Set(["intake_year", "intake_term", "program_duration_months"]);
 let ORIGINAL_LABELS = {};
 const MUTEX_PAIRS = new Map();
 
@@ -127,6 +131,14 @@ function deriveDomainFields(row){
   return row;
 }
 
+// Yes/No fields above come back from /api/aggregate as their source column's values
+const YES_NO_FIELDS = new Set(["upfront_fee_preference", "StudyEnglish"]);
+function displayValue(field, v){
+  if (!YES_NO_FIELDS.has(field)) return v;
+  const t = String(v ?? "").toLowerCase();
+  return ["yes","true","y","1"].includes(t) ? "Yes" : (["no","false","n","0"].includes(t) ? "No" : v);
+}
+
 /* -------------------- Heuristics -------------------- */
 function looksLikeDate(s){
   return typeof s === "string" && (/\d{4}-\d{2}-\d{2}/.test(s) || /\d{2}\/\d{2}\/\d{4}/.test(s));
@@ -368,42 +380,17 @@ function allowedYForX(xField){
 }
 function metricLabelFromKey(key){ return METRIC_LABELS[key] || key; }
 
-/* -------------------- Grouping & metrics -------------------- */
-function groupBy(rows, key){
-  const g = {};
-  rows.forEach(r => {
-    const k = r[key] ?? "Unknown";
-    (g[k] ||= []).push(r);
-  });
-  return g;
-}
-
-// Compute series for any Y metric key
-function computeSeries(grouped, yKey){
-  const labels = Object.keys(grouped);
-
-  if (yKey === "__count__") return labels.map(l => grouped[l].length);
-
-  // Count of "Yes" metrics: __count_yes__<field>__
-  const yesCountMatch = yKey.match(/^__count_yes__(.+)__$/);
-  if (yesCountMatch){
-    const field = yesCountMatch[1];
-    return labels.map(l => grouped[l].filter(r => String(r[field]) === "Yes").length);
-  }
-
-  // average metrics: __avg__<field>__
-  const avgMatch = yKey.match(/^__avg__(.+)__$/);
-  if (avgMatch){
-    const field = avgMatch[1];
-    return labels.map(l => {
-      const nums = grouped[l].map(r => Number(r[field])).filter(n => !Number.isNaN(n));
-      const sum  = nums.reduce((a,b)=>a+b,0);
-      return nums.length ? sum/nums.length : 0;
-    });
-  }
-
-  // fallback
-  return labels.map(l => grouped[l].length);
+/* -------------------- Grouping & metrics (server-side) -------------------- */
+// Grouped series from /api/aggregate: { labels, values, counts, total } per X value,
+// computed in SQLite (see data_query.py). A 422 means X has more categories than cap.
+async function fetchAggregate(xField, yField, { type = "bar", filters = [], cap } = {}){
+  const params = new URLSearchParams({ group_by: xField, metric: yField, type });
+  if (cap != null) params.set("cap", cap);
+  filters.forEach(f => params.append(`eq.${f.field}`, f.value));
+  const res = await fetch(`/api/aggregate?${params}`);
+  const body = await res.json().catch(() => ({}));
+  if (!res.ok) return { ok:false, reason: body.error || `Request failed (${res.status}).` };
+  return { ok:true, series: body };
 }
 
 /* -------------------- Filters -------------------- */
@@ -443,8 +430,11 @@ function populateY(selectEl, xField){
   });
 }
 
-function uniqueValues(field){
-  return Array.from(new Set(dataset.map(r => r[field]))).sort((a,b)=>{
+// Distinct values of a field (the labels of its count series); null when there are too many
+async function uniqueValues(field){
+  const res = await fetchAggregate(field, "__count__", { cap: GLOBAL_GUARDS.maxAxisCategories });
+  if (!res.ok) return null;
+  return res.series.labels.slice().sort((a,b)=>{
     const na = Number(a), nb = Number(b);
     const aNum = Number.isFinite(na), bNum = Number.isFinite(nb);
     if (aNum && bNum) return na - nb;
@@ -458,7 +448,7 @@ function addFilterRow(container){
   row.className = "row g-2 align-items-center filter-row mt-1";
 
   const fieldCol = document.createElement("div"); fieldCol.className = "col";
-  const filterKeys = Object.keys(FIELD_RULES_BY_KEY).filter(k => !SKIP_FIELDS.has(k) && !FIELD_RULES_BY_KEY[k].virtual);
+  const filterKeys = Object.keys(FIELD_RULES_BY_KEY).filter(k => !SKIP_FIELDS.has(k) && !FIELD_RULES_BY_KEY[k].virtual && !CLIENT_ONLY_FIELDS.has(k));
   const fieldSelect = createSelect(filterKeys.map(k => ({ key:k, label:FIELD_RULES_BY_KEY[k]?.label || k })), "filter-field form-select-sm");
   fieldCol.appendChild(fieldSelect);
 
@@ -473,12 +463,21 @@ function addFilterRow(container){
   row.appendChild(fieldCol); row.appendChild(valueCol); row.appendChild(removeCol);
   container.appendChild(row);
 
-  const refreshValues = () => {
-    const vals = uniqueValues(fieldSelect.value);
+  let latestValues = 0;
+  const refreshValues = async () => {
+    const requestId = ++latestValues;
+    const vals = await uniqueValues(fieldSelect.value);
+    if (requestId !== latestValues) return;
     valueSelect.innerHTML = "";
+    if (!vals){
+      const o = document.createElement("option");
+      o.value = ""; o.textContent = "Too many values to list"; o.disabled = true;
+      valueSelect.appendChild(o);
+      return;
+    }
     vals.forEach(v => {
       const o = document.createElement("option");
-      o.value = v; o.textContent = v;
+      o.value = v; o.textContent = displayValue(fieldSelect.value, v);
       valueSelect.appendChild(o);
     });
   };
@@ -488,12 +487,12 @@ function addFilterRow(container){
   removeBtn.addEventListener("click", () => row.remove());
 }
 
-function applyFieldFilters(rows, card){
-  const filters = Array.from(card.querySelectorAll(".filter-row")).map(r => ({
+// Field=value filters of a card, sent as eq.<field>=<value>
+function fieldFilters(card){
+  return Array.from(card.querySelectorAll(".filter-row")).map(r => ({
     field: r.querySelector(".filter-field").value,
     value: r.querySelector(".filter-value").value
-  }));
-  return rows.filter(r => filters.every(f => String(r[f.field]) === f.value));
+  })).filter(f => f.field && f.value !== "");
 }
 
 // Metric filter (SHOW ONLY current Y)
@@ -538,36 +537,35 @@ function addMetricFilterRow(container, currentYProvider){
   row._refreshMetricOption = refreshMetricOption;
 }
 
-function applyMetricFilters(grouped, card){
+// Drops X categories whose value fails a threshold (the metric is always the current Y)
+function applyMetricFilters(series, yField, card){
   const rows = Array.from(card.querySelectorAll(".metric-filter-row"));
-  if (!rows.length) return grouped;
+  if (!rows.length) return series;
 
-  const labels = Object.keys(grouped);
-  const pass = {}; labels.forEach(l => pass[l] = true);
+  const pass = series.labels.map(() => true);
 
   for (const row of rows){
     const key = row.querySelector(".metric-key").value;
     const op  = row.querySelector(".metric-op").value;
     const thr = Number(row.querySelector(".metric-threshold").value);
-    if (!Number.isFinite(thr)) continue;
+    if (!Number.isFinite(thr) || key !== yField) continue;
 
-    const series = computeSeries(grouped, key);
-    labels.forEach((label, idx) => {
-      if (!pass[label]) return;
-      const v = Number(series[idx]) || 0;
+    series.values.forEach((raw, idx) => {
+      if (!pass[idx]) return;
+      const v = Number(raw) || 0;
       let ok = true;
       if (op === ">")  ok = v >  thr;
       if (op === ">=") ok = v >= thr;
       if (op === "=")  ok = v === thr;
       if (op === "<=") ok = v <= thr;
       if (op === "<")  ok = v <  thr;
-      if (!ok) pass[label] = false;
+      if (!ok) pass[idx] = false;
     });
   }
 
-  const out = {};
-  Object.keys(pass).forEach(l => { if (pass[l]) out[l] = grouped[l]; });
-  return out;
+  const keep = arr => arr.filter((_, idx) => pass[idx]);
+  const counts = keep(series.counts);
+  return { ...series, labels: keep(series.labels), values: keep(series.values), counts, total: counts.reduce((a,b)=>a+b,0) };
 }
 
 /* -------------------- Storytelling helpers -------------------- */
@@ -588,41 +586,31 @@ function formatFloat(n, d=2){
 }
 function share(part, total){ return total ? (100*part/total) : 0; }
 
-function summarizeGroups(grouped){
-  const labels = Object.keys(grouped);
-  const counts = labels.map(l => grouped[l].length);
-  const total = counts.reduce((a,b)=>a+b,0);
+function summarizeGroups(series){
+  const { labels, counts, total } = series;
   const idxMax = counts.length ? counts.indexOf(Math.max(...counts)) : -1;
   const idxMin = counts.length ? counts.indexOf(Math.min(...counts)) : -1;
   return { labels, counts, total, idxMax, idxMin };
 }
-function overallAverage(grouped, field){
+// Average over all rows from per-category averages, weighted by category size
+function overallAverage(series){
   let sum=0, n=0;
-  Object.values(grouped).forEach(rows=>{
-    rows.forEach(r=>{
-      const v = Number(r[field]);
-      if (!Number.isNaN(v)) { sum+=v; n++; }
-    });
-  });
+  series.values.forEach((v, i) => { sum += (Number(v)||0) * series.counts[i]; n += series.counts[i]; });
   return n ? (sum/n) : 0;
 }
-function overallYesStats(grouped, field){
-  let yes=0, base=0;
-  Object.values(grouped).forEach(rows=>{
-    rows.forEach(r=>{
-      const v = r[field];
-      if (v!=null) { base++; if (String(v)==="Yes") yes++; }
-    });
-  });
+function overallYesStats(series){
+  const yes = series.values.reduce((a,b)=>a+(Number(b)||0),0);
+  const base = series.total;
   return { yes, base, pct: share(yes, base) };
 }
 function friendlyY(key){ return METRIC_LABELS[key] || key; }
 
-function buildStory({type, xField, yField}, grouped, labels, values){
+function buildStory({type, xField, yField}, series){
   const xName = FIELD_RULES_BY_KEY[xField]?.label || xField;
   const yName = friendlyY(yField);
+  const { labels, values } = series;
 
-  const { total, idxMax, idxMin } = summarizeGroups(grouped);
+  const { total, idxMax, idxMin } = summarizeGroups(series);
   const topLabel = idxMax>=0 ? labels[idxMax] : null;
   const botLabel = idxMin>=0 ? labels[idxMin] : null;
   const topVal   = idxMax>=0 ? values[idxMax] : 0;
@@ -636,25 +624,25 @@ function buildStory({type, xField, yField}, grouped, labels, values){
     if (botLabel!=null && botLabel!==topLabel) story += `• Smallest group: ${botLabel} — ${formatInt(botVal)} (${formatFloat(share(botVal,total),0)}%)\n`;
   }
   else if (yField === "__avg__age__") {
-    const overall = overallAverage(grouped, "age");
+    const overall = overallAverage(series);
     story += `• Overall average age: ${formatFloat(overall,1)}\n`;
     if (topLabel!=null) story += `• Highest average: ${topLabel} — ${formatFloat(values[idxMax],1)}\n`;
     if (botLabel!=null && botLabel!==topLabel) story += `• Lowest average: ${botLabel} — ${formatFloat(values[idxMin],1)}\n`;
   }
   else if (yField === "__avg__courseattempt__") {
-    const overall = overallAverage(grouped, "courseattempt");
+    const overall = overallAverage(series);
     story += `• Overall average course attempts: ${formatFloat(overall,2)}\n`;
     if (topLabel!=null) story += `• Highest average: ${topLabel} — ${formatFloat(values[idxMax],2)}\n`;
     if (botLabel!=null && botLabel!==topLabel) story += `• Lowest average: ${botLabel} — ${formatFloat(values[idxMin],2)}\n`;
   }
   else if (yField === "__count_yes__upfront_fee_preference__") {
-    const { yes, base, pct } = overallYesStats(grouped, "upfront_fee_preference");
+    const { yes, base, pct } = overallYesStats(series);
     story += `• Yes (Upfront fee): ${formatInt(yes)} of ${formatInt(base)} total (${formatFloat(pct,0)}%)\n`;
     if (topLabel!=null) story += `• Most Yes by ${xName}: ${topLabel} — ${formatInt(values[idxMax])}\n`;
     if (botLabel!=null && botLabel!==topLabel) story += `• Fewest Yes by ${xName}: ${botLabel} — ${formatInt(values[idxMin])}\n`;
   }
   else if (yField === "__count_yes__StudyEnglish__") {
-    const { yes, base, pct } = overallYesStats(grouped, "StudyEnglish");
+    const { yes, base, pct } = overallYesStats(series);
     story += `• Yes (Study English): ${formatInt(yes)} of ${formatInt(base)} total (${formatFloat(pct,0)}%)\n`;
     if (topLabel!=null) story += `• Most Yes by ${xName}: ${topLabel} — ${formatInt(values[idxMax])}\n`;
     if (botLabel!=null && botLabel!==topLabel) story += `• Fewest Yes by ${xName}: ${botLabel} — ${formatInt(values[idxMin])}\n`;
@@ -708,37 +696,31 @@ function drawValueLabels(chart, type){
   }
   ctx.restore();
 }
-function enforceSelectionGuards({ type, xField, yField, rows }){
+// Checked before requesting; the category cap is enforced by /api/aggregate (422)
+function enforceSelectionGuards({ type, xField, yField }){
   if (!xField || !yField) return { ok:false, reason:"Please select both X and Y fields." };
   const mutex = MUTEX_PAIRS.get(xField);
   if (mutex && mutex.has(yField)) return { ok:false, reason:"Choose either the code field or the name field, not both." };
 
-  if ((rows?.length||0) < GLOBAL_GUARDS.minSampleSize)
-    return { ok:false, reason:`Not enough rows after filters (min ${GLOBAL_GUARDS.minSampleSize}).` };
-
   const isTimeX = FIELD_RULES_BY_KEY[xField]?.roles?.includes("time") || ["intake_year","intake_term","startdate","finishdate"].includes(xField);
   if (isTimeX && (type === "pie" || type === "doughnut")) return { ok:false, reason:"Use bar/line for time on X." };
-
-  if (type !== "line"){
-    const categories = new Set(rows.map(r => r[xField] ?? "Unknown"));
-    const cap = FIELD_RULES_BY_KEY[xField]?.maxAxisCardinality ?? GLOBAL_GUARDS.maxAxisCategories;
-    if (categories.size > cap) return { ok:false, reason:`Too many categories on X (${categories.size}). Add a filter or switch chart.` };
-  }
-  if (type === "pie"){
-    const categories = new Set(rows.map(r => r[xField] ?? "Unknown"));
-    if (categories.size > 12) return { ok:false, reason:"Pie charts work best with ≤12 categories." };
-  }
+  return { ok:true };
+}
+// Checked on the aggregated series
+function enforceResultGuards({ type, series }){
+  if ((series.total||0) < GLOBAL_GUARDS.minSampleSize)
+    return { ok:false, reason:`Not enough rows after filters (min ${GLOBAL_GUARDS.minSampleSize}).` };
+  if (type === "pie" && series.labels.length > 12)
+    return { ok:false, reason:"Pie charts work best with ≤12 categories." };
   return { ok:true };
 }
 
 /* -------------------- Build chart -------------------- */
-function buildChart(card, canvas){
+async function buildChart(card, canvas){
   const type   = card.querySelector(".chart-type").value;
   const xField = card.querySelector(".x-field").value;
   const yField = card.querySelector(".y-field").value;
 
-  let filteredRows = applyFieldFilters(dataset, card);
-  const guard = enforceSelectionGuards({ type, xField, yField, rows: filteredRows });
   const msg = card.querySelector(".chart-error") || (() => {
     const m = document.createElement("div");
     m.className = "chart-error text-danger mt-2";
@@ -746,19 +728,28 @@ function buildChart(card, canvas){
     card.querySelector(".card-body").appendChild(m);
     return m;
   })();
-  if (!guard.ok){
-    msg.textContent = guard.reason;
+  const fail = reason => {
+    msg.textContent = reason;
     msg.style.display = "block";
     if (canvas._chart) { canvas._chart.destroy(); canvas._chart = null; }
-    return;
-  }
-  msg.style.display = "none";
+  };
 
-  let grouped = groupBy(filteredRows, xField);
-  grouped = applyMetricFilters(grouped, card); // metric filters use current Y only
+  let guard = enforceSelectionGuards({ type, xField, yField });
+  if (!guard.ok) return fail(guard.reason);
 
-  const labels = Object.keys(grouped);
-  const values = computeSeries(grouped, yField);
+  const requestId = card._latestRequest = (card._latestRequest || 0) + 1;
+  const cap = FIELD_RULES_BY_KEY[xField]?.maxAxisCardinality ?? GLOBAL_GUARDS.maxAxisCategories;
+  const res = await fetchAggregate(xField, yField, { type, filters: fieldFilters(card), cap });
+  if (requestId !== card._latestRequest) return; // a newer request for this card is in flight
+  if (!res.ok) return fail(res.reason);
+
+  guard = enforceResultGuards({ type, series: res.series });
+  if (!guard.ok) return fail(guard.reason);
+  msg.style.display = "none";
+
+  const filtered = applyMetricFilters(res.series, yField, card); // metric filters use current Y only
+  const series = { ...filtered, labels: filtered.labels.map(l => displayValue(xField, l)) };
+  const { labels, values } = series;
 
   const ctx = canvas.getContext("2d");
   if (canvas._chart) { canvas._chart.destroy(); canvas._chart = null; }
@@ -807,7 +798,7 @@ function buildChart(card, canvas){
 
   // STORY under the chart (HTML is already in the card)
   const storyBody = card.querySelector(".chart-story .ga-body") || ensureStoryBox(card).querySelector(".ga-body");
-  storyBody.textContent = buildStory({ type, xField, yField }, grouped, labels, values);
+  storyBody.textContent = buildStory({ type, xField, yField }, series);
 }
 
 /* -------------------- Card UI -------------------- */
@@ -902,8 +893,8 @@ function addChartCard(){
       .forEach(r => r._refreshMetricOption && r._refreshMetricOption());
   });
 
-  genBtn.addEventListener("click", () => {
-    buildChart(card, canvas);
+  genBtn.addEventListener("click", async () => {
+    await buildChart(card, canvas);
     // Enable/disable download button based on chart existence
     dlBtn.disabled = !canvas._chart;
   });
@@ -935,9 +926,12 @@ function addChartCard(){
 }
 
 /* -------------------- Init -------------------- */
+// Rows are only read for field types, code/name pairs and labels; one page is enough
+const SAMPLE_ROWS = 1000;
+
 async function init(){
   try{
-    const res = await fetch("/api/data");
+    const res = await fetch(`/api/data?limit=${SAMPLE_ROWS}`);
     const raw = await res.json();
 
     ORIGINAL_LABELS = {};
@@ -12,17 +12,20 @@ function pick(o, ...names) {
 
 const palette = ["#FF6384", "#36A2EB", "#FFCE56", "#4BC0C0", "#9966FF"];
 
-document.addEventListener("DOMContentLoaded", () => {
-  loadApplicationStatus();
-  loadDeferredOffers();     // fixed here
-  loadAgentPerformance();
-  loadStudentClassification();
+document.addEventListener("DOMContentLoaded", async () => {
+  // All four reports in one round trip; each chart falls back to its own endpoint
+  let data = {};
+  try { data = await fetchJSON("/api/dashboard/leader"); } catch (e) { console.error("leader dashboard", e); }
+  loadApplicationStatus(data.application_status);
+  loadDeferredOffers(data.deferred_offers);
+  loadAgentPerformance(data.agent_performance);
+  loadStudentClassification(data.student_classification);
 });
 
 /* ------------------------------ Application Status ------------------------------ */
-async function loadApplicationStatus() {
+async function loadApplicationStatus(rows) {
   try {
-    const rows = await fetchJSON("/api/application-status");
+    rows = rows || await fetchJSON("/api/application-status");
     const labels = rows.map(r => pick(r, "status", "Status"));
     const data   = rows.map(r => Number(pick(r, "total", "Total")) || 0);
     new Chart(document.getElementById("applicationStatusChart"), {
@@ -34,7 +37,7 @@ async function loadApplicationStatus() {
 }
 
 /* ------------------------------ Deferred Offers (frontend-only) ------------------------------ */
-async function loadDeferredOffers() {
+async function loadDeferredOffers(rows) {
   const el = document.getElementById("deferredOffersChart");
   if (!el) return;
 
@@ -48,9 +51,8 @@ async function loadDeferredOffers() {
     "/api/all"
   ];
 
-  // first endpoint that returns JSON without throwing
-  let rows = null;
-  for (const url of endpoints) {
+  // Unless the dashboard batch delivered them: first endpoint that returns JSON without throwing
+  for (const url of rows ? [] : endpoints) {
     try { rows = await fetchJSON(url); break; } catch { /* keep trying */ }
   }
 
@@ -156,9 +158,9 @@ function renderDeferred(el, data) {
 }
 
 /* ------------------------------ Agent Performance ------------------------------ */
-async function loadAgentPerformance() {
+async function loadAgentPerformance(rows) {
   try {
-    const rows = await fetchJSON("/api/agent-performance");
+    rows = rows || await fetchJSON("/api/agent-performance");
     const labels = rows.map(r => pick(r, "agent", "Agent"));
     const apps   = rows.map(r => Number(pick(r, "applications", "Applications")) || 0);
     const offers = rows.map(r => Number(pick(r, "offers", "Offers")) || 0);
@@ -179,9 +181,9 @@ async function loadAgentPerformance() {
 }
 
 /* ------------------------------ Student Classification ------------------------------ */
-async function loadStudentClassification() {
+async function loadStudentClassification(rows) {
   try {
-    const rows = await fetchJSON("/api/student-classification");
+    rows = rows || await fetchJSON("/api/student-classification");
     const labels = rows.map(r => pick(r, "classification", "Classification"));
     const data   = rows.map(r => Number(pick(r, "total", "Total")) || 0);
     new Chart(document.getElementById("studentClassificationChart"), {
@@ -13,7 +13,7 @@ async function fetchData(endpoint) {
 // Current Student vs Enrolled (Bar Chart)
 // ===============================
 const ctxCurrentEnrolled = document.getElementById('chart-current-enrolled').getContext('2d');
-new Chart(ctxCurrentEnrolled, {
+const chartCurrentEnrolled = new Chart(ctxCurrentEnrolled, {
     type: 'bar',
     data: {
         labels: ['Unknown'], // replace with dynamic categories
@@ -40,7 +40,7 @@ new Chart(ctxCurrentEnrolled, {
 // Enrolled vs Offer (Bar Chart)
 // ===============================
 const ctxEnrolledOffer = document.getElementById('chart-enrolled-offer').getContext('2d');
-new Chart(ctxEnrolledOffer, {
+const chartEnrolledOffer = new Chart(ctxEnrolledOffer, {
     type: 'bar',
     data: {
         labels: ['Unknown'], // replace with backend categories
@@ -67,7 +67,7 @@ new Chart(ctxEnrolledOffer, {
 // Visa Breakdown (Doughnut Chart)
 // ===============================
 const ctxVisa = document.getElementById('chart-visa-breakdown').getContext('2d');
-new Chart(ctxVisa, {
+const chartVisa = new Chart(ctxVisa, {
     type: 'doughnut',
     data: {
         labels: [
@@ -103,7 +103,7 @@ new Chart(ctxVisa, {
 // Offer Expiry Surge (Line Chart)
 // ===============================
 const ctxExpiry = document.getElementById('chart-offer-expiry-surge').getContext('2d');
-new Chart(ctxExpiry, {
+const chartExpiry = new Chart(ctxExpiry, {
     type: 'line',
     data: {
         labels: ['Day 1', 'Day 2', 'Day 3', 'Day 4', 'Day 5'], // replace with real dates
@@ -131,3 +131,30 @@ new Chart(ctxExpiry, {
         }
     }
 });
+
+// ===============================
+// Backend data: all four reports in one round trip
+// ===============================
+function setSeries(chart, labels, ...series) {
+    chart.data.labels = labels;
+    series.forEach((data, i) => { chart.data.datasets[i].data = data; });
+    chart.update();
+}
+
+fetchData('/api/dashboard/manager').then(data => {
+    // Charts whose report failed (null) keep their placeholder data
+    const rows = name => (Array.isArray(data[name]) ? data[name] : null);
+    let r;
+    if ((r = rows('current_vs_enrolled'))) {
+        setSeries(chartCurrentEnrolled, r.map(x => x.term), r.map(x => x.current_students), r.map(x => x.enrolled));
+    }
+    if ((r = rows('enrolled_vs_offer'))) {
+        setSeries(chartEnrolledOffer, r.map(x => x.term), r.map(x => x.offers), r.map(x => x.enrolled));
+    }
+    if ((r = rows('visa_breakdown'))) {
+        setSeries(chartVisa, r.map(x => x.visa_type), r.map(x => x.total));
+    }
+    if ((r = rows('offer_expiry_surge'))) {
+        setSeries(chartExpiry, r.map(x => x.expiry_day), r.map(x => x.expiring_offers));
+    }
+}).catch(e => console.error('manager dashboard', e));
@@ -1,28 +1,27 @@
  (function(){
-  let rawData=[];
+  let series={labels:[],counts:[]};
+  let tableRows=[];
+  let tableLoaded=false;
+  let nextCursor=null;
   let currentSort='';
   let chart;
   let chartType='bar';
   let rangeFrom=null;
   let rangeTo=null;
+  let latestChartRequest=0;
+  let latestTableRequest=0;
+  const errors={chart:null,table:null};
   const palette=['#FF6384','#36A2EB','#FFCE56','#4BC0C0','#9966FF'];
-
-  function parseDate(d){
-    if(!d) return null;
-    const p=d.split('/');
-    if(p.length!==3) return null;
-    return new Date(p[2],p[1]-1,p[0]);
-  }
+  // The chart is one /api/aggregate request; the table reads TABLE_PAGE_SIZE rows of the
+  // fields it shows from /api/data (see data_query.py) and the next page on "Load more"
+  const TABLE_COLUMNS=['nationality','coursename'];
+  const TABLE_PAGE_SIZE=100;
+  // Sorts the API applies; the study-period sorts order the loaded rows
+  const SERVER_SORTS={offer:'offerid',status:'status'};
 
   document.addEventListener('DOMContentLoaded',()=>{
-    fetch('/api/data').then(r=>r.json()).then(data=>{
-      rawData=data.map(r=>({
-        ...r,
-        _start:parseDate(r.StartDate || r.startdate)
-      }));
-      applyFilters();
-      hideTable();
-    });
+    applyFilters();
+    hideTable();
 
     initTimePeriodFilter('.time-filter', (from,to)=>{ rangeFrom=from; rangeTo=to; applyFilters(); });
 
@@ -31,7 +30,8 @@
         document.querySelectorAll('.sort-buttons button').forEach(b=>b.classList.remove('active'));
         btn.classList.add('active');
         currentSort=btn.dataset.sort;
-        applyFilters();
+        tableLoaded=false;
+        if(tableVisible()) loadTable(false);
       });
     });
 
@@ -55,36 +55,88 @@
       showTable();
       document.querySelectorAll('.widget-list button').forEach(b=>b.classList.remove('active'));
       document.getElementById('tableChartBtn').classList.add('active');
-      applyFilters();
+      if(tableLoaded) updateTable();
+      else loadTable(false);
     });
+    document.getElementById('loadMoreBtn').addEventListener('click',()=>loadTable(true));
   });
 
+  function isoDay(d){
+    const pad=n=>String(n).padStart(2,'0');
+    return `${d.getFullYear()}-${pad(d.getMonth()+1)}-${pad(d.getDate())}`;
+  }
+
+  // Date range and intake filters are applied by the API (see data_query.py)
+  function filterParams(){
+    const params=new URLSearchParams();
+    if(rangeFrom) params.append('gte.startdate', isoDay(rangeFrom));
+    if(rangeTo) params.append('lte.startdate', `${isoDay(rangeTo)} 23:59:59`);
+    const intakes=Array.from(document.querySelectorAll('.intake-buttons button.active')).map(b=>b.dataset.sem);
+    intakes.forEach(sem=>params.append('eq.previous_offer_intake', sem));
+    return params;
+  }
+
   function applyFilters(){
-    let data=rawData.slice();
-    if(rangeFrom){
-      data=data.filter(r=>r._start && r._start>=rangeFrom);
-    }
-    if(rangeTo){
-      data=data.filter(r=>r._start && r._start<=rangeTo);
+    loadChart();
+    tableLoaded=false;
+    if(tableVisible()) loadTable(false);
+  }
+
+  // {ok, body, res}, or {ok:false, error} carrying the API's error message
+  async function getJson(url){
+    try{
+      const res=await fetch(url);
+      const body=await res.json().catch(()=>null);
+      if(!res.ok) return {ok:false,error:(body&&body.error)||`Request failed (${res.status}).`};
+      return {ok:true,body,res};
+    }catch(e){
+      return {ok:false,error:'Could not reach the server.'};
     }
-    const intakes=Array.from(document.querySelectorAll('.intake-buttons button.active')).map(b=>b.dataset.sem);
-    if(intakes.length) data=data.filter(r=>{
-      const intake = r['Previous Offer Intake'] || r['previous_offer_intake'];
-      return intakes.includes(intake);
-    });
+  }
 
-    updateChart(data);
-    updateTable(data);
+  function setError(source,message){
+    errors[source]=message;
+    const box=document.getElementById('dashboardError');
+    const text=[errors.chart,errors.table].filter(Boolean).join(' ');
+    box.textContent=text;
+    box.hidden=!text;
   }
 
-  function updateChart(data){
-    const counts={};
-    data.forEach(r=>{
-      const v = r['Visa Status'] || r['visa_status'] || 'Unknown';
-      counts[v]=(counts[v]||0)+1;
-    });
-    let labels=Object.keys(counts);
-    let values=Object.values(counts);
+  // Applications per visa status, counted by the API
+  async function loadChart(){
+    const params=filterParams();
+    params.set('group_by','visa_status');
+    params.set('metric','__count__');
+    const requestId=++latestChartRequest;
+    const res=await getJson(`/api/aggregate?${params}`);
+    if(requestId!==latestChartRequest) return;
+    setError('chart',res.ok?null:`Visa chart: ${res.error}`);
+    series=res.ok?res.body:{labels:[],counts:[]};
+    updateChart();
+  }
+
+  // First page of the table, or the next one (more), for the current filters and sort
+  async function loadTable(more){
+    const params=filterParams();
+    params.set('columns', TABLE_COLUMNS.join(','));
+    params.set('limit', TABLE_PAGE_SIZE);
+    if(SERVER_SORTS[currentSort]) params.set('sort', SERVER_SORTS[currentSort]);
+    if(more&&nextCursor) params.set('after', nextCursor);
+    const requestId=++latestTableRequest;
+    const res=await getJson(`/api/data?${params}`);
+    if(requestId!==latestTableRequest) return;
+    setError('table',res.ok?null:`Table: ${res.error}`);
+    if(!res.ok&&more) return; // keep the rows already shown
+    const rows=res.ok?res.body:[];
+    tableRows=more?tableRows.concat(rows):rows;
+    nextCursor=res.ok?res.res.headers.get('X-Next-Cursor'):null;
+    tableLoaded=true;
+    updateTable();
+  }
+
+  function updateChart(){
+    const labels=series.labels;
+    const values=series.counts;
 
     if(chart) chart.destroy();
     const ctx=document.getElementById('visaChart').getContext('2d');
@@ -100,18 +152,14 @@
     chart=new Chart(ctx,config);
   }
 
-  function updateTable(data){
-    let rows=data.map(r=>({
+  function updateTable(){
+    let rows=tableRows.map(r=>({
       nat:(r.Nationality||r.nationality||'Unknown'),
       periods:Number(r['Number of Study Periods']||r['number_of_study_periods'])||0,
-      course:(r.CourseName||r.coursename||''),
-      offer:(r.OfferId||r.offerid||''),
-      status:(r.Status||r.status||'')
+      course:(r.CourseName||r.coursename||'')
     }));
     if(currentSort==='asc') rows.sort((a,b)=>a.periods-b.periods);
     else if(currentSort==='desc') rows.sort((a,b)=>b.periods-a.periods);
-    else if(currentSort==='offer') rows.sort((a,b)=>String(a.offer).localeCompare(String(b.offer)));
-    else if(currentSort==='status') rows.sort((a,b)=>String(a.status).localeCompare(String(b.status)));
 
     const tbody=document.querySelector('#dataTable tbody');
     tbody.innerHTML='';
@@ -120,6 +168,7 @@
       tr.innerHTML=`<td>${r.nat}</td><td>${r.periods}</td><td>${r.course}</td>`;
       tbody.appendChild(tr);
     });
+    document.getElementById('loadMoreBtn').hidden=!nextCursor;
   }
 
   function setChartType(type){
@@ -129,7 +178,11 @@
     const idMap={bar:'barChartBtn',doughnut:'donutChartBtn',pie:'pieChartBtn'};
     const btnId=idMap[type];
     if(btnId) document.getElementById(btnId).classList.add('active');
-    applyFilters();
+    updateChart();
+  }
+
+  function tableVisible(){
+    return document.querySelector('.table-container').style.display==='block';
   }
 
   function showTable(){
@@ -0,0 +1,49 @@
+"""
+Streaming encoders for large /api/data exports.
+
+Rows are pulled from a SQLite cursor in batches of fetchmany() and yielded
+as encoded chunks (see json_rows.py), so memory stays bounded by the batch
+size and the first bytes go out as soon as the first batch is read. Rows are
+encoded as the cursor returns them; the query fills nulls (fill_nulls=True
+in build_data_query) like the buffered record format.
+"""
+
+import sqlite3
+from typing import Iterator
+
+from json_rows import encode_lines, encode_rows
+
+STREAM_FORMATS = {
+    'ndjson': 'application/x-ndjson',    # one JSON object per line
+    'json-stream': 'application/json',   # a regular JSON array, sent in chunks
+}
+DEFAULT_BATCH_SIZE = 1000
+
+
+def iter_ndjson(cur: sqlite3.Cursor, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[bytes]:
+    columns = [d[0] for d in cur.description]
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        yield encode_lines(columns, rows)
+
+
+def iter_json_array(cur: sqlite3.Cursor, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[bytes]:
+    columns = [d[0] for d in cur.description]
+    yield b'['
+    first = True
+    while True:
+        rows = cur.fetchmany(batch_size)
+        if not rows:
+            break
+        chunk = encode_rows(columns, rows)[1:-1]  # the objects, without the array brackets
+        yield chunk if first else b',' + chunk
+        first = False
+    yield b']'
+
+
+def iter_format(fmt: str, cur: sqlite3.Cursor, batch_size: int = DEFAULT_BATCH_SIZE) -> Iterator[bytes]:
+    if fmt == 'ndjson':
+        return iter_ndjson(cur, batch_size)
+    return iter_json_array(cur, batch_size)
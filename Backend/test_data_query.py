@@ -0,0 +1,216 @@
+"""
+Tests for data_query.py: keyset pagination, request validation and the
+/api/aggregate category cap.
+
+    cd Backend && python -m pytest -q
+"""
+
+import importlib
+import os
+import sqlite3
+import sys
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from data_query import (
+    MAX_AXIS_CARDINALITY, AggregateTooWide, build_aggregate_query, build_data_query, decode_cursor,
+    encode_cursor, run_aggregate, split_rows,
+)
+
+TABLE = 'reportdata'
+
+
+def _create_facts(conn, rows):
+    conn.execute(f'CREATE TABLE {TABLE} (studentid INTEGER, status TEXT, agentname TEXT, age INTEGER, startdate TEXT)')
+    conn.executemany(f'INSERT INTO {TABLE} VALUES (?, ?, ?, ?, ?)', rows)
+    conn.commit()
+
+
+def _fact_rows(n=40):
+    # NULLs and repeated values in every sortable column, so pages split inside ties
+    rows = []
+    for i in range(n):
+        age = None if i % 4 == 0 else 20 + i % 5
+        status = None if i % 7 == 3 else ['Offered', 'Enrolled', 'Cancelled'][i % 3]
+        startdate = None if i % 5 == 1 else f'2024-0{1 + i % 9}-1{i % 3}'
+        rows.append((1000 + i, status, f'Agent {i % 6}', age, startdate))
+    return rows
+
+
+@pytest.fixture
+def conn():
+    conn = sqlite3.connect(':memory:')
+    _create_facts(conn, _fact_rows())
+    yield conn
+    conn.close()
+
+
+def _all_pages(conn, args, limit, fill_nulls=False):
+    # Follow next cursors the way the dashboards do; returns (studentids, pages)
+    ids, after, pages = [], None, 0
+    while True:
+        page_args = MultiDict(args)
+        page_args['limit'] = str(limit)
+        if after:
+            page_args['after'] = after
+        sql, params, lim = build_data_query(conn, TABLE, page_args, fill_nulls=fill_nulls)
+        cur = conn.execute(sql, params)
+        columns, rows, after = split_rows([d[0] for d in cur.description], cur.fetchall(), lim)
+        assert columns[0] == 'studentid' and len(rows) <= limit
+        ids += [row[0] for row in rows]
+        pages += 1
+        assert pages <= 100, 'pagination does not terminate'
+        if not after:
+            return ids, pages
+
+
+@pytest.mark.parametrize('limit', [1, 3, 7, 100])
+@pytest.mark.parametrize('sort', [None, 'age', '-age', 'status', '-status', '-startdate'])
+@pytest.mark.parametrize('fill_nulls', [False, True])
+def test_keyset_pages_match_one_ordered_query(conn, sort, limit, fill_nulls):
+    args = [('columns', 'studentid,age,status')]
+    order = 'rowid ASC'
+    if sort:
+        args.append(('sort', sort))
+        col, direction = sort.lstrip('-'), 'DESC' if sort.startswith('-') else 'ASC'
+        # SQLite sorts NULLs first ascending and last descending; rowid breaks ties
+        order = f'{col} {direction}, rowid {direction}'
+    expected = [r[0] for r in conn.execute(f'SELECT studentid FROM {TABLE} ORDER BY {order}')]
+
+    ids, pages = _all_pages(conn, args, limit, fill_nulls)
+
+    assert ids == expected
+    assert pages == max(1, -(-len(expected) // limit))
+
+
+def test_keyset_pages_with_filters(conn):
+    args = [('columns', 'studentid'), ('sort', '-age'), ('eq.status', 'Offered'), ('eq.status', 'Enrolled')]
+    expected = [r[0] for r in conn.execute(
+        f"SELECT studentid FROM {TABLE} WHERE status IN ('Offered', 'Enrolled') ORDER BY age DESC, rowid DESC")]
+    assert _all_pages(conn, args, 4)[0] == expected
+
+
+def test_fill_nulls_only_changes_the_projection(conn):
+    sql, params, limit = build_data_query(conn, TABLE, MultiDict([('columns', 'studentid,age'), ('sort', 'age'),
+                                                                  ('limit', '2')]), fill_nulls=True)
+    cur = conn.execute(sql, params)
+    columns, rows, cursor = split_rows([d[0] for d in cur.description], cur.fetchall(), limit)
+    assert [row[:2] for row in rows] == [(1000, 0), (1004, 0)]
+    assert decode_cursor(cursor) == (None, 5)
+
+
+@pytest.mark.parametrize('value', [None, 0, 23.5, 'Offered', "quote ' and \" chars"])
+def test_cursor_round_trip(value):
+    assert decode_cursor(encode_cursor(value, 42)) == (value, 42)
+
+
+@pytest.mark.parametrize('args, message', [
+    ({'like.status': 'Offered'}, 'Unknown filter operator'),
+    ({'in.status': 'Offered'}, 'Unknown filter operator'),
+    ({'eq.nope': 'x'}, 'Unknown column'),
+    ({'eq.status" OR 1=1 --': 'x'}, 'Unknown column'),
+    ({'columns': 'studentid,nope'}, 'Unknown column'),
+    ({'columns': 'studentid,(SELECT 1)'}, 'Unknown column'),
+    ({'sort': '-nope'}, 'Unknown column'),
+    ({'limit': 'ten'}, 'limit must be an integer'),
+    ({'limit': '0'}, 'limit must be positive'),
+    ({'after': 'not a cursor'}, 'Invalid pagination cursor'),
+])
+def test_rejected_data_requests(conn, args, message):
+    with pytest.raises(ValueError, match=message):
+        build_data_query(conn, TABLE, MultiDict(args))
+
+
+@pytest.mark.parametrize('args, message', [
+    ({}, 'group_by is required'),
+    ({'group_by': 'nope'}, 'Unknown column'),
+    ({'group_by': 'status', 'metric': 'nope'}, 'Unknown column'),
+    ({'group_by': 'status', 'metric': '__avg__nope__'}, 'Unknown column'),
+    ({'group_by': 'status', 'ge.age': '3'}, 'Unknown filter operator'),
+    ({'group_by': 'status', 'cap': 'many'}, 'cap must be an integer'),
+    ({'group_by': 'status', 'cap': '0'}, 'cap must be positive'),
+    ({'group_by': 'status', 'cap': '-5'}, 'cap must be positive'),
+    ({'group_by': 'status', 'type': 'line', 'cap': '0'}, 'cap must be positive'),
+])
+def test_rejected_aggregate_requests(conn, args, message):
+    with pytest.raises(ValueError, match=message):
+        build_aggregate_query(conn, TABLE, MultiDict(args))
+
+
+def test_filter_values_are_bound(conn):
+    sql, params, _ = build_data_query(conn, TABLE, MultiDict({'eq.status': "x' OR '1'='1"}))
+    assert "x' OR" not in sql
+    assert conn.execute(sql, params).fetchall() == []
+
+
+def test_group_by_and_metric_match_x_and_y(conn):
+    long = run_aggregate(conn, TABLE, MultiDict({'group_by': 'status', 'metric': '__avg_age__'}))
+    short = run_aggregate(conn, TABLE, MultiDict({'x': 'status', 'y': '__avg_age__'}))
+    assert long == short
+    assert long['x'] == 'status' and long['y'] == '__avg_age__'
+
+
+@pytest.fixture
+def wide_conn():
+    conn = sqlite3.connect(':memory:')
+    _create_facts(conn, [(i, 'Offered', f'Agent {i:03d}', 20, '2024-01-01')
+                         for i in range(MAX_AXIS_CARDINALITY + 1)])
+    yield conn
+    conn.close()
+
+
+def test_aggregate_cap(wide_conn):
+    with pytest.raises(AggregateTooWide):
+        run_aggregate(wide_conn, TABLE, MultiDict({'group_by': 'agentname'}))
+    with pytest.raises(AggregateTooWide):
+        run_aggregate(wide_conn, TABLE, MultiDict({'group_by': 'agentname', 'cap': '10'}))
+    # cap can only lower the limit
+    with pytest.raises(AggregateTooWide):
+        run_aggregate(wide_conn, TABLE, MultiDict({'group_by': 'agentname', 'cap': '100000'}))
+    # Line charts are not capped; a filter brings the axis under the cap
+    assert len(run_aggregate(wide_conn, TABLE, MultiDict({'group_by': 'agentname', 'type': 'line'}))['labels']) == \
+        MAX_AXIS_CARDINALITY + 1
+    assert run_aggregate(wide_conn, TABLE, MultiDict({'group_by': 'agentname', 'ne.agentname': 'Agent 000'}))['total'] == \
+        MAX_AXIS_CARDINALITY
+
+
+@pytest.fixture(scope='module')
+def client(tmp_path_factory):
+    # The app reads its database paths at import time
+    tmp = tmp_path_factory.mktemp('app')
+    db = str(tmp / 'analytics.db')
+    with sqlite3.connect(db) as conn:
+        _create_facts(conn, [(i, 'Offered', f'Agent {i:03d}', 20, '2024-01-01')
+                             for i in range(MAX_AXIS_CARDINALITY + 1)])
+    env = {'SQLITE_DB': db, 'USERS_DB': str(tmp / 'users.db'),
+           'REFRESH_SCHEDULER': 'false', 'AUTO_REFRESH_EXCEL': 'false'}
+    saved = {k: os.environ.get(k) for k in env}
+    os.environ.update(env)
+    sys.modules.pop('app', None)
+    try:
+        yield importlib.import_module('app').app.test_client()
+    finally:
+        sys.modules.pop('app', None)
+        for k, v in saved.items():
+            if v is None:
+                os.environ.pop(k, None)
+            else:
+                os.environ[k] = v
+
+
+def test_api_aggregate_too_wide_is_422(client):
+    resp = client.get('/api/aggregate?group_by=agentname')
+    assert resp.status_code == 422
+    assert 'Too many categories' in resp.get_json()['error']
+    assert client.get('/api/aggregate?group_by=agentname&type=line').status_code == 200
+    assert client.get('/api/aggregate?group_by=status').get_json()['total'] == MAX_AXIS_CARDINALITY + 1
+
+
+def test_api_rejected_requests_are_400(client):
+    for path in ('/api/aggregate?group_by=status&like.status=x', '/api/aggregate?group_by=nope',
+                 '/api/aggregate?group_by=status&cap=0', '/api/aggregate?group_by=agentname&cap=-5',
+                 '/api/data?eq.nope=1', '/api/data?columns=nope', '/api/data?after=bogus'):
+        resp = client.get(path)
+        assert resp.status_code == 400, path
+        assert resp.get_json()['error']
@@ -0,0 +1,72 @@
+"""
+Tests for db_pool.py: one connection per thread, reopened after a swap and
+closed when its thread exits.
+
+    cd Backend && python -m pytest -q
+"""
+
+import os
+import sqlite3
+import threading
+
+import pytest
+
+from db_pool import ConnectionPool
+
+
+@pytest.fixture
+def db(tmp_path):
+    path = str(tmp_path / 'pool.db')
+    with sqlite3.connect(path) as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+    return path
+
+
+def _is_closed(conn):
+    try:
+        conn.execute('SELECT 1')
+    except sqlite3.ProgrammingError:
+        return True
+    return False
+
+
+def test_thread_reuses_its_connection(db):
+    pool = ConnectionPool(db, read_only=True)
+    assert pool.get() is pool.get()
+    pool.close_all()
+
+
+def test_short_lived_threads_do_not_leak_connections(db):
+    # A thread-per-request server: every request runs on a new thread
+    pool = ConnectionPool(db, read_only=True)
+    handed_out = []
+
+    def request():
+        conn = pool.get()
+        conn.execute('SELECT COUNT(*) FROM t').fetchone()
+        handed_out.append(conn)
+
+    for _ in range(200):
+        thread = threading.Thread(target=request)
+        thread.start()
+        thread.join()
+
+    assert len(handed_out) == 200
+    assert all(_is_closed(conn) for conn in handed_out)
+    assert len(pool._all) == 0
+
+
+def test_reopens_after_swap(db, tmp_path):
+    pool = ConnectionPool(db, read_only=True)
+    old = pool.get()
+    rebuilt = str(tmp_path / 'rebuilt.db')
+    with sqlite3.connect(rebuilt) as conn:
+        conn.execute('CREATE TABLE t (x INTEGER)')
+        conn.execute('INSERT INTO t VALUES (1)')
+    os.replace(rebuilt, db)
+
+    new = pool.get()
+    assert new is not old and _is_closed(old)
+    assert new.execute('SELECT COUNT(*) FROM t').fetchone()[0] == 1
+    pool.close_all()
+    assert _is_closed(new)
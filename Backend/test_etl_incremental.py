@@ -0,0 +1,124 @@
+"""
+Tests for the ETL's incremental mode: upserting a changed workbook into the
+previous database gives the same database as a full load of that workbook.
+
+    cd Backend && python -m pytest -q
+"""
+
+import os
+import shutil
+import sqlite3
+import sys
+
+import pandas as pd
+import pytest
+
+import etl_load_from_excel_to_sqlite as etl
+
+WORKBOOK = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'dummy_data.xlsx')
+BATCH_ROWS = 16  # several batches per sheet
+
+
+@pytest.fixture(scope='module')
+def workbooks(tmp_path_factory):
+    """(old, new) workbooks: new drops, edits and adds rows and adds a column."""
+    tmp = tmp_path_factory.mktemp('workbooks')
+    sheet = pd.ExcelFile(WORKBOOK).sheet_names[0]
+    df = pd.read_excel(WORKBOOK, sheet_name=sheet)
+    old = df.iloc[:80].copy()
+    new = df.drop(index=[3, 10]).copy()
+    new.loc[new.index[:5], 'Status'] = 'Enrolled'
+    new.loc[new.index[6], 'Age'] = None
+    new['Region'] = 'AU'
+    paths = (str(tmp / 'old.xlsx'), str(tmp / 'new.xlsx'))
+    for path, frame in zip(paths, (old, new)):
+        frame.to_excel(path, sheet_name=sheet, index=False)
+    return paths
+
+
+@pytest.fixture(scope='module')
+def duplicate_workbook(tmp_path_factory, workbooks):
+    """The new workbook with one studentid+offerid key repeated, as a full load accepts it."""
+    sheet = pd.ExcelFile(WORKBOOK).sheet_names[0]
+    df = pd.read_excel(workbooks[1], sheet_name=sheet)
+    path = str(tmp_path_factory.mktemp('duplicate') / 'duplicate.xlsx')
+    pd.concat([df, df.iloc[[0]]]).to_excel(path, sheet_name=sheet, index=False)
+    return path
+
+
+def _etl(monkeypatch, excel, db, *options):
+    # Run the ETL as the command line does
+    monkeypatch.setattr(sys, 'argv', ['etl_load_from_excel_to_sqlite.py', '--excel', excel, '--db', db,
+                                      '--batch-size', str(BATCH_ROWS), *options])
+    etl.main()
+
+
+def _snapshot(path, keep_rowids=False):
+    """Every table's columns and rows (order-independent) plus the index names."""
+    conn = sqlite3.connect(path)
+    try:
+        tables = {}
+        for (table,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table' "
+                                     "AND name NOT LIKE 'sqlite_%' ORDER BY name"):
+            # __rowid__ is a surrogate key: a full load renumbers it, an upsert keeps it.
+            # Columns are compared by name; an upsert appends columns new to the workbook.
+            cols = sorted(r[1] for r in conn.execute(f'PRAGMA table_info("{table}")')
+                          if keep_rowids or r[1] != '__rowid__')
+            select = ', '.join(f'"{c}"' for c in cols)
+            rows = sorted(map(repr, conn.execute(f'SELECT {select} FROM "{table}"')))
+            tables[table] = (cols, rows)
+        # The upsert's unique natural-key index exists only in incrementally loaded databases
+        indexes = {name for (name,) in conn.execute("SELECT name FROM sqlite_master WHERE type = 'index' "
+                                                    "AND name NOT LIKE 'sqlite_%' AND name NOT LIKE 'ux\\_%' ESCAPE '\\'")}
+        return tables, indexes
+    finally:
+        conn.close()
+
+
+@pytest.mark.parametrize('workers', [1, 2])
+def test_incremental_matches_full_load(tmp_path, monkeypatch, workbooks, workers):
+    old, new = workbooks
+    incremental, full = str(tmp_path / 'incremental.db'), str(tmp_path / 'full.db')
+    _etl(monkeypatch, old, incremental)
+    _etl(monkeypatch, new, incremental, '--mode', 'incremental', '--workers', str(workers))
+    _etl(monkeypatch, new, full)
+
+    inc_tables, inc_indexes = _snapshot(incremental)
+    full_tables, full_indexes = _snapshot(full)
+    assert sorted(inc_tables) == sorted(full_tables)
+    for table in full_tables:
+        assert inc_tables[table] == full_tables[table], table
+    assert inc_indexes == full_indexes
+    assert len(full_tables['reportdata'][1]) == 98
+
+
+def test_incremental_without_changes_keeps_rows(tmp_path, monkeypatch, workbooks, capsys):
+    _, new = workbooks
+    loaded, again = str(tmp_path / 'loaded.db'), str(tmp_path / 'again.db')
+    _etl(monkeypatch, new, loaded)
+    shutil.copyfile(loaded, again)
+    _etl(monkeypatch, new, again, '--mode', 'incremental')
+
+    assert '0 new, 0 changed, 0 removed' in capsys.readouterr().out
+    assert _snapshot(again, keep_rowids=True) == _snapshot(loaded, keep_rowids=True)
+
+
+def test_mode_defaults_to_full(tmp_path, monkeypatch, workbooks, capsys):
+    _, new = workbooks
+    db = str(tmp_path / 'analytics.db')
+    _etl(monkeypatch, new, db)
+    _etl(monkeypatch, new, db)
+    out = capsys.readouterr().out
+    assert out.count('Created SQLite DB') == 2 and 'Updated SQLite DB' not in out
+
+
+def test_incremental_rejects_duplicate_keys_in_db(tmp_path, monkeypatch, workbooks, duplicate_workbook):
+    _, new = workbooks
+    db = str(tmp_path / 'analytics.db')
+    _etl(monkeypatch, duplicate_workbook, db)
+    before = _snapshot(db, keep_rowids=True)
+
+    with pytest.raises(SystemExit, match=r'already has 2 rows with studentid\+offerid'):
+        _etl(monkeypatch, new, db, '--mode', 'incremental')
+    # The live DB is left as it was
+    assert _snapshot(db, keep_rowids=True) == before
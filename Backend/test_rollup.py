@@ -0,0 +1,104 @@
+"""
+Tests for rollup.py: an aggregate answered from the rollup equals the same
+request answered from the fact table.
+
+    cd Backend && python -m pytest -q
+"""
+
+import random
+import sqlite3
+
+import pytest
+from werkzeug.datastructures import MultiDict
+
+from data_query import run_aggregate
+from rollup import NOT_MEASURES, build_rollup, rollup_aggregate_query, rollup_table
+
+TABLE = 'reportdata'
+
+
+@pytest.fixture(scope='module')
+def conn(tmp_path_factory):
+    # A file database, so the schema catalog caches it like the app's
+    path = str(tmp_path_factory.mktemp('rollup') / 'facts.db')
+    conn = sqlite3.connect(path)
+    conn.execute(f'CREATE TABLE {TABLE} (studentid INTEGER, status TEXT, campus_name TEXT, nationality TEXT, '
+                 'visa_status TEXT, agentname TEXT, age INTEGER, courseattempt INTEGER, startdate TEXT)')
+    rng = random.Random(7)
+    pick = lambda values: rng.choice(values + [None])  # NULL dimension values become 'Unknown'
+    rows = [(i,
+             pick(['Offered', 'Enrolled', 'Cancelled', 'New Application Request']),
+             pick(['Sydney', 'Melbourne', 'Brisbane']),
+             pick(['India', 'Nepal', 'China', 'Vietnam', 'Brazil']),
+             pick(['Student Visa', 'Temporary Visa', 'PR']),
+             pick([f'Agent {n}' for n in range(8)]),
+             rng.choice([None] + list(range(18, 40))),
+             rng.choice([None, 1, 1, 1, 2, 3]),
+             f'2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d}')
+            for i in range(600)]
+    conn.executemany(f'INSERT INTO {TABLE} VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)', rows)
+    build_rollup(conn, TABLE)
+    conn.commit()
+    yield conn
+    conn.close()
+
+
+COVERED = [
+    [('group_by', 'status')],
+    [('group_by', 'campus_name'), ('metric', '__avg_age__')],
+    [('group_by', 'nationality'), ('metric', '__pct_of_total__')],
+    [('group_by', 'agentname'), ('metric', 'age')],
+    [('group_by', 'visa_status'), ('metric', '__avg__courseattempt__'), ('eq.status', 'Offered')],
+    [('x', 'status'), ('eq.campus_name', 'Sydney'), ('eq.campus_name', 'Brisbane')],
+    [('group_by', 'status'), ('ne.agentname', 'Agent 1')],
+    [('group_by', 'status'), ('ne.agentname', 'Agent 1'), ('ne.agentname', 'Agent 2')],
+    [('group_by', 'nationality'), ('gte.visa_status', 'Student Visa')],
+    [('group_by', 'status'), ('eq.status', 'Enrolled'), ('metric', '__avg__age__')],
+    [('group_by', 'campus_name'), ('type', 'line'), ('metric', 'courseattempt')],
+]
+
+
+@pytest.mark.parametrize('args', COVERED, ids=lambda a: '&'.join(f'{k}={v}' for k, v in a))
+def test_rollup_matches_table(conn, args):
+    args = MultiDict(args)
+    query = rollup_aggregate_query(conn, TABLE, args)
+    assert query is not None, 'the rollup should cover this request'
+    from_rollup = run_aggregate(conn, TABLE, args, query)
+    from_table = run_aggregate(conn, TABLE, args)
+    assert from_rollup['labels'] == from_table['labels']
+    assert from_rollup['counts'] == from_table['counts']
+    assert from_rollup['total'] == from_table['total']
+    assert from_rollup['values'] == pytest.approx(from_table['values'])
+
+
+NOT_COVERED = [
+    [('group_by', 'intake_year')],                                           # derived dimension
+    [('group_by', 'status'), ('metric', '__count_yes__status__')],           # not pre-aggregated
+    [('group_by', 'status'), ('eq.startdate', '2024-01-01')],                # filter on a non-dimension
+    [('group_by', 'status'), ('eq.campus_name', 'Sydney'), ('eq.nationality', 'India')],  # 3 columns
+    [('group_by', 'nope')],                                                  # left to the table query's error
+]
+
+
+@pytest.mark.parametrize('args', NOT_COVERED, ids=lambda a: '&'.join(f'{k}={v}' for k, v in a))
+def test_rollup_declines(conn, args):
+    assert rollup_aggregate_query(conn, TABLE, MultiDict(args)) is None
+
+
+def test_rollup_grouping_sets(conn):
+    dims = ['status', 'campus_name', 'nationality', 'visa_status', 'agentname']
+    sets = conn.execute(f'SELECT COUNT(DISTINCT "__grouping_id__") FROM "{rollup_table(TABLE)}"').fetchone()[0]
+    assert sets == len(dims) + len(dims) * (len(dims) - 1) // 2
+    # Every grouping set sums back to the whole table
+    totals = conn.execute(f'SELECT DISTINCT SUM("__n__") FROM "{rollup_table(TABLE)}" '
+                          'GROUP BY "__grouping_id__"').fetchall()
+    assert totals == [(600,)]
+
+
+@pytest.mark.parametrize('name, measure', [
+    ('age', True), ('amount_paid', True), ('prepaid', True), ('courseattempt', True),
+    ('studentid', False), ('OfferId', False), ('courseid', False), ('agent_id', False), ('id', False),
+    ('startdate_year', False), ('startdate_month', False), ('__grouping_id__', False),
+])
+def test_not_measures(name, measure):
+    assert (NOT_MEASURES.search(name) is None) == measure
@@ -1,19 +1,39 @@
-import pandas as pd
+import os
 import sqlite3
 
+from excel_stream import stage_sheet
+from db_swap import copy_database, discard_shadow, finalize_shadow, publish, shadow_path
+from reports import add_date_keys, create_report_indexes, materialize_reports
+
 # Paths (adjust if needed)
 EXCEL_FILE = "dummy_data.xlsx"
 DB_FILE = "dummy_data.db"
 
-# Load cleaned Excel
-print("Loading cleaned Excel file...")
-df = pd.read_excel(EXCEL_FILE)
+# Work on a copy so the API keeps serving the current file during the load
+shadow = shadow_path(DB_FILE)
+try:
+    if os.path.exists(DB_FILE):
+        copy_database(DB_FILE, shadow)
+    conn = sqlite3.connect(shadow)
+    try:
+        # Overwrite reportdata table with cleaned data, streamed from the workbook in batches
+        print("Loading cleaned Excel file...")
+        stage_sheet(conn, EXCEL_FILE, "reportdata")
+
+        # to_sql's replace dropped the date keys and indexes; recreate what the reports read
+        add_date_keys(conn, "reportdata")
+        create_report_indexes(conn, "reportdata")
 
-# Connect to SQLite
-conn = sqlite3.connect(DB_FILE)
+        # Rebuild the report summary tables served by the API
+        materialize_reports(conn, "reportdata")
+    finally:
+        conn.close()
 
-# Overwrite reportdata table with cleaned data
-df.to_sql("reportdata", conn, if_exists="replace", index=False)
+    # ANALYZE, then atomically replace the live database
+    finalize_shadow(shadow)
+    publish(shadow, DB_FILE)
+except BaseException:
+    discard_shadow(shadow)
+    raise
 
-conn.close()
 print("SQLite database updated successfully!")
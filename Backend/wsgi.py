@@ -0,0 +1,12 @@
+"""
+WSGI entry point for production servers.
+
+    gunicorn -c gunicorn.conf.py wsgi:app
+
+Caches are warmed per worker by gunicorn.conf.py (post_worker_init), after
+the fork; other servers can call app.warmup() once the process has started.
+"""
+
+from app import create_app
+
+app = create_app(warm=False)